@@ -3,7 +3,9 @@
 #
 # This script reads a CPS channel export file from a supported CPS and
 # generates Talkgroup__, Analog__, and Digital-Other__ files suitable 
-# for use by the cps-import-builder script.
+# for use by the cps-import-builder script.  Digital channels that follow
+# the repeater/talk group naming pattern are folded back into a compact
+# Digital-Repeaters__ file.
 #
 
 
@@ -103,6 +105,340 @@ def anytone_read_channels_export(channels_dict, channels_export_file,
                   'SMS Confirmation','Exclude channel from roaming',
                   'DMR MODE','DataACK Disable','R5toneBot','R5ToneEot']
 
+    # read in the export file; keep every value as text so frequencies
+    # and tones come back out exactly as the CPS wrote them
+    if debug:
+        print("Processing: {}".format(channels_export_file))
+    channels_df = pandas.read_csv(channels_export_file, dtype=str)
+    channels_df.fillna('', inplace=True)
+
+    # sanity check the header against what this model exports
+    if model == "868":
+        header_row = header_row_868
+        rx_only_column = 'TX Prohibit'
+    else:
+        header_row = header_row_878
+        rx_only_column = 'PTT Prohibit'
+    for column in ['Channel Name','Receive Frequency','Transmit Frequency',
+                   'Channel Type','Transmit Power','Band Width',
+                   'CTCSS/DCS Decode','CTCSS/DCS Encode','Contact',
+                   'Contact Call Type','Busy Lock/TX Permit','Color Code',
+                   'Slot',rx_only_column]:
+        if column not in channels_df.columns:
+            print("ERROR:  Column '{}' missing from '{}'.".format(column,
+                channels_export_file))
+            print("        Expected columns: {}".format(header_row))
+            sys.exit(-1)
+
+    # loop through the export rows building our channels dictionary
+    for i,row in channels_df.iterrows():
+        ch_name = row['Channel Name']
+        if ch_name in channels_dict.keys():
+            if debug:
+                print("WARNING:  channel {} already defined.".format(ch_name))
+            continue
+
+        attr_dict = {
+            'RX Freq':row['Receive Frequency'],
+            'TX Freq':row['Transmit Frequency'],
+            'Power':row['Transmit Power'],
+            'Bandwidth':row['Band Width'],
+            'CTCSS Decode':row['CTCSS/DCS Decode'],
+            'CTCSS Encode':row['CTCSS/DCS Encode'],
+            'RX Only':row[rx_only_column]
+            }
+        if row['Channel Type'] == "A-Analog":
+            attr_dict.update({'Ch Type':"Analog"})
+        else:
+            attr_dict.update({
+                'Ch Type':"Digital",
+                'Color Code':row['Color Code'],
+                'Talk Group':row['Contact'],
+                'Time Slot':row['Slot'],
+                'Call Type':row['Contact Call Type'],
+                'TX Permit':row['Busy Lock/TX Permit']
+                })
+            if 'Contact TG/DMR ID' in channels_df.columns:
+                attr_dict.update({'TG Number':row['Contact TG/DMR ID']})
+        channels_dict.update({ch_name:attr_dict})
+
+    # clean up
+    del channels_df
+
+    return
+
+
+
+def anytone_read_zones_export(zones_dict, zones_export_file, debug=False):
+    """This function reads an Anytone 868/878 CPS zones export file"""
+
+    if debug:
+        print("Processing: {}".format(zones_export_file))
+    zones_df = pandas.read_csv(zones_export_file, dtype=str)
+    zones_df.fillna('', inplace=True)
+
+    # each row is a zone with its members delimited by '|'
+    for i,row in zones_df.iterrows():
+        zone_name = row['Zone Name']
+        member_list = [member for member in
+                       row['Zone Channel Member'].split('|') if member]
+        if zone_name in zones_dict.keys():
+            zones_dict[zone_name].extend(member_list)
+        else:
+            zones_dict.update({zone_name:member_list})
+
+    # clean up
+    del zones_df
+
+    return
+
+
+
+def anytone_export_model(channels_export_file):
+    """This function tells which Anytone model wrote a channels export.
+
+    The 868 CPS calls its receive only column 'TX Prohibit' and the 878
+    CPS 'PTT Prohibit'.  Returns '868', '878' or None if it's neither.
+    """
+
+    header_list = list(pandas.read_csv(channels_export_file, dtype=str,
+        nrows=0).columns)
+    if 'PTT Prohibit' in header_list:
+        return '878'
+    if 'TX Prohibit' in header_list:
+        return '868'
+
+    return None
+
+
+
+def anytone_read_talk_groups_export(tg_by_name_dict, tg_export_file,
+        debug=False):
+    """This function reads an Anytone 868/878 CPS talk groups export file"""
+
+    if debug:
+        print("Processing: {}".format(tg_export_file))
+    tg_df = pandas.read_csv(tg_export_file, dtype=str)
+    tg_df.fillna('', inplace=True)
+
+    # the first number seen for a name wins
+    for i,row in tg_df.iterrows():
+        if row['Name'] not in tg_by_name_dict.keys():
+            tg_by_name_dict.update({row['Name']:row['Radio ID']})
+
+    # clean up
+    del tg_df
+
+    return
+
+
+
+def freq_to_hz(freq):
+    """This function converts a frequency in MHz to an integer Hz value."""
+
+    return int(round(float(freq) * 1000000))
+
+
+
+def fold_digital_channels_to_repeaters(channels_dict, zones_dict,
+        debug=False):
+    """This function folds flat digital channels into repeater rows.
+
+    Channels are grouped by (RX Freq, TX Freq, Color Code, name prefix)
+    so repeaters sharing a frequency pair stay separate.  Within a group,
+    every channel that cps-import-builder.py would regenerate from a
+    Digital-Repeaters__ row (lowercase prefix, name formed from the prefix
+    plus talk group name, group call, same color code TX permit, same
+    power, one zone) becomes a talk group column with its slot.
+
+    Returns (repeater_list, tg_column_list, unfolded_dict) where each
+    repeater is a dict of row values plus a 'Slots' dict keyed by talk
+    group name, and unfolded_dict maps channel name to the reason it
+    couldn't be folded.
+    """
+
+    # build a reverse index of zone membership for each channel
+    channel_zones_dict = {}
+    for zone_name in zones_dict.keys():
+        for ch_name in zones_dict[zone_name]:
+            if ch_name in channel_zones_dict.keys():
+                if zone_name not in channel_zones_dict[ch_name]:
+                    channel_zones_dict[ch_name].append(zone_name)
+            else:
+                channel_zones_dict.update({ch_name:[zone_name]})
+
+    # group digital channels by their repeater signature
+    unfolded_dict = {}
+    repeater_groups_dict = {}
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        if attr_dict['Ch Type'] != "Digital":
+            continue
+        try:
+            group_key = (freq_to_hz(attr_dict['RX Freq']),
+                         freq_to_hz(attr_dict['TX Freq']),
+                         int(attr_dict['Color Code']),
+                         ch_name.split(' ', 1)[0])
+        except ValueError:
+            unfolded_dict.update({ch_name:"unparseable frequency/color code"})
+            continue
+        if group_key in repeater_groups_dict.keys():
+            repeater_groups_dict[group_key].append(ch_name)
+        else:
+            repeater_groups_dict.update({group_key:[ch_name]})
+
+    # walk each group and fold the channels that match the row pattern
+    repeater_list = []
+    tg_column_dict = {}
+    for group_key in repeater_groups_dict.keys():
+        group_list = repeater_groups_dict[group_key]
+        ch_prefix = group_key[3]
+
+        first_attr_dict = channels_dict[group_list[0]]
+        rptr_power = first_attr_dict['Power']
+        rptr_zone = None
+        slots_dict = {}
+        for ch_name in group_list:
+            attr_dict = channels_dict[ch_name]
+            tg_name = attr_dict['Talk Group']
+            ch_zone_list = channel_zones_dict.get(ch_name, [])
+
+            # check that this channel is one the builder would regenerate
+            reason = None
+            if ch_prefix != ch_prefix.lower():
+                reason = "prefix '{}' isn't lowercase".format(ch_prefix)
+            elif attr_dict['Call Type'] != "Group Call":
+                reason = "not a group call"
+            elif attr_dict['TX Permit'] != "Same Color Code":
+                reason = "TX permit '{}'".format(attr_dict['TX Permit'])
+            elif attr_dict['RX Only'] == "On":
+                reason = "receive only"
+            elif attr_dict['Power'] != rptr_power:
+                reason = "power differs from repeater"
+            elif str(attr_dict['Time Slot']) not in ['1','2']:
+                reason = "invalid slot '{}'".format(attr_dict['Time Slot'])
+            elif (ch_prefix + ' ' + tg_name)[:16] != ch_name:
+                reason = "name doesn't match '{} <talk group>'".format(
+                    ch_prefix)
+            elif tg_name in slots_dict.keys():
+                reason = "talk group already on repeater"
+            elif len(ch_zone_list) > 1:
+                reason = "member of more than one zone"
+            elif (rptr_zone is not None and ch_zone_list and
+                    ch_zone_list[0] != rptr_zone):
+                reason = "zone differs from repeater"
+            if reason is not None:
+                unfolded_dict.update({ch_name:reason})
+                continue
+
+            # fold this channel into the repeater row
+            if rptr_zone is None and ch_zone_list:
+                rptr_zone = ch_zone_list[0]
+            slots_dict.update({tg_name:str(attr_dict['Time Slot'])})
+            tg_column_dict.update({tg_name:None})
+
+        if not slots_dict:
+            continue
+        if rptr_zone is None:
+            rptr_zone = ch_prefix
+        if debug:
+            print("   Folded {} channels into repeater '{};{}'".format(
+                len(slots_dict), rptr_zone, ch_prefix))
+        repeater_list.append({
+            'Zone Name':"{};{}".format(rptr_zone, ch_prefix),
+            'Comment':"",
+            'Power':rptr_power,
+            'RX Freq':first_attr_dict['RX Freq'],
+            'TX Freq':first_attr_dict['TX Freq'],
+            'Color Code':first_attr_dict['Color Code'],
+            'Slots':slots_dict
+            })
+
+    return repeater_list, list(tg_column_dict.keys()), unfolded_dict
+
+
+
+def write_k7abd_digital_repeaters_file(repeater_list, tg_column_list,
+        digital_repeaters_file, debug=False):
+    """This function writes out a k7abd formatted Digital-Repeaters__ file"""
+
+    header_row = ['Zone Name','Comment','Power','RX Freq','TX Freq',
+                  'Color Code'] + tg_column_list
+    rows_out_list = []
+    for repeater in repeater_list:
+        row_list = []
+        for column in header_row[:6]:
+            row_list.append(repeater[column])
+        slots_dict = repeater['Slots']
+        for tg_name in tg_column_list:
+            row_list.append(slots_dict.get(tg_name, '-'))
+        rows_out_list.append(row_list)
+    rows_out_df = pandas.DataFrame(rows_out_list, columns=header_row)
+
+    if debug:
+        print("Writing output to: ", digital_repeaters_file)
+    rows_out_df.to_csv(digital_repeaters_file, index=False, header=True)
+
+    # clean up...
+    del rows_out_list
+    del rows_out_df
+
+    return
+
+
+
+def write_k7abd_talkgroups_file(tg_list, talkgroups_file, debug=False):
+    """This function writes out a k7abd formatted Talkgroups__ file.
+
+    tg_list holds (talk group name, number) pairs; the file has no
+    header line.
+    """
+
+    rows_out_df = pandas.DataFrame(tg_list)
+
+    if debug:
+        print("Writing output to: ", talkgroups_file)
+    rows_out_df.to_csv(talkgroups_file, index=False, header=False)
+
+    # clean up...
+    del rows_out_df
+
+    return
+
+
+
+def write_k7abd_digital_others_file(channels_dict, zones_dict, ch_name_list,
+        digital_others_file, debug=False):
+    """This function writes out a k7abd formatted Digital-Others__ file"""
+
+    header_row = ['Zone','Channel Name','Power','RX Freq','TX Freq',
+                  'Color Code','Talk Group','TimeSlot','Call Type',
+                  'TX Permit']
+
+    # Digital-Others__ carries one row per zone membership
+    channel_zones_dict = {}
+    for zone_name in zones_dict.keys():
+        for ch_name in zones_dict[zone_name]:
+            channel_zones_dict.setdefault(ch_name, []).append(zone_name)
+
+    rows_out_list = []
+    for ch_name in ch_name_list:
+        attr_dict = channels_dict[ch_name]
+        for zone_name in channel_zones_dict.get(ch_name, ['Unassigned']):
+            rows_out_list.append([zone_name, ch_name, attr_dict['Power'],
+                attr_dict['RX Freq'], attr_dict['TX Freq'],
+                attr_dict['Color Code'], attr_dict['Talk Group'],
+                attr_dict['Time Slot'], attr_dict['Call Type'],
+                attr_dict['TX Permit']])
+    rows_out_df = pandas.DataFrame(rows_out_list, columns=header_row)
+
+    if debug:
+        print("Writing output to: ", digital_others_file)
+    rows_out_df.to_csv(digital_others_file, index=False, header=True)
+
+    # clean up...
+    del rows_out_list
+    del rows_out_df
 
     return
 
@@ -227,16 +563,118 @@ def main():
     print("Putting output files in: '{}'.".format(outputs_dir))
 
 
-    if '868' in args.cps_target:
-
-        print("")
-        print("Converting channel export from Anytone D868UV")
-
-
-    if '878' in args.cps_target:
+    # one Anytone export can only be converted as the model that wrote it
+    anytone_model_list = [model for model in ['868','878']
+                          if model in args.cps_target]
+    if len(anytone_model_list) > 0:
+
+        # Anytone CPS exports default to Channel.CSV, Zone.CSV and
+        # TalkGroups.CSV
+        channels_export_file = os.path.join(inputs_dir, 'Channel.CSV')
+        zones_export_file = os.path.join(inputs_dir, 'Zone.CSV')
+        tg_export_file = os.path.join(inputs_dir, 'TalkGroups.CSV')
+        if not os.path.exists(channels_export_file):
+            print("ERROR:  Channel export file not found!")
+            print("        (file '{}' must exist)".format(channels_export_file))
+            sys.exit(-1)
+        model = anytone_export_model(channels_export_file)
+        if model is None:
+            print("ERROR:  '{}' isn't an Anytone D868UV or D878UV channel export.".format(
+                channels_export_file))
+            print("        (no 'TX Prohibit' or 'PTT Prohibit' column)")
+            sys.exit(-1)
+        if model not in anytone_model_list:
+            print("ERROR:  '{}' is an Anytone D{}UV export, not D{}UV.".format(
+                channels_export_file, model, '/D'.join(anytone_model_list)))
+            sys.exit(-1)
 
         print("")
-        print("Converting channel export from Anytone D878UV")
+        print("Converting channel export from Anytone D{}UV".format(model))
+
+        channels_dict = {}
+        zones_dict = {}
+        tg_by_name_dict = {}
+        print("   Reading channels export: {}".format(
+            os.path.basename(channels_export_file)))
+        anytone_read_channels_export(channels_dict, channels_export_file,
+            model, debug=debugflg)
+        if os.path.exists(zones_export_file):
+            print("   Reading zones export: {}".format(
+                os.path.basename(zones_export_file)))
+            anytone_read_zones_export(zones_dict, zones_export_file,
+                debug=debugflg)
+        if os.path.exists(tg_export_file):
+            print("   Reading talk groups export: {}".format(
+                os.path.basename(tg_export_file)))
+            anytone_read_talk_groups_export(tg_by_name_dict, tg_export_file,
+                debug=debugflg)
+
+        # fold flat digital channels back into repeater rows
+        repeater_list, tg_column_list, unfolded_dict = \
+            fold_digital_channels_to_repeaters(channels_dict, zones_dict,
+                debug=debugflg)
+        folded_cnt = 0
+        for repeater in repeater_list:
+            folded_cnt += len(repeater['Slots'])
+
+        digital_repeaters_output_file = os.path.join(outputs_dir,
+            'Digital-Repeaters__d{}uv_export_{}.csv'.format(model, isodate))
+        print("   Digital-Repeaters__ file: {}".format(
+            os.path.basename(digital_repeaters_output_file)))
+        write_k7abd_digital_repeaters_file(repeater_list, tg_column_list,
+            digital_repeaters_output_file, debug=debugflg)
+        print("   Folded {} channels into {} repeaters with {} talk groups.".format(
+            folded_cnt, len(repeater_list), len(tg_column_list)))
+
+        # anything we couldn't fold stays a flat Digital-Others__ channel
+        if len(unfolded_dict) > 0:
+            digital_others_output_file = os.path.join(outputs_dir,
+                'Digital-Others__d{}uv_export_{}.csv'.format(model, isodate))
+            print("   Digital-Others__ file: {}".format(
+                os.path.basename(digital_others_output_file)))
+            write_k7abd_digital_others_file(channels_dict, zones_dict,
+                list(unfolded_dict.keys()), digital_others_output_file,
+                debug=debugflg)
+            print("   {} digital channels couldn't be folded:".format(
+                len(unfolded_dict)))
+            for ch_name in unfolded_dict.keys():
+                print("      '{}': {}".format(ch_name, unfolded_dict[ch_name]))
+
+        # every talk group the output files name needs a number, from the
+        # talk groups export or else the channel's own TG/DMR ID (878)
+        tg_name_list = list(tg_column_list)
+        for ch_name in unfolded_dict.keys():
+            attr_dict = channels_dict[ch_name]
+            if attr_dict['Ch Type'] == "Digital" and \
+                    attr_dict['Talk Group'] not in tg_name_list:
+                tg_name_list.append(attr_dict['Talk Group'])
+        for ch_name in channels_dict.keys():
+            attr_dict = channels_dict[ch_name]
+            if attr_dict['Ch Type'] == "Digital" and \
+                    attr_dict.get('TG Number', '') != '' and \
+                    attr_dict['Talk Group'] not in tg_by_name_dict.keys():
+                tg_by_name_dict.update({attr_dict['Talk Group']:
+                                        attr_dict['TG Number']})
+        tg_list = []
+        missing_tg_list = []
+        for tg_name in tg_name_list:
+            if tg_name in tg_by_name_dict.keys():
+                tg_list.append((tg_name, tg_by_name_dict[tg_name]))
+            else:
+                missing_tg_list.append(tg_name)
+
+        talkgroups_output_file = os.path.join(outputs_dir,
+            'Talkgroups__d{}uv_export_{}.csv'.format(model, isodate))
+        print("   Talkgroups__ file: {}".format(
+            os.path.basename(talkgroups_output_file)))
+        write_k7abd_talkgroups_file(tg_list, talkgroups_output_file,
+            debug=debugflg)
+        print("   Wrote {} talk groups.".format(len(tg_list)))
+        if len(missing_tg_list) > 0:
+            print("   WARNING:  no number found for {} talk groups (export TalkGroups.CSV too):".format(
+                len(missing_tg_list)))
+            for tg_name in missing_tg_list:
+                print("      '{}'".format(tg_name))
 
 
     if 'cs800d' in args.cps_target:
@@ -10,1396 +10,955 @@
 
 
 import pandas
-import csv
+import numpy
 import sys
 import os
 import time
-import glob
 import argparse
 import re
+import bisect
+import functools
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.common import freq_to_hz, hz_to_mhz
+from cps_import_builder.contacts import ContactFilter
+from cps_import_builder.geo import GeoFilter, parse_near, read_route_file
+from cps_import_builder.k7abd import (read_zone_order_file,
+    read_tg_filter_file, read_rptr_filter_file)
+from cps_import_builder.output import (open_output_bundle, open_output_file,
+    close_output_bundle)
+from cps_import_builder.snapshot import read_build_snapshot, write_build_snapshot
+from cps_import_builder.targets import (cps_target_registry,
+    supported_cps_targets, load_cps_target)
+from cps_import_builder.validate import print_problems
 
 
 #
-#  Our internal channel dictionary contains a set of channel
-#  attributes which are in stored in a dictionary for that
-#  channel. Here are the keys available in the attribute dict:
+#  The channel, zone and talk group model (and the keys of each channel's
+#  attribute dict) is described in cps_import_builder/codeplug.py.
 #
-#  Key          Comments
-#  'Ch Type'        Analog or Digital
-#  'RX Freq'        Receive frequency of the channel
-#  'TX Freq'        Transmit frequency of the channel
-#  'Power'          Power level to operate at Low,Medium,High,Turbo
-#                   (Turbo & High are equivalent when not supported)
-#  'Bandwidth'      Channel bandwidth 12.5 or 25
-#  'CTCSS Decode'   Rx tone decode value
-#  'CTCSS Encode'   Tx tone encode value
-#  'RX Only'        Make channel receive only if set to "On"
-#
-#  Additional attributes for a digital channel:
-#
-#  Key
-#  'Color Code'     Integer val 1-14
-#  'Talk Group'     Contact/TG Name
-#  'Time Slot'      "1" or "2"
-#  'Call Type'      "Group Call" or "Private Call"
-#  'TX Permit'      "Same Color Code" or "Always"
-
-
-# global lists of all CTCSS values
-ctcss_list = ['67','67.0','69.4','71.9','74.4','77','77.0','79.7','82.5','85.4',
-              '88.5','91.5','94.8','97.4','100','100.0','103.5','107.2',
-              '110.9','114.8','118.8','123','123.0','127.3','131.8','136.5',
-              '141.3','146.2','150','150.0','151.4','156.7','159.8',
-              '162.2','165.5','167.9','171.3','173.8','177.3','179.9',
-              '183.5','186.2','189.9','192.8','196.6','199.5','203.5',
-              '206.5','210.7','218.1','225.7','229.1','233.6','241.8',
-              '250.3','254.1']
-
-cdcss_list = ['D023N','D025N','D026N','D031N','D032N','D043N','D047N','D051N',
-              'D054N','D065N','D071N','D072N','D073N','D074N','D114N','D115N',
-              'D116N','D125N','D131N','D132N','D134N','D143N','D152N','D155N',
-              'D156N','D162N','D165N','D172N','D174N','D205N','D223N','D226N',
-              'D243N','D244N','D245N','D251N','D261N','D263N','D265N','D271N',
-              'D306N','D311N','D315N','D331N','D343N','D346N','D351N','D364N',
-              'D365N','D371N','D411N','D412N','D413N','D423N','D431N','D432N',
-              'D445N','D464N','D465N','D466N','D503N','D506N','D516N','D532N',
-              'D546N','D565N','D606N','D612N','D624N','D627N','D631N','D632N',
-              'D654N','D662N','D664N','D703N','D712N','D723N','D731N','D732N',
-              'D734N','D743N','D754N']
-
-
-
-def anytone_write_zones_export(zones_dict, zones_order_list,
-        zones_export_file, channels_dict, model, debug=False):
-    """This function writes out an Anytone zones import/export file"""
 
-    if debug:
-            print("Preparing Zones Export File...")
-
-    # Create a dataframe from the zones dict
-    header_row_868 = ['No.','Zone Name','Zone Channel Member',
-                  'A Channel','B Channel']
-    header_row_878 = ['No.','Zone Name','Zone Channel Member',
-                  'Zone Channel Member RX Frequency',
-                  'Zone Channel Member TX Frequency',
-                  'A Channel','A Channel RX Frequency',
-                  'A Channel TX Frequency',
-                  'B Channel','B Channel RX Frequency',
-                  'B Channel TX Frequency']
-    zones_out_dict = {}
-    zones_not_ordered_list = []
-    cnt = 1
-    for zone_name in zones_dict.keys():
-        if debug:
-            print("   Adding zone {} with following members:".format(zone_name))
-            print("   ", zones_dict[zone_name])
-        row_list = []
-        row_list.append(str(cnt))
-        cnt = cnt + 1
-        row_list.append(zone_name)
-
-        # build Zone Channel Member string from list
-        zone_member_list = sorted(zones_dict[zone_name])
-        member_str = '|'.join(zone_member_list)
-        if debug:
-            print("   Member string: '{}'".format(member_str))
-        row_list.append(member_str)
-
-        if model != "868":
-
-            # build Zone Channel Rx Freq string
-            rx_freq_list = []
-            for member in zone_member_list:
-                channel_rx_freq = str(channels_dict[member]['RX Freq'])
-                rx_freq_list.append(channel_rx_freq)
-            rx_freq_str = '|'.join(rx_freq_list)
-            row_list.append(rx_freq_str)
-
-            # build Zone Channel Tx Freq string
-            tx_freq_list = []
-            for member in zone_member_list:
-                channel_tx_freq = str(channels_dict[member]['TX Freq'])
-                tx_freq_list.append(channel_tx_freq)
-            tx_freq_str = '|'.join(tx_freq_list)
-            row_list.append(tx_freq_str)
-
-        # now use first member channel info as the "A" & "B" VFO default
-        first_member_name = zones_dict[zone_name][0]
-        attr_dict = channels_dict[first_member_name]
-        row_list.append(first_member_name)
-        if model != "868":
-            row_list.append(attr_dict['RX Freq'])
-            row_list.append(attr_dict['TX Freq'])
-        row_list.append(first_member_name)
-        if model != "868":
-            row_list.append(attr_dict['RX Freq'])
-            row_list.append(attr_dict['TX Freq'])
-        zones_out_dict.update({zone_name:row_list})
-        if zone_name not in zones_order_list:
-            zones_not_ordered_list.append(row_list)
-
-    # Build zones_out_list to match zones_order_list; all the rest of the zones
-    # go to bottom of list in the order they were processed
-    zones_out_list = []
-    for zone_name in zones_order_list:
-        if zone_name in zones_out_dict.keys():
-            if debug:
-                print("   Adding zone to zones_out_list: {}".format(zone_name))
-            zones_out_list.append(zones_out_dict[zone_name])
-        else:
-            print("Warning:  Zone '{}' specified in Zones_Order.csv file not used!".format(zone_name))
-    for i in range(len(zones_not_ordered_list)):
-        if debug:
-            print("   Adding zone to zones_out_list: {}".format(zones_not_ordered_list[i][1]))
-        zones_out_list.append(zones_not_ordered_list[i])
 
-    # Output our Zones dataframe
-    if model == "868":
-        zones_out_df = pandas.DataFrame(zones_out_list, columns=header_row_868)
-    else:
-        # 578 and 878 zone files are the same
-        zones_out_df = pandas.DataFrame(zones_out_list, columns=header_row_878)
 
-    # renumber the "No." column to match new order
-    for i in range(len(zones_out_df.index)):
-        zones_out_df.at[i, 'No.'] = i+1
+def read_channel_numbers_file(file_path, debug=False):
+    """This function reads the channel numbers file into a name to No. dict."""
 
+    # read in the channel numbers .csv file
     if debug:
-        print("Writing output to: ", zones_export_file)
-    zones_out_df.to_csv(zones_export_file, index=False, header=True, quoting=csv.QUOTE_ALL,
-                   line_terminator='\r\n')
-
-    # clean up...
-    del zones_out_list
-    del zones_out_df
-
-    return
-
-
+        print("Processing: {}".format(file_path))
+    channel_numbers_df = pandas.read_csv(file_path)
 
-def anytone_write_talk_groups_export(talk_groups_dict,
-        talk_groups_export_file, debug=False):
-    """This function writes out an Anytone D878 talk groups file"""
-
-    # Create a dataframe from the talk groups dict and output it...
-    header_row = ['No.','Radio ID','Name','Call Type','Call Alert']
-    talk_groups_out_list = []
-    cnt = 1
-    for tg_id in sorted(talk_groups_dict.keys()):
-        row_list = []
-        row_list.append(str(cnt))
-        cnt = cnt + 1
-        row_list.append(tg_id)
-        tg_name = talk_groups_dict[tg_id][0]
-        if len(tg_name) > 16:
-            print("WARNING:  TG Name '{}' > 16, truncating to '{}'".format(
-                tg_name,tg_name[:16]))
-        row_list.append(tg_name[:16])
-        tg_call_type = talk_groups_dict[tg_id][1]
-        row_list.append(tg_call_type)
-        tg_call_alert = talk_groups_dict[tg_id][2]
-        row_list.append(tg_call_alert)
-        talk_groups_out_list.append(row_list)
-    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list,
-        columns=header_row)
+    # loop through file rows
+    channel_numbers_dict = {}
+    for i,row in channel_numbers_df.iterrows():
+        channel_numbers_dict.update({row['Channel Name']: int(row['No.'])})
 
     if debug:
-        print("Writing output to: ", talk_groups_export_file)
-    talk_groups_out_df.to_csv(talk_groups_export_file, index=False,
-            header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+        print("   Returning {} channel numbers".format(
+            len(channel_numbers_dict)))
 
-    # clean up...
-    del talk_groups_out_list
-    del talk_groups_out_df
-
-    return
+    return channel_numbers_dict
 
 
 
-def anytone_write_channels_export(channels_dict, channels_export_file,
-        model, debug=False):
-    """This function writes out an Anytone D878 channels import/export file"""
-
-    # Header for Anytone 868
-    header_row_868 = ['No.','Channel Name','Receive Frequency',
-                  'Transmit Frequency','Channel Type','Transmit Power',
-                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
-                  'Contact','Contact Call Type','Radio ID',
-                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
-                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
-                  'Slot','CH Scan List','Receive Group List','TX Prohibit',
-                  'Reverse','Simplex TDMA','TDMA Adaptive',
-                  'Encryption Type','Digital Encryption',
-                  'Call Confirmation','Talk Around','Work Alone',
-                  'Custom CTCSS','2TONE Decode','Ranging','Through Mode',
-                  'APRS Report','APRS Report Channel']
-
-    # Header for Anytone 578
-    header_row_578 = ['No.','Channel Name','Receive Frequency',
-                  'Transmit Frequency','Channel Type','Transmit Power',
-                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
-                  'Contact','Contact Call Type','Contact TG/DMR ID','Radio ID',
-                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
-                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
-                  'Slot','Scan List','Receive Group List','PTT Prohibit',
-                  'Reverse','TDMA','TDMA Adaptive',
-                  'AES Digital Encryption','Digital Encryption',
-                  'Call Confirmation','Talk Around(Simplex)','Work Alone',
-                  'Custom CTCSS','2TONE Decode','Ranging','Simplex',
-                  'Digi APRS RX','Analog APRS PTT Mode',
-                  'Digital APRS PTT Mode','APRS Report Type',
-                  'Digital APRS Report Channel','Correct Frequency[Hz]',
-                  'SMS Confirmation','Exclude channel from roaming',
-                  'DMR MODE','DataACK Disable','R5toneBot','R5ToneEot']
-
-    # Header for Anytone 878
-    header_row_878 = ['No.','Channel Name','Receive Frequency',
-                  'Transmit Frequency','Channel Type','Transmit Power',
-                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
-                  'Contact','Contact Call Type','Contact TG/DMR ID','Radio ID',
-                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
-                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
-                  'Slot','Scan List','Receive Group List','PTT Prohibit',
-                  'Reverse','Simplex TDMA','Slot Suit',
-                  'AES Digital Encryption','Digital Encryption',
-                  'Call Confirmation','Talk Around(Simplex)','Work Alone',
-                  'Custom CTCSS','2TONE Decode','Ranging','Through Mode',
-                  'Digi APRS RX','Analog APRS PTT Mode',
-                  'Digital APRS PTT Mode','APRS Report Type',
-                  'Digital APRS Report Channel','Correct Frequency[Hz]',
-                  'SMS Confirmation','Exclude channel from roaming',
-                  'DMR MODE','DataACK Disable','R5toneBot','R5ToneEot']
-
-    # Create a dataframe from the channels dict and output it...
-    channels_out_list = []
-    cnt = 1
-    for ch_name in channels_dict.keys():
-
-        # get channel attributes dictionary
-        attr_dict = channels_dict[ch_name]
-
-        # now fill out this row in correct order for Anytone 878
-        row_list = []
-        row_list.append(str(cnt))
-        cnt = cnt + 1
-        row_list.append(ch_name)
-        row_list.append(attr_dict['RX Freq'])   # Receive Frequency
-        row_list.append(attr_dict['TX Freq'])   # Transmit Frequency
-        ch_type = attr_dict['Ch Type']
-        if ch_type == "Analog":
-            row_list.append("A-Analog")
-        else:
-            row_list.append("D-Digital")        # Channel Type
-
-        # get power and translate "High" to "Turbo"
-        rf_power = attr_dict['Power']
-        if rf_power == "High":
-            rf_power = "Turbo"
-        row_list.append(rf_power)               # Transmit Power
-
-        row_list.append(attr_dict['Bandwidth']) # Bandwidth
-        row_list.append(attr_dict['CTCSS Decode'])  # CTCSS/DCS Decode
-        row_list.append(attr_dict['CTCSS Encode'])  # CTCSS/DCS Encode
-        if ch_type == "Analog":
-            # use fixed items
-            row_list.append("0_Analog")             # Talk Group
-            row_list.append("Group Call")           # Contact Call Type
-            if model != "868":
-                row_list.append("0")                # Contact TG/DMR ID
-            row_list.append("none")                 # Radio ID
-            row_list.append("0")                    # Busy Lock/TX Permit
-        else:
-            # use digital channel attributes
-            row_list.append(attr_dict['Talk Group'])# Talk Group
-            row_list.append(attr_dict['Call Type']) # Contact Call Type
-            if model != "868":
-                row_list.append(attr_dict['TG Number']) # Contact TG/DMR ID
-            row_list.append("My_DMR_ID")            # Radio ID
-            row_list.append(attr_dict['TX Permit']) # Busy Lock/TX Permit
-        row_list.append("Carrier")                  # Squelch Mode
-        row_list.append("Off")                      # Optional Signal
-        row_list.append("1")                        # DTMF ID
-        row_list.append("1")                        # 2Tone ID
-        row_list.append("1")                        # 5Tone ID
-        row_list.append("Off")                      # PTT ID
-        if ch_type == "Analog":
-            # use fixed items
-            row_list.append("1")                    # Color Code
-            row_list.append("1")                    # Time Slot
-        else:
-            # use digital channel attributes
-            row_list.append(attr_dict['Color Code'])# Color Code
-            row_list.append(attr_dict['Time Slot']) # Time Slot
-        row_list.append("None")                     # Scan List
-        row_list.append("None")                     # Receive Group List
-        row_list.append(attr_dict['RX Only'])       # PTT Prohibit
-        row_list.append("Off")                      # Reverse
-        row_list.append("Off")                      # Simplex TDMA
-        row_list.append("Off")                      # TDMA Adaptive
-        row_list.append("Normal Encryption")        # AES Digital Encryption
-        row_list.append("Off")                      # Digital Encryption
-        row_list.append("Off")                      # Call Confirmation
-        row_list.append("Off")                      # Talk Around
-        row_list.append("Off")                      # Work Alone
-        row_list.append("251.1")                    # Custom CTCSS
-        row_list.append("1")                        # 2TONE Decode
-        row_list.append("Off")                      # Ranging
-        row_list.append("Off")                      # Through Mode
-
-        if model == "868":
-           row_list.append("Off")                   # APRS Report
-           row_list.append("1")                     # APRS Channel
+def assign_channel_numbers(channels_dict, channel_numbers_dict,
+        debug=False):
+    """This function assigns a persistent number to every channel.
+
+    Channels already in channel_numbers_dict keep their number.  New
+    channels, taken in the usual analog-then-digital, by-name order, fill
+    the lowest free numbers first and then append.  Numbers of channels
+    that no longer exist are freed.  Returns the new name to No. dict.
+    """
+
+    new_numbers_dict = {}
+    used_number_set = set()
+    new_channel_list = []
+    for ch_name in sorted(channels_dict.keys(),
+            key=lambda name: (channels_dict[name]['Ch Type'], name)):
+        number = channel_numbers_dict.get(ch_name)
+        if number is None or number in used_number_set:
+            new_channel_list.append(ch_name)
         else:
-            row_list.append("Off")                  # Digi APRS RX
-            row_list.append("Off")                  # Analog APRS PTT Mode
-            row_list.append("Off")                  # Digital APRS PTT Mode
-            row_list.append("Off")                  # APRS Report Type
-            row_list.append("1")                # Digtial APRS Report Channel
-            row_list.append("0")                    # Correct Frequency[Hz]
-            row_list.append("Off")                  # SMS Confirmation
-            row_list.append("0")                # Exclude channel from roaming
-            # calculate DMR Mode
-            if (attr_dict['RX Freq'] == attr_dict['TX Freq']):
-                # assume simplex mode
-                row_list.append(0)
-            else:
-                row_list.append(1)
-            row_list.append("0")                    # DataACK Disable
-            row_list.append("0")                    # R5toneBot
-            row_list.append("0")                    # R5ToneEot
-
-        # now add this row to the channels list
-        channels_out_list.append(row_list)
-
-    if model == "868":
-        channels_out_df = pandas.DataFrame(channels_out_list,
-                            columns=header_row_868)
-    elif model == "578":
-        channels_out_df = pandas.DataFrame(channels_out_list,
-                            columns=header_row_578)
-    else:
-        channels_out_df = pandas.DataFrame(channels_out_list,
-                            columns=header_row_878)
-
-    # Group channels by Channel Type (analog then digital)
-    channels_out_df.sort_values(by=['Channel Type','Channel Name'],
-        inplace=True)
-    channels_out_df.reset_index(drop=True, inplace=True)
-
-    # renumber the "No." column to match new order
-    for i in range(len(channels_out_df.index)):
-        channels_out_df.at[i, 'No.'] = i+1
-
-
-    if debug:
-        print("Writing output to: ", channels_export_file)
-    channels_out_df.to_csv(channels_export_file, index=False,
-        header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+            new_numbers_dict.update({ch_name: number})
+            used_number_set.add(number)
+
+    # hand out the free slots in ascending order
+    next_number = 1
+    for ch_name in new_channel_list:
+        while next_number in used_number_set:
+            next_number += 1
+        if debug:
+            print("   Channel '{}' assigned number {}".format(ch_name,
+                next_number))
+        new_numbers_dict.update({ch_name: next_number})
+        used_number_set.add(next_number)
 
-    return
+    return new_numbers_dict
 
 
 
-def cs800d_write_channels_export(channels_dict, channels_export_file,
+def write_channel_numbers_file(channel_numbers_dict, file_path,
         debug=False):
-    """This function writes out a CS800D CPS formatted channels file"""
-
-    analog_header_row = ['No','Channel Alias','Squelch Level',
-                         'Channel Band[KHz]','Personality List','Scan List',
-                         'Auto Scan Start','Rx Only','Talk Around',
-                         'Lone Worker','VOX','Scrambler','Emp De-emp',
-                         'Receive Frequency',
-                         'RX CTCSS/CDCSS Type','CTCSS/CDCSS',
-                         'RX Ref Frequency','Rx Squelch Mode',
-                         'Monitor Squelch Mode',
-                         'Channel Switch Squelch Mode',
-                         'Transmit Frequency',
-                         'TX CTCSS/CDCSS Type','CTCSS/CDCSS',
-                         'TX Ref Frequency','Power Level','Tx Admit',
-                         'Reverse Burst/Turn off code',
-                         'TX Time-out Time[s]','TOT Re-key Time[s]',
-                         'TOT Pre-Alert Time[s]',
-                         'CTCSS Tail Revert Option']
-
-    digital_header_row = ['No','Channel Alias','Digital Id', 'Color Code',
-                         'Time Slot','Scan List','Auto Scan Start','Rx Only',
-                         'Talk Around', 'Lone Worker', 'VOX',
-                         'Receive Frequency',
-                         'RX Ref Frequency', 'RX Group List',
-                         'Emergency Alarm Indication',
-                         'Emergency Alarm Ack','Emergency Call Indication',
-                         'Transmit Frequency',
-                         'TX Ref Frequency','TX Contact',
-                         'Emergency System', 'Power Level','Tx Admit',
-                         'TX Time-out Time[s]','TOT Re-key Time[s]',
-                         'TOT Pre-Alert Time[s]','Private Call Confirmed',
-                         'Data Call Confirmed','Encrypt']
-
-    # setup analog channels dataframe
-    analog_channels_out_list = []
-    cnt = 1
-    total_channel_cnt = 0
-    for ch_name in sorted(channels_dict.keys()):
-        ch_type = channels_dict[ch_name]['Ch Type']
-
-        # skip non-analog channels
-        if ch_type != 'Analog':
-            continue
-
-        # get channel attributes dictionary
-        attr_dict = channels_dict[ch_name]
-
-        # now fill out this row in correct order for cs800d
-        row_list = []
-        row_list.append(str(cnt))
-        cnt = cnt + 1
-        row_list.append(ch_name)                    # Channel Alias
-        row_list.append("Normal")                   # Squelch level
-        row_list.append(attr_dict['Bandwidth'])     # Channel Bandwidth
-        row_list.append("Personality 1")            # Personality
-        row_list.append("None")                     # scan list
-        row_list.append("Off")                      # auto scan start
-        row_list.append(attr_dict['RX Only'])       # Rx Only
-        row_list.append("Off")                      # Talk around
-        row_list.append("Off")                      # Lone Worker
-        row_list.append("Off")                      # VOX
-        row_list.append("Off")                      # Scrambler
-        row_list.append("Off")                      # Emp De-emp
-        row_list.append(attr_dict['RX Freq'])       # Receive Frequency
-
-        # RX CTCSS/CDCSS Type & set rx_squelch_mode
-        ctcss_dcs_decode_val = str(attr_dict['CTCSS Decode'])
-        if ctcss_dcs_decode_val == "Off":
-            row_list.append("NONE")
-            row_list.append("NONE")
-            rx_squelch_mode = "CTCSS/DCS and Audio"
-        elif ctcss_dcs_decode_val in ctcss_list:
-            row_list.append("CTCSS")
-            row_list.append(float(ctcss_dcs_decode_val))
-            rx_squelch_mode = "CTCSS/DCS and Audio"
-        elif ctcss_dcs_decode_val in cdcss_list:
-            row_list.append("CDCSS")
-            row_list.append(ctcss_dcs_decode_val[1:4])
-            rx_squelch_mode = "CTCSS/DCS and Audio"
-        else:
-            # we should never get here!
-            print("ERROR:  Invalid ctcss_dcs_decode_val '{}'".format(
-                ctcss_dcs_decode_val))
-            sys.exit(-1)
-
-        # Compute RX Ref Frequency
-        if float(attr_dict['RX Freq']) > 180.0:
-            row_list.append("Low")  # RX Ref Frequency (VHF/2 meters)
-        else:
-            row_list.append("Low")  # RX Ref Frequency (UHF/70cm )
-
-        row_list.append(rx_squelch_mode)    # Rx squelch mode
-        row_list.append("Carrier")          # Monitor squelch mode
-        row_list.append("RX Squelch Mode")  # Channel switch squelch mode
-
-        row_list.append(attr_dict['TX Freq'])       # Transmit Frequency
-
-        # TX CTCSS/CDCSS Type
-        ctcss_dcs_encode_val = str(attr_dict['CTCSS Encode'])
-        if ctcss_dcs_encode_val == "Off":
-            row_list.append("NONE")
-            row_list.append("NONE")
-        elif ctcss_dcs_encode_val in ctcss_list:
-            row_list.append("CTCSS")
-            row_list.append(float(ctcss_dcs_encode_val))
-        elif ctcss_dcs_encode_val in cdcss_list:
-            row_list.append("CDCSS")
-            row_list.append(ctcss_dcs_encode_val[1:4])
-        else:
-            # we should never get here!
-            print("ERROR:  Invalid ctcss_dcs_encode_val '{}'".format(
-                ctcss_dcs_encode_val))
-            sys.exit(-1)
-
-        # Compute TX Ref Frequency
-        if float(attr_dict['TX Freq']) > 180.0:
-            row_list.append("Middle")     # TX Ref Frequency (VHF/2 meters)
-        else:
-            row_list.append("Low")        # TX Ref Frequency (UHF/70cm )
-
-        # Power level
-        power_level = attr_dict['Power']
-        if power_level in ['Turbo','High']:
-            row_list.append("High")
-        else:
-            row_list.append("Low")
-        row_list.append("Always Allow")   # TX Admit
-        row_list.append("Off")            # Reverse Burst/Turn off code
-        row_list.append("180")            # TX Time-out Time[s]
-        row_list.append("0")              # TOT Re-key Time[s]
-        row_list.append("10")             # TOT Pre-Alert Time[s]
-        row_list.append("120")            # CTCSS Tail Revert Option
-
-        # now add the row for this channel to our analog channels list
-        analog_channels_out_list.append(row_list)
-
-        # Need to ensure max channel count isn't reached
-        total_channel_cnt += 1
-        if total_channel_cnt > 2000:
-            print("   ERROR:  Maximum channel count (2000) exceeded.")
-            print("Aborting...")
-            sys.exit(-1)
+    """This function writes out the channel numbers file sorted by No."""
 
-    # create the analog channels data frame
-    analog_channels_out_df = pandas.DataFrame(analog_channels_out_list,
-                                              columns=analog_header_row)
+    channel_numbers_out_list = []
+    for ch_name in sorted(channel_numbers_dict.keys(),
+            key=channel_numbers_dict.get):
+        channel_numbers_out_list.append([channel_numbers_dict[ch_name],
+            ch_name])
+    channel_numbers_out_df = pandas.DataFrame(channel_numbers_out_list,
+        columns=['No.','Channel Name'])
 
-    # setup digital channels dataframe
-    digital_channels_out_list = []
-    cnt = 1
-    for ch_name in sorted(channels_dict.keys()):
-        ch_type = channels_dict[ch_name]['Ch Type']
+    if debug:
+        print("Writing output to: ", file_path)
+    channel_numbers_out_df.to_csv(file_path, index=False, header=True)
 
-        # skip analog channels
-        if ch_type != 'Digital':
-            continue
+    return
 
-        # get channel attributes dictionary
-        attr_dict = channels_dict[ch_name]
 
-        # now fill out this row in correct order for cs800d
-        row_list = []
-        row_list.append(str(cnt))
-        cnt = cnt + 1
-        row_list.append(ch_name)            # Channel Alias
-        row_list.append("0")                # Digital ID
-        row_list.append(attr_dict['Color Code'])    # Color Code
-        if str(attr_dict['Time Slot']) == '1':      # Time Slot
-            row_list.append("Slot 1")
-        else:
-            row_list.append("Slot 2")
-        row_list.append("None")             # Scan List
-        row_list.append("Off")              # Auto Scan Start
-        row_list.append(attr_dict['RX Only'])       # Rx Only
-        row_list.append("Off")              # Talk around
-        row_list.append("Off")              # Lone Worker
-        row_list.append("Off")              # VOX
-        row_list.append(attr_dict['RX Freq'])       # Receive Frequency
-
-        # compute RX Ref Frequency
-        if float(attr_dict['RX Freq']) > 180.0:
-            row_list.append("Middle")   # RX Ref Frequency (VHF/2 meters)
-        else:
-            row_list.append("Middle")   # RX Ref Frequency (UHF/70cm )
 
-        row_list.append("None")             # RX Receive Group
-        row_list.append("Off")              # Emergency Alarm Indication
-        row_list.append("Off")              # Emergency Alarm Ack
-        row_list.append("Off")              # Emergency Call Indication
-        row_list.append(attr_dict['TX Freq'])       # Transmit Frequency
+def suggest_short_name(full_name, taken_set):
+    """This function suggests a unique name of 16 characters or less."""
 
-        # compute TX Ref Frequency
-        if float(attr_dict['TX Freq']) > 180.0:
-            row_list.append("Middle")   # TX Ref Frequency (VHF/2 meters)
-        else:
-            row_list.append("Middle")   # TX Ref Frequency (UHF/70cm )
+    word_list = full_name.split()
+    candidate_list = []
 
-        # Need to translate non-alphanumeric characters to spaces
-        talk_group_str = re.sub('[^0-9a-zA-Z~ ]+', ' ', attr_dict['Talk Group'])
-        row_list.append(talk_group_str)  # TX Contact
-        row_list.append("None")             # Emergency System
+    # squeeze out spaces, then vowels after the first letter of each word
+    squeezed = ''.join(word_list)
+    candidate_list.append(squeezed)
+    candidate_list.append(''.join([word[0] + re.sub('[aeiou]', '', word[1:])
+                                   for word in word_list]))
 
-        # Power level
-        power_level = attr_dict['Power']
-        if power_level in ['Turbo','High']:
-            row_list.append("High")
-        else:
-            row_list.append(power_level)
-
-        # TX Admit (admit criteria)
-        dict_admit_criteria = attr_dict['TX Permit']
-        admit_criteria = "ERROR!"  # just in case...
-        if dict_admit_criteria == "Always":
-            admit_criteria = "Always"
-        elif dict_admit_criteria in ['ChannelFree','Different Color Code']:
-            admit_criteria = "Channel Idle"
-        elif dict_admit_criteria == "Same Color Code":
-            admit_criteria = "Color Code Free"
-        row_list.append(admit_criteria)     # TX Admit
-
-        row_list.append("180")              # TX Time-out Time[s]
-        row_list.append("0")                # TOT Re-key Time[s]
-        row_list.append("10")               # TOT Pre-Alert Time[s]
-        row_list.append("Off")              # Private Call Confirmed
-        row_list.append("Off")              # Data Call Confirmed
-        row_list.append("Off")              # Encrypt
-
-        # now add the row for this channel to our digital channels list
-        digital_channels_out_list.append(row_list)
-
-        # Need to ensure max channel count isn't reached
-        total_channel_cnt += 1
-        if total_channel_cnt > 2000:
-            print("   ERROR:  Maximum channel count (2000) exceeded.")
-            print("Aborting...")
-            sys.exit(-1)
+    # keep the distinguishing tail word
+    if len(word_list) > 1:
+        tail = word_list[-1][:7]
+        candidate_list.append(full_name[:15 - len(tail)].rstrip() + ' ' + tail)
 
-    # create the digital channels data frame
-    digital_channels_out_df = pandas.DataFrame(digital_channels_out_list,
-                                               columns=digital_header_row)
+    for candidate in candidate_list:
+        if len(candidate) <= 16 and candidate not in taken_set:
+            return candidate
 
-    # Create a Pandas Excel writer using XlsxWriter as the engine.
-    if debug:
-        print("Writing output to: ", channels_export_file)
-    writer = pandas.ExcelWriter(channels_export_file, engine='xlsxwriter')
-    analog_channels_out_df.to_excel(writer,
-        sheet_name="Analog Channel", index=False)
-    digital_channels_out_df.to_excel(writer,
-        sheet_name="Digital Channel", index=False)
+    # fall back to a numbered name
+    n = 1
+    while True:
+        candidate = "{}~{}".format(full_name[:15 - len(str(n))], n)
+        if candidate not in taken_set:
+            return candidate
+        n += 1
 
-    writer.save()
 
-    return
 
+def find_truncation_collisions(names_index):
+    """This function finds distinct names that truncate to the same name.
 
+    Returns a list of (kind, truncated name, name_list) where name_list
+    holds (full name, source, suggestion) in load order.  The first name
+    keeps the truncated form (suggestion None); the others get a unique
+    suggested name.
+    """
 
-def cs800d_write_talk_groups_export(talk_groups_dict,talk_groups_export_file, debug=False):
-    """This function writes out a Connect Systems CS800D formatted talk groups import file."""
-
-    # Create a dataframe from the talk groups dict and output it...
-    header_row = ['No','Call Alias','Call Type','Call ID','Receive Tone']
-    talk_groups_out_list = []
-    cnt = 1
-    for tg_id in sorted(talk_groups_dict.keys()):
-        row_list = []
-        #row_list.append(str(cnt))
-        row_list.append(cnt)
-        cnt = cnt + 1
-        tg_name = talk_groups_dict[tg_id][0]
-
-        # Need to translate non-alphanumeric characters to spaces
-        tg_name = re.sub('[^0-9a-zA-Z~ ]+', ' ', tg_name)
-        tg_name.strip()
-
-        if len(tg_name) > 16:
-            print("WARNING:  TG Name '{}' > 16, truncating to '{}'".format(tg_name,tg_name[:16]))
-        row_list.append(tg_name[:16])
-        tg_call_type = talk_groups_dict[tg_id][1]
-        row_list.append(tg_call_type)
-        row_list.append(tg_id)
-        tg_call_alert = talk_groups_dict[tg_id][2]
-        if tg_call_alert == "None":
-            tg_call_alert = "No"
-        else:
-            tg_call_alert = "Yes"
-        row_list.append(tg_call_alert)
-        talk_groups_out_list.append(row_list)
-    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list, columns=header_row)
+    collision_list = []
+    for kind in sorted(names_index.keys()):
+        short_dict = names_index[kind]
+        taken_set = set(short_dict.keys())
+        for short_name in short_dict.keys():
+            full_dict = short_dict[short_name]
+            if len(full_dict) < 2:
+                continue
+            key_set = set([full_dict[full_name][1] for full_name in full_dict])
+            if len(key_set) < 2:
+                continue
+            name_list = []
+            seen_key_set = set()
+            for full_name in full_dict.keys():
+                source, key = full_dict[full_name]
+                if len(seen_key_set) == 0 or key in seen_key_set:
+                    suggestion = None
+                else:
+                    suggestion = suggest_short_name(full_name, taken_set)
+                    taken_set.add(suggestion)
+                seen_key_set.add(key)
+                name_list.append((full_name, source, suggestion))
+            collision_list.append((kind, short_name, name_list))
 
-    if debug:
-        print("Writing output to: ", talk_groups_export_file)
+    return collision_list
 
-    # Create a Pandas Excel writer using XlsxWriter as the engine.
-    writer = pandas.ExcelWriter(talk_groups_export_file, engine='xlsxwriter')
-    talk_groups_out_df.to_excel(writer, sheet_name="DMR_Contacts", index=False)
-    writer.save()
 
-    return
 
+def expand_search_ranges(lo_array, hi_array):
+    """This function expands searchsorted [lo, hi) ranges into index pairs.
 
+    Returns (row_array, pos_array) listing, for every row i, each sorted
+    position from lo_array[i] up to hi_array[i].
+    """
 
-def opengd77_write_talk_groups_export(talk_groups_dict,talk_groups_export_file,
-        debug=False):
-    """This function writes out an Open GD77 formatted talk groups import file."""
+    count_array = hi_array - lo_array
+    total = int(count_array.sum())
+    row_array = numpy.repeat(numpy.arange(len(lo_array)), count_array)
+    start_array = numpy.repeat(numpy.cumsum(count_array) - count_array,
+        count_array)
+    pos_array = (numpy.arange(total) - start_array +
+                 numpy.repeat(lo_array, count_array))
 
-    return
+    return row_array, pos_array
 
 
 
-def opengd77_write_channels_export(channels_dict, channels_export_file,
-        debug=False):
-    """This function writes out an Open GD77 CPS formatted channels file"""
+def analyze_frequency_conflicts(channels_dict, tolerance_hz=6250,
+        chunk_size=256, debug=False):
+    """This function finds TX/RX conflicts and 3rd order intermod hits.
 
-    return
+    Channels are reduced to unique frequencies held in NumPy arrays and
+    matched with sort/searchsorted within tolerance_hz:
 
+    'TX/RX'  a TX-enabled channel transmits on another channel's RX
+             frequency (channels sharing the same RX/TX pair are skipped)
+    'IM3'    2*f1 - f2 of two TX frequencies lands on an RX frequency; the
+             f1 rows are processed chunk_size at a time to bound memory
 
+    Returns a list of report rows (see frequency_conflicts_header).
+    """
 
+    # index channel names by frequency pair and by single frequency
+    pair_names_dict = {}
+    rx_names_dict = {}
+    tx_names_dict = {}
+    tx_pair_set = set()
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        rx_hz = attr_dict['RX Freq']
+        tx_hz = attr_dict['TX Freq']
+        pair_names_dict.setdefault((rx_hz, tx_hz), []).append(ch_name)
+        rx_names_dict.setdefault(rx_hz, []).append(ch_name)
+        if attr_dict['RX Only'] != "On":
+            tx_names_dict.setdefault(tx_hz, []).append(ch_name)
+            tx_pair_set.add((rx_hz, tx_hz))
+
+    def names_str(name_list):
+        return '|'.join(sorted(name_list))
+
+    report_list = []
+
+    # TX/RX: every TX-enabled pair against every pair's RX frequency
+    victim_pair_list = sorted(pair_names_dict.keys())
+    source_pair_list = sorted(tx_pair_set)
+    if len(victim_pair_list) > 0 and len(source_pair_list) > 0:
+        victim_array = numpy.array(victim_pair_list, dtype=numpy.int64)
+        source_array = numpy.array(source_pair_list, dtype=numpy.int64)
+        order_array = numpy.argsort(victim_array[:,0], kind='stable')
+        victim_rx_sorted = victim_array[order_array,0]
+        lo_array = numpy.searchsorted(victim_rx_sorted,
+            source_array[:,1] - tolerance_hz, side='left')
+        hi_array = numpy.searchsorted(victim_rx_sorted,
+            source_array[:,1] + tolerance_hz, side='right')
+        src_array, pos_array = expand_search_ranges(lo_array, hi_array)
+        vic_array = order_array[pos_array]
+        same_pair_array = (
+            (numpy.abs(source_array[src_array,0] -
+                       victim_array[vic_array,0]) <= tolerance_hz) &
+            (numpy.abs(source_array[src_array,1] -
+                       victim_array[vic_array,1]) <= tolerance_hz))
+        for src, vic in zip(src_array[~same_pair_array],
+                            vic_array[~same_pair_array]):
+            source_pair = source_pair_list[src]
+            victim_pair = victim_pair_list[vic]
+            report_list.append(['TX/RX', victim_pair[0] / 1000000.0,
+                names_str(pair_names_dict[victim_pair]),
+                "{}".format(source_pair[1] / 1000000.0),
+                names_str([name for name in pair_names_dict[source_pair]
+                           if name in tx_names_dict[source_pair[1]]]), 1])
+
+    # IM3: 2*f1 - f2 for every ordered pair of distinct TX frequencies
+    tx_array = numpy.array(sorted(tx_names_dict.keys()), dtype=numpy.int64)
+    rx_array = numpy.array(sorted(rx_names_dict.keys()), dtype=numpy.int64)
+    hit_count_dict = {}
+    hit_example_dict = {}
+    if len(tx_array) > 1 and len(rx_array) > 0:
+        for start in range(0, len(tx_array), chunk_size):
+            f1_array = tx_array[start:start + chunk_size]
+            product_array = 2 * f1_array[:,None] - tx_array[None,:]
+            distinct_array = f1_array[:,None] != tx_array[None,:]
+            f1_idx_array, f2_idx_array = numpy.nonzero(distinct_array)
+            product_array = product_array[distinct_array]
+            lo_array = numpy.searchsorted(rx_array,
+                product_array - tolerance_hz, side='left')
+            hi_array = numpy.searchsorted(rx_array,
+                product_array + tolerance_hz, side='right')
+            hit_array = numpy.nonzero(hi_array > lo_array)[0]
+            if len(hit_array) == 0:
+                continue
+            row_array, pos_array = expand_search_ranges(lo_array[hit_array],
+                hi_array[hit_array])
+            victim_hz_array = rx_array[pos_array]
+            f1_hit_array = f1_array[f1_idx_array[hit_array[row_array]]]
+            f2_hit_array = tx_array[f2_idx_array[hit_array[row_array]]]
+
+            # aggregate per victim frequency, keeping the first example
+            victim_unique_array, first_array, count_array = numpy.unique(
+                victim_hz_array, return_index=True, return_counts=True)
+            for j in range(len(victim_unique_array)):
+                victim_hz = int(victim_unique_array[j])
+                hit_count_dict.update({victim_hz:
+                    hit_count_dict.get(victim_hz, 0) + int(count_array[j])})
+                if victim_hz not in hit_example_dict:
+                    hit_example_dict.update({victim_hz: (
+                        int(f1_hit_array[first_array[j]]),
+                        int(f2_hit_array[first_array[j]]))})
+        for victim_hz in sorted(hit_count_dict.keys()):
+            f1_hz, f2_hz = hit_example_dict[victim_hz]
+            report_list.append(['IM3', victim_hz / 1000000.0,
+                names_str(rx_names_dict[victim_hz]),
+                "2x{} - {}".format(f1_hz / 1000000.0, f2_hz / 1000000.0),
+                names_str(tx_names_dict[f1_hz] + tx_names_dict[f2_hz]),
+                hit_count_dict[victim_hz]])
 
-def uv380_write_talk_groups_export(talk_groups_dict,talk_groups_export_file,
-        tytera_tg_index_dict, debug=False):
-    """This function writes out a Tytera uv380 CPS formatted talk groups import file."""
+    if debug:
+        print("   Found {} frequency conflicts".format(len(report_list)))
 
-    # Prepare a dataframe from the talk groups dict
-    header_row = ['Contact Name','Call Type','Call ID','Call Receive Tone']
-    talk_groups_out_list = []
-    cnt = 1
-    for tg_id in sorted(talk_groups_dict.keys()):
-        row_list = []
+    return report_list
 
-        # Contact Name
-        tg_name = talk_groups_dict[tg_id][0]
-        if len(tg_name) > 16:
-            print("WARNING:  TG Name '{}' > 16, truncating to '{}'".format(
-                tg_name,tg_name[:16]))
-        row_list.append(tg_name[:16])
 
-        # Call Type
-        tytera_call_type_dict = {'Group Call':'1','Private Call':'2'}
-        tg_call_type = talk_groups_dict[tg_id][1]
-        if tg_call_type not in tytera_call_type_dict.keys():
-            print("ERROR:  Can't convert '{}' to Tytera call type!".format(
-                tg_call_type))
-            print("        Aborting.")
-            sys.exit(-1)
-        row_list.append(tytera_call_type_dict[tg_call_type])
-
-        # Call ID
-        row_list.append(tg_id)
-
-        # Call Receive Tone
-        tytera_call_alert_dict = {'None':'0','Yes':'1'}
-        tg_call_alert = talk_groups_dict[tg_id][2]
-        if tg_call_alert not in tytera_call_alert_dict.keys():
-            print("ERROR:  Can't convert '{}' to Tytera call alert!".format(
-                tg_call_alert))
-            print("        Aborting.")
-            sys.exit(-1)
-        row_list.append(tytera_call_alert_dict[tg_call_alert])
+# Columns of the frequency conflicts report
+frequency_conflicts_header = ['Conflict','Victim RX (MHz)','Victim Channels',
+                              'Source TX (MHz)','Source Channels',
+                              'Product Count']
 
-        # append the row to our list
-        talk_groups_out_list.append(row_list)
 
-        # Update tytera_tg_index_dict so we can translate in channels file
-        tytera_tg_index_dict.update({tg_name[:16]:cnt})
-        cnt = cnt + 1
+def write_frequency_conflicts_report(report_list, report_file, debug=False):
+    """This function writes out the frequency conflicts report .csv file"""
 
-    # Create the data frame
-    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list,
-        columns=header_row)
+    report_out_df = pandas.DataFrame(report_list,
+        columns=frequency_conflicts_header)
 
-    # Output the data frame as CSV file
     if debug:
-        print("Writing output to: ", talk_groups_export_file)
-    talk_groups_out_df.to_csv(talk_groups_export_file, index=False,
-            header=True, quoting=csv.QUOTE_NONE, line_terminator='\r\n')
-
-    # clean up...
-    del talk_groups_out_list
-    del talk_groups_out_df
+        print("Writing output to: ", report_file)
+    report_out_df.to_csv(report_file, index=False, header=True)
 
     return
 
 
 
-def uv380_write_channels_export(channels_dict, channels_export_file,
-        tytera_tg_index_dict, debug=False):
-    """This function writes out a Tytera uv380 CPS formatted channels file"""
-
-    header_row = ['Channel Mode','Channel Name','RX Frequency(MHz)',
-                  'TX Frequency(MHz)','Band Width','Scan List','Squelch',
-                  'RX Ref Frequency','TX Ref Frequency','TOT[s]',
-                  'TOT Rekey Delay[s]','Power','Admit Criteria',
-                  'Auto Scan','Rx Only','Lone Worker','VOX',
-                  'Allow Talkaround','Send GPS Info','Receive GPS Info',
-                  'Private Call Confirmed','Emergency Alarm Ack',
-                  'Data Call Confirmed','Allow Interrupt','DCDM Switch',
-                  'Leader/MS','Emergency System','Contact Name',
-                  'Group List','Color Code','Repeater Slot',
-                  'In Call Criteria','Privacy','Privacy No.',
-                  'GPS System','CTCSS/DCS Dec','CTCSS/DCS Enc',
-                  'Rx Signaling System','Tx Signaling System',
-                  'QT Reverse','Non-QT/DQT Turn-off Freq',
-                  'Display PTT ID','Reverse Burst/Turn-off Code',
-                  'Decode 1','Decode 2','Decode 3','Decode 4',
-                  'Decode 5','Decode 6','Decode 7','Decode 8'
-                 ]
-
-    # Create a dataframe from the channels dict and output it...
-    channels_out_list = []
-    cnt = 1
-    for ch_name in channels_dict.keys():
+def channel_signature(attr_dict):
+    """This function returns the on-air signature of a channel.
 
-        # get channel attributes dictionary
-        attr_dict = channels_dict[ch_name]
+    Two channels with the same signature (RX, TX, mode, color code, slot,
+    TG ID and tones) behave identically on the radio whatever their names.
+    """
 
-        # now fill out this row in correct order for Tytera uv380
-        row_list = []
-        ch_type = attr_dict['Ch Type']
-        if ch_type == "Analog":
-            row_list.append('1')                # Channel Mode
-        else:
-            row_list.append('2')                # Channel Mode
-        row_list.append(ch_name)                # Channel Name
-        row_list.append(attr_dict['RX Freq'])   # Receive Frequency(MHz)
-        row_list.append(attr_dict['TX Freq'])   # Transmit Frequency(MHz)
-
-        # translate bandwidth to Tytera 0 (12.5K), 1 (20), or 2 (25K)
-        if ch_type == "Analog":
-            tytera_bandwidth_dict = {'12.5K':'0', '20K':'1', '25K':'2'}
-            bandwidth = attr_dict['Bandwidth']
-            if bandwidth not in tytera_bandwidth_dict.keys():
-                print("ERROR:  Can't convert '{}' to Tytera bandwidth!".format(
-                    bandwidth))
-                print("        Aborting.")
-                sys.exit(-1)
-            row_list.append(tytera_bandwidth_dict[bandwidth])
-        else:
-            row_list.append('0')
-
-
-        row_list.append('0')                # Scan List
-        row_list.append('1')                # Squelch
-        row_list.append('0')                # RX Ref Frequency
-        row_list.append('0')                # TX Ref Frequency
-        row_list.append('8')                # TOT[s] (index 8 = 120s)
-        row_list.append('0')                # TOT Rekey Delay[s]
-
-        # translate power to Tytera 0 (Low), 1 (Middle), or 2 (High)
-        tytera_power_dict = {'Low':'0', 'Medium':'1',
-                             'High':'2', 'Turbo':'2' }
-        power = attr_dict['Power']
-        if power not in tytera_power_dict.keys():
-            print("ERROR:  Can't convert '{}' to Tytera power!".format(
-                power))
-            print("        Aborting.")
-            sys.exit(-1)
-        row_list.append(tytera_power_dict[power]) # Power
+    if attr_dict['Ch Type'] == "Digital":
+        digital_tuple = (normalize_diff_value(attr_dict['Color Code']),
+                         normalize_diff_value(attr_dict['Time Slot']),
+                         normalize_diff_value(attr_dict['TG Number']))
+    else:
+        digital_tuple = (None, None, None)
 
-        # Admit Criteria
-        if ch_type == 'Analog':
-            row_list.append('0')
-        else:
-            # translate Admit Criteria to Tytera 0 (Always), 3 (Color Code)
-            tytera_admit_criteria_dict = {'Always':'0', 'Same Color Code':'3'}
-            admit_criteria = attr_dict['TX Permit']
-            if admit_criteria not in tytera_admit_criteria_dict.keys():
-                print("ERROR:  Can't convert '{}' to Tytera admit criteria!".format(
-                    admit_criteria))
-                print("        Aborting.")
-                sys.exit(-1)
-            row_list.append(tytera_admit_criteria_dict[admit_criteria])
+    return ((attr_dict['RX Freq'],
+             attr_dict['TX Freq'], attr_dict['Ch Type']) +
+            digital_tuple +
+            (normalize_diff_value(attr_dict['CTCSS Decode']),
+             normalize_diff_value(attr_dict['CTCSS Encode'])))
 
-        row_list.append('0')                # Auto Scan
-        if attr_dict['RX Only'] == "On":
-            row_list.append('1')            # Rx Only
-        else:
-            row_list.append('0')            # Rx Only
-        row_list.append('0')                # Lone Worker
-        row_list.append('0')                # VOX
-        row_list.append('0')                # Allow Talkaround
-        row_list.append('0')                # Send GPS
-        row_list.append('0')                # Receive GPS Info
-        row_list.append('0')                # Private Call Confirmed
-        row_list.append('0')                # Emergency Alarm Ack
-        row_list.append('0')                # Data Call Confirmed
-        row_list.append('0')                # Allow Interrupt
-        row_list.append('0')                # DCDM Switch
-        row_list.append('1')                # Leader/MS
-        row_list.append('0')                # Emergency System
-
-        # Contact Name
-        if ch_type == 'Analog':
-            row_list.append('0')
-        else:
-            talk_group_str = attr_dict['Talk Group']
-            if talk_group_str not in tytera_tg_index_dict.keys():
-                print("ERROR:  Can't convert '{}' to Tytera TG Index!".format(
-                    talk_group_str))
-                print("        Aborting.")
-                sys.exit(-1)
-            row_list.append(tytera_tg_index_dict[talk_group_str])
 
-        row_list.append('0')                # Group List
 
-        # Color Code
-        if ch_type == 'Analog':
-            row_list.append('1')
-        else:
-            row_list.append(attr_dict['Color Code'])
+def find_duplicate_channels(channels_dict, debug=False):
+    """This function finds channels defined more than once under new names.
 
-        # Repeater Slot
-        if ch_type == 'Analog':
-            row_list.append('0')
-        else:
-            # translate Repeater Slot to Tytera 0 (Slot 1), 1 (Slot 2)
-            tytera_time_slot_dict = {'1':'0', '2':'1'}
-            time_slot = str(attr_dict['Time Slot'])
-            if time_slot not in tytera_time_slot_dict.keys():
-                print("ERROR:  Can't convert '{}' to Tytera time slot!".format(
-                    time_slot))
-                print("        Channel name = {}".format(ch_name))
-                print("        Aborting.")
-                sys.exit(-1)
-            row_list.append(tytera_time_slot_dict[time_slot])
+    Returns a dict mapping the first-defined channel name to the list of
+    later channel names with the same signature.
+    """
 
-        # In Call Criteria
-        if ch_type == 'Analog':
-            row_list.append('0')
+    first_by_signature_dict = {}
+    duplicates_dict = {}
+    for ch_name in channels_dict.keys():
+        signature = channel_signature(channels_dict[ch_name])
+        first_name = first_by_signature_dict.get(signature)
+        if first_name is None:
+            first_by_signature_dict.update({signature: ch_name})
         else:
-            row_list.append('1')    # force "Follow Admit Criteria"
-
-        row_list.append('0')        # Privacy
-        row_list.append('0')        # Privacy No.
-        row_list.append('0')        # GPS System
-        row_list.append(attr_dict['CTCSS Decode'])  # CTCSS/DCS Dec
-        row_list.append(attr_dict['CTCSS Encode'])  # CTCSS/DCS Enc
-        row_list.append('0')        # Rx Signaling System
-        row_list.append('0')        # Tx Signaling System
-        row_list.append('0')        # QT Reverse
-        row_list.append('2')        # Non-QT/DQT Turn-off Freq
-        row_list.append('1')        # Display PTT ID
-        row_list.append('1')        # Reverse Burst/Turn-off Code
-        row_list.append('0')        # Decode 1
-        row_list.append('0')        # Decode 2
-        row_list.append('0')        # Decode 3
-        row_list.append('0')        # Decode 4
-        row_list.append('0')        # Decode 5
-        row_list.append('0')        # Decode 6
-        row_list.append('0')        # Decode 7
-        row_list.append('0')        # Decode 8
-
-        # now add this row to the channels list
-        channels_out_list.append(row_list)
-
-    # Create data frame
-    channels_out_df = pandas.DataFrame(channels_out_list, columns=header_row)
-
-    # Group channels by Channel Type (analog then digital)
-    channels_out_df.sort_values(by=['Channel Mode','Channel Name'],
-        inplace=True)
-    channels_out_df.reset_index(drop=True, inplace=True)
-
-    # Write CSV file
-    if debug:
-        print("Writing output to: {}".format(channels_export_file))
-    channels_out_df.to_csv(channels_export_file, index=False,
-        header=True, quoting=csv.QUOTE_NONE, line_terminator='\r\n')
+            duplicates_dict.setdefault(first_name, []).append(ch_name)
+            if debug:
+                print("   '{}' duplicates '{}'".format(ch_name, first_name))
 
-    return
+    return duplicates_dict
 
 
 
-def read_zone_order_file(file_path, debug=False):
-    """This function reads the Zone_Order.csv file and builds the zones_order_list."""
+def merge_duplicate_channels(channels_dict, zones_dict, duplicates_dict,
+        debug=False):
+    """This function merges duplicate channels into the first definition.
 
-    # read in the Zone_Order.csv file
-    if debug:
-        print("Processing: {}".format(file_path))
-    zones_order_df = pandas.read_csv(file_path)
+    Every zone that referenced a duplicate now references the kept
+    channel instead (once per zone), and the duplicates are removed.
+    """
 
-    # loop through k7abd file rows
-    zones_order_list = []
-    for i,row in zones_order_df.iterrows():
+    replacement_dict = {}
+    for first_name in duplicates_dict.keys():
+        for dup_name in duplicates_dict[first_name]:
+            replacement_dict.update({dup_name: first_name})
 
-        # get zone
-        zone_name = row['Zone Name']
-        zones_order_list.append(zone_name)
+    for zone_name in zones_dict.keys():
+        member_list = []
+        member_set = set()
+        for ch_name in zones_dict[zone_name]:
+            ch_name = replacement_dict.get(ch_name, ch_name)
+            if ch_name not in member_set:
+                member_list.append(ch_name)
+                member_set.add(ch_name)
+        zones_dict.update({zone_name: member_list})
+
+    for dup_name in replacement_dict.keys():
+        if debug:
+            print("   Merged '{}' into '{}'".format(dup_name,
+                replacement_dict[dup_name]))
+        del channels_dict[dup_name]
 
-    if debug:
-        print("   Returning zones_order_list: {}".format(zones_order_list))
+    return
 
-    return zones_order_list
 
 
+def read_band_plan_file(file_path, debug=False):
+    """This function reads the band plan .csv file into an interval index.
 
-def read_tg_filter_file(file_path, debug=False):
-    """This function reads a talkgroup filter .csv file and builds the tg_filter_list."""
+    Rows are sorted by lower edge (integer Hz) with a running maximum of
+    the upper edges, so the rows containing a frequency can be found with
+    one bisect plus a short walk back over any overlapping rows.
+    """
 
-    # read in the talk group filter .csv file
+    # read in the band plan .csv file
     if debug:
         print("Processing: {}".format(file_path))
-    talk_group_filter_df = pandas.read_csv(file_path)
+    band_plan_df = pandas.read_csv(file_path, dtype=str)
+    band_plan_df.fillna('Any', inplace=True)
 
     # loop through file rows
-    tg_filter_list = []
-    for i,row in talk_group_filter_df.iterrows():
-
-        # get talk group name
-        tg_name = row['TG Name']
-        tg_filter_list.append(tg_name)
+    band_list = []
+    for i,row in band_plan_df.iterrows():
+        lower_hz = freq_to_hz(row['Lower (MHz)'])
+        upper_hz = freq_to_hz(row['Upper (MHz)'])
+        if row['Modes'] == 'Any':
+            mode_set = None
+        else:
+            mode_set = set(row['Modes'].split('|'))
+        if row['Bandwidths'] == 'Any':
+            bandwidth_set = None
+        else:
+            bandwidth_set = set([normalize_diff_value(bandwidth) for
+                bandwidth in row['Bandwidths'].split('|')])
+        band_list.append((lower_hz, upper_hz, row['Service'],
+            row['License Class'], mode_set, bandwidth_set))
+    band_list.sort(key=lambda band: band[0])
+
+    max_upper_list = []
+    max_upper_hz = None
+    for band in band_list:
+        if max_upper_hz is None or band[1] > max_upper_hz:
+            max_upper_hz = band[1]
+        max_upper_list.append(max_upper_hz)
 
     if debug:
-        print("   Returning tg_filter_list: {}".format(tg_filter_list))
+        print("   Returning {} band plan rows".format(len(band_list)))
 
-    return tg_filter_list
+    return {'lowers': [band[0] for band in band_list],
+            'max uppers': max_upper_list, 'bands': band_list}
 
 
 
-def read_rptr_filter_file(file_path, debug=False):
-    """This function reads a repeater filter .csv file and builds the rptr_filter_list."""
+def find_band_plan_rows(band_plan, freq_hz):
+    """This function returns the band plan rows containing a frequency."""
 
-    # read in the repeater filter .csv file
-    if debug:
-        print("Processing: {}".format(file_path))
-    rptr_filter_df = pandas.read_csv(file_path)
+    band_list = []
+    i = bisect.bisect_right(band_plan['lowers'], freq_hz) - 1
+    while i >= 0 and band_plan['max uppers'][i] >= freq_hz:
+        band = band_plan['bands'][i]
+        if band[1] >= freq_hz:
+            band_list.append(band)
+        i -= 1
 
-    # loop through file rows
-    rptr_filter_list = []
-    for i,row in rptr_filter_df.iterrows():
+    return band_list
 
-        # get talk group name
-        rptr_name = row['Repeater Name']
-        rptr_filter_list.append(rptr_name)
 
-    if debug:
-        print("   Returning rptr_filter_list: {}".format(rptr_filter_list))
-
-    return rptr_filter_list
 
+def check_band_plan(channels_dict, band_plan, force_rx_only=False,
+        debug=False):
+    """This function checks every TX-enabled channel against the band plan.
 
+    A channel passes if its TX frequency lies in a band plan row that
+    allows its mode and bandwidth.  Failing channels are returned as a
+    list of (channel name, reason); with force_rx_only their 'RX Only'
+    attribute is also set to "On".
+    """
 
-def add_channel_to_zone(zone_name, channel_name, zones_dict,
-        channels_dict, debug=False):
-    """This function adds a channel to our zone dictionary."""
+    violation_list = []
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        if attr_dict['RX Only'] == "On":
+            continue
+        tx_hz = attr_dict['TX Freq']
+        band_list = find_band_plan_rows(band_plan, tx_hz)
+        if len(band_list) == 0:
+            reason = "TX {} outside band plan".format(hz_to_mhz(tx_hz))
+        else:
+            reason = None
+            bandwidth = normalize_diff_value(attr_dict['Bandwidth'])
+            for band in band_list:
+                lower_hz, upper_hz, service, license_class, mode_set, \
+                    bandwidth_set = band
+                if mode_set is not None and \
+                        attr_dict['Ch Type'] not in mode_set:
+                    reason = "{} mode not allowed in {} ({})".format(
+                        attr_dict['Ch Type'], service, license_class)
+                elif bandwidth_set is not None and \
+                        bandwidth not in bandwidth_set:
+                    reason = "{}K bandwidth not allowed in {} ({})".format(
+                        bandwidth, service, license_class)
+                else:
+                    reason = None
+                    break
+        if reason is None:
+            continue
+        violation_list.append((ch_name, reason))
+        if force_rx_only:
+            attr_dict.update({'RX Only': "On"})
 
+    return violation_list
 
-    if zone_name in zones_dict.keys():
-        # zone already created, just append channel
-        zone_member_list = zones_dict[zone_name]
-        zone_member_list.append(channel_name)
-        if debug:
-            print("Zone '{}' updated with '{}'.".format(
-                zone_name, channel_name))
-            print("    zone_dict[{}] = {}".format(
-                zone_name, zones_dict[zone_name]))
-    else:
-        # new zone, so create it
-        zones_dict.update({zone_name: [channel_name]})
 
-    return
 
+def build_query_indexes(channels_dict, zones_dict):
+    """This function indexes the resolved model for --query lookups.
 
+    RX and TX frequencies (integer Hz) are kept in sorted lists with a
+    parallel list of channel names so ranges can be found with bisect.
+    Secondary indexes map zone name, TG number and color code to the set
+    of channel names using them.
+    """
 
-def add_channels_fm_k7abd_analog_file(k7abd_analog_file_name, channels_dict,
-                                      zones_dict, debug=False):
-    """This function adds new analog channels from a K7ABD analog file."""
+    rx_list = []
+    tx_list = []
+    tg_index = {}
+    cc_index = {}
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        rx_list.append((attr_dict['RX Freq'], ch_name))
+        tx_list.append((attr_dict['TX Freq'], ch_name))
+        if attr_dict['Ch Type'] == "Digital":
+            tg_index.setdefault(int(attr_dict['TG Number']),
+                set()).add(ch_name)
+            cc_index.setdefault(int(attr_dict['Color Code']),
+                set()).add(ch_name)
+    rx_list.sort()
+    tx_list.sort()
+
+    zone_index = {}
+    channel_zones_dict = {}
+    for zone_name in zones_dict.keys():
+        for ch_name in zones_dict[zone_name]:
+            zone_index.setdefault(zone_name, set()).add(ch_name)
+            zone_list = channel_zones_dict.setdefault(ch_name, [])
+            if zone_name not in zone_list:
+                zone_list.append(zone_name)
 
-    # read in the k7abd analog  file
-    k7abd_df = pandas.read_csv(k7abd_analog_file_name)
+    return {'rx freqs': [item[0] for item in rx_list],
+            'rx names': [item[1] for item in rx_list],
+            'tx freqs': [item[0] for item in tx_list],
+            'tx names': [item[1] for item in tx_list],
+            'zone': zone_index, 'tg': tg_index, 'cc': cc_index,
+            'channel zones': channel_zones_dict}
 
-    # loop through k7abd file rows
-    for i,row in k7abd_df.iterrows():
 
-        # get zone
-        zone_name = row['Zone']
 
-        # Set channel values
-        ch_type = "Analog"
-        ch_name = row['Channel Name']
-        ch_rx_freq = row['RX Freq']
-        ch_tx_freq = row['TX Freq']
-        ch_tx_pwr = row['Power']
-        ch_bandwidth = row['Bandwidth']
-        ch_ctcss_dcs_decode = row['CTCSS Decode']
-        ch_ctcss_dcs_encode = row['CTCSS Encode']
-        ch_tx_prohibit = row['TX Prohibit']
+def parse_query_range(query_str):
+    """This function parses "FREQ" or "LOW-HIGH" (MHz) into a Hz range."""
 
-        if ch_name in channels_dict.keys():
-            if debug:
-                print("WARNING:  channel {} already defined.".format(
-                    ch_name))
+    try:
+        if '-' in query_str:
+            low_str, high_str = query_str.split('-', 1)
+            low_hz, high_hz = freq_to_hz(low_str), freq_to_hz(high_str)
         else:
-            # Create a new analog channel in our channels_dict
-            channels_dict.update({ch_name : {
-                 'Ch Type':ch_type,
-                 'RX Freq':ch_rx_freq,
-                 'TX Freq':ch_tx_freq,
-                 'Power':ch_tx_pwr,
-                 'Bandwidth':ch_bandwidth,
-                 'CTCSS Decode':ch_ctcss_dcs_decode,
-                 'CTCSS Encode':ch_ctcss_dcs_encode,
-                 'RX Only':ch_tx_prohibit
-                 }})
-
-        # add this channel to the specified zone
-        add_channel_to_zone(zone_name, ch_name, zones_dict,
-            channels_dict, debug=False)
+            low_hz = high_hz = freq_to_hz(query_str)
+    except ValueError:
+        print("ERROR:  Invalid query '{}', expected FREQ or LOW-HIGH in MHz.".format(
+            query_str))
+        sys.exit(-1)
+    if low_hz > high_hz:
+        low_hz, high_hz = high_hz, low_hz
 
-    return
+    return low_hz, high_hz
 
 
 
-def add_talkgroups_fm_k7abd_talkgroups_file(k7abd_tg_file, tg_by_num_dict,
-        tg_by_name_dict, debug=False):
-    """This function reads a talk groups file in K7ABD format."""
+def query_channels(query_indexes, low_hz, high_hz, color_code=None,
+        tg_number=None, zone_name=None):
+    """This function returns channels with an RX or TX freq in a range.
 
-    # Debug output
-    if debug:
-        print("Processing: {}".format(k7abd_tg_file))
+    The optional color code, TG number and zone name narrow the result
+    through the secondary indexes.
+    """
 
-    # Read in the K7ABD talk groups file...
-    tg_df = pandas.read_csv(k7abd_tg_file, header=None)
+    match_set = set()
+    for side in ['rx','tx']:
+        freq_list = query_indexes[side + ' freqs']
+        first = bisect.bisect_left(freq_list, low_hz)
+        last = bisect.bisect_right(freq_list, high_hz)
+        match_set.update(query_indexes[side + ' names'][first:last])
+    if color_code is not None:
+        match_set &= query_indexes['cc'].get(color_code, set())
+    if tg_number is not None:
+        match_set &= query_indexes['tg'].get(tg_number, set())
+    if zone_name is not None:
+        match_set &= query_indexes['zone'].get(zone_name, set())
 
-    # hack to protect Private Call entries (like Brandmeister Parrot)
-    private_call_list = [9990]
+    return match_set
 
-    # loop through the talk groups building dictionaries
-    for i, row in tg_df.iterrows():
-        tg_name = row[0]
-        tg_number = row[1]
-        if tg_number not in private_call_list:
-            tg_call_type = "Group Call"
-        else:
-            tg_call_type = "Private Call"
-        tg_call_alert = "None"
-
-        # check the talk group name for valid length...
-        if len(tg_name) > 16:
-            print("WARNING: ",tg_name,"exceeds 16 characters. Length = ",len(tg_name))
-            print("   truncating to: ",str(tg_name[:16]))
-
-        # First definition of a talk group name sets the name that will
-        # be used for that talk group number in any channel definitions.
-        # We allow multiple names for the same talk group number.
-        # Redefinitions for any talk group name must always equate to
-        # the same talk group number.
-        if tg_number not in tg_by_num_dict.keys():
-
-            # sanity check: if tg name already exists it appears in this
-            # case to have been defined as a different number...
-            # That isn't allowed, so ERROR out.
-            if tg_name in tg_by_name_dict.keys():
-                print("ERROR:  Talkgroup '{}' already defined as: '{}'".format(
-                    tg_name, tg_by_name_dict[tg_name]))
-                sys.exit(-1)
-
-            # now safe to add to tg_by_num_dict - becomes default TG name
-            tg_by_num_dict.update({tg_number:
-                [str(tg_name[:16]), tg_call_type, tg_call_alert]})
-        else:
 
-            # sanity check: if tg_name already exists in this case,
-            # we need to make sure this repeat definition equates
-            # to the same talk group number
-            if tg_name in tg_by_name_dict.keys():
 
-                if tg_by_name_dict[tg_name] != tg_number:
-                    print("ERROR:  Talkgroup '{}' already defined as: '{}'".format(
-                        tg_name, tg_by_name_dict[tg_name]))
-                    sys.exit(-1)
+def print_query_results(query_str, match_set, channels_dict, query_indexes):
+    """This function prints the channels (and their zones) from a query."""
 
-        # passed sanity checks, safe to add to tg_by_name_dict
-        tg_by_name_dict.update({tg_name[:16]:tg_number})
-
-    # clean up
-    del tg_df
+    print("")
+    print("Channels matching '{}': {}".format(query_str, len(match_set)))
+    zone_set = set()
+    for ch_name in sorted(match_set, key=lambda name:
+            (channels_dict[name]['RX Freq'], name)):
+        attr_dict = channels_dict[ch_name]
+        if attr_dict['Ch Type'] == "Digital":
+            detail_str = "CC {} TS {} TG {} ({})".format(
+                attr_dict['Color Code'], attr_dict['Time Slot'],
+                attr_dict['TG Number'], attr_dict['Talk Group'])
+        else:
+            detail_str = "Tones {}/{}".format(attr_dict['CTCSS Decode'],
+                attr_dict['CTCSS Encode'])
+        zone_list = query_indexes['channel zones'].get(ch_name, [])
+        zone_set.update(zone_list)
+        print("   {:<16}  RX {:<9} TX {:<9} {}  Zones: {}".format(ch_name,
+            hz_to_mhz(attr_dict['RX Freq']), hz_to_mhz(attr_dict['TX Freq']),
+            detail_str,
+            ', '.join(zone_list)))
+    print("Zones using these channels: {}".format(
+        ', '.join(sorted(zone_set))))
 
     return
 
 
 
+def normalize_diff_value(value):
+    """This function normalizes a numeric-ish value for diff comparisons."""
 
-def add_channels_fm_k7abd_digital_others_file(k7abd_digital_others_file_name,
-        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
-        debug=False):
-    """This function writes out a k7abd formatted Digital-Others__ file"""
-
-    # Reference of file format - column headings in digital-others file:
-    # ['Zone','Channel Name','Power','RX Freq','TX Freq','Color Code',
-    #  'Talk Group','TimeSlot','Call Type','TX Permit']
+    value_str = str(value).strip()
+    if value_str.upper().endswith('K'):
+        value_str = value_str[:-1]
+    try:
+        return '{:g}'.format(float(value_str))
+    except ValueError:
+        return value_str
 
-    # read in the K7ABD digital-others file
-    if debug:
-        print("Processing: {}".format(k7abd_digital_others_file_name))
-    k7abd_df = pandas.read_csv(k7abd_digital_others_file_name)
 
-    # loop through k7abd file rows
-    for i,row in k7abd_df.iterrows():
+# Fields compared when diffing channels, in channel record order
+diff_channel_fields = ['Ch Type','RX Freq','TX Freq','Power','Bandwidth',
+                       'CTCSS Decode','CTCSS Encode','RX Only','Color Code',
+                       'Time Slot','TG Number','Call Type','TX Permit']
 
-        # get "Zone" value
-        zone_name = row['Zone']
 
-        # channel name
-        ch_name = row['Channel Name']
-        if len(ch_name) >16:
-            print("Warning: '{}' exceeds 16 chars({}).".format(
-                ch_name, len(ch_name)))
-            ch_name = ch_name[:16]
+def diff_channel_record(ch_type, rx_hz, tx_hz, power, bandwidth,
+        ctcss_decode, ctcss_encode, rx_only, color_code=None, time_slot=None,
+        tg_number=None, call_type=None, tx_permit=None):
+    """This function builds the (record, signature) tuples used by the diff.
 
-        # set channel type
-        ch_type = "Digital"
+    The record holds every compared field in diff_channel_fields order; the
+    signature is (RX Hz, TX Hz, color code, slot, TG number) for digital
+    channels and (RX Hz, TX Hz, decode, encode) for analog ones, and is
+    used to spot the same channel under a different name.
+    """
 
-        # set bandwidth
-        ch_bandwidth = "12.5"
-
-        # get "contact" value (mapped if needed)
-        tg_name = row['Talk Group']
-        if tg_name in tg_by_name_dict.keys():
-            # lookup TG number and remap name to value in tg_by_num_dict
-            tg_name = tg_by_num_dict[tg_by_name_dict[tg_name]][0]
-        else:
-            # Bad day...
-            print("ERROR: Undefined talk group: '{}'".format(tg_name))
-            sys.exit(-1)
-        ch_contact = tg_name
-
-        # get channel attributes
-        ch_tx_power = row['Power']
-        ch_rx_freq = row['RX Freq']
-        ch_tx_freq = row['TX Freq']
-        ch_tx_pwr = row['Power']
-        ch_color_code = row['Color Code']
-        ch_slot = row['TimeSlot']
-        ch_call_type = row['Call Type']
-        ch_contact_tg_num = str(tg_by_name_dict[tg_name])
-        ch_tx_permit = row['TX Permit']
-
-        # now add this channel to the channel dictionary
-        if ch_name in channels_dict.keys():
-            if debug:
-                print("WARNING:  channel {} already defined.".format(
-                    ch_name))
-        else:
-            # Create a new digital channel in our channels_dict
-            channels_dict.update({ch_name : {
-                 'Ch Type':ch_type,
-                 'RX Freq':ch_rx_freq,
-                 'TX Freq':ch_tx_freq,
-                 'Power':ch_tx_pwr,
-                 'Bandwidth':ch_bandwidth,
-                 'CTCSS Decode':"Off",
-                 'CTCSS Encode':"Off",
-                 'Color Code':ch_color_code,
-                 'Talk Group':ch_contact,
-                 'TG Number':tg_by_name_dict[ch_contact],
-                 'Time Slot':ch_slot,
-                 'Call Type':ch_call_type,
-                 'TX Permit':ch_tx_permit,
-                 'RX Only':"Off"
-                 }})
-
-        # add this channel to the specified zone
-        add_channel_to_zone(zone_name, ch_name, zones_dict,
-            channels_dict, debug=False)
-
-    # clean-up
-    del k7abd_df
-
-    return
+    if power == "High":
+        power = "Turbo"
+    if ch_type == "Analog":
+        color_code = time_slot = tg_number = call_type = tx_permit = None
+        signature = (rx_hz, tx_hz, normalize_diff_value(ctcss_decode),
+                     normalize_diff_value(ctcss_encode))
+    else:
+        color_code = normalize_diff_value(color_code)
+        time_slot = normalize_diff_value(time_slot)
+        if tg_number is not None:
+            tg_number = normalize_diff_value(tg_number)
+        signature = (rx_hz, tx_hz, color_code, time_slot, tg_number)
+    record = (ch_type, rx_hz, tx_hz, power, normalize_diff_value(bandwidth),
+              normalize_diff_value(ctcss_decode),
+              normalize_diff_value(ctcss_encode), rx_only, color_code,
+              time_slot, tg_number, call_type, tx_permit)
 
+    return record, signature
 
 
-def add_channels_fm_k7abd_digital_repeaters_file(k7abd_digital_file_name,
-        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
-        tg_filter_list, rptr_filter_list, debug=False):
 
-    # read in the k7abd digital repeaters file
-    if debug:
-        print("Processing: {}".format(k7abd_digital_file_name))
-    k7abd_df = pandas.read_csv(k7abd_digital_file_name)
-    k7abd_df['Comment'].fillna('none', inplace=True)
-
-    # build talk groups list from column headings
-    talk_group_list = []
-    column_items = k7abd_df.columns
-    for item in column_items:
-        if item not in ['Zone Name','Comment','Power',
-                        'RX Freq','TX Freq','Color Code']:
-            # filter out talk groups in filter list
-            if item in tg_filter_list:
-                pass
-            else:
-                talk_group_list.append(item)
+def build_model_diff_indexes(channels_dict, zones_dict, tg_by_num_dict):
+    """This function indexes the resolved model for diffing."""
 
-    # loop through k7abd repeaters file rows - each row is a repeater
-    for i,row in k7abd_df.iterrows():
+    channel_index = {}
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        if attr_dict['Ch Type'] == "Analog":
+            channel_index.update({ch_name: diff_channel_record("Analog",
+                attr_dict['RX Freq'], attr_dict['TX Freq'],
+                attr_dict['Power'], attr_dict['Bandwidth'],
+                attr_dict['CTCSS Decode'], attr_dict['CTCSS Encode'],
+                attr_dict['RX Only'])})
+        else:
+            channel_index.update({ch_name: diff_channel_record("Digital",
+                attr_dict['RX Freq'], attr_dict['TX Freq'],
+                attr_dict['Power'], attr_dict['Bandwidth'],
+                attr_dict['CTCSS Decode'], attr_dict['CTCSS Encode'],
+                attr_dict['RX Only'], attr_dict['Color Code'],
+                attr_dict['Time Slot'], attr_dict['TG Number'],
+                attr_dict['Call Type'], attr_dict['TX Permit'])})
+
+    # the Anytone zone writer emits members sorted by name
+    zone_index = {}
+    for zone_name in zones_dict.keys():
+        zone_index.update({zone_name: sorted(zones_dict[zone_name])})
 
-        # Get repeater name (zone name) and pull out channel prefix
-        zone_name = row['Zone Name']
-        zone_name_list = zone_name.split(';')
-        zone_name = zone_name_list[0]
-        ch_prefix = zone_name_list[1]
-        ch_prefix = ch_prefix.lower()
+    tg_index = {}
+    for tg_number in tg_by_num_dict.keys():
+        tg_index.update({int(tg_number): (tg_by_num_dict[tg_number][0][:16],
+            tg_by_num_dict[tg_number][1])})
 
-        # Short circuit if repeater is in rptr_filter_list
-        if zone_name in rptr_filter_list:
-            continue
+    return channel_index, zone_index, tg_index
 
-        if debug:
-            print("   Working on Zone: ", zone_name)
 
-        # set channel type
-        ch_type = "Digital"
 
-        # get "Transmit Power" value
-        ch_tx_power = row['Power']
+def anytone_read_export_diff_indexes(export_dir, debug=False):
+    """This function indexes an Anytone CPS export directory for diffing.
 
-        # get "Receive Frequency" & "Transmit Frequency"
-        ch_rx_freq = row['RX Freq']
-        ch_tx_freq = row['TX Freq']
+    The directory holds the CPS default export names: Channel.CSV and,
+    optionally, Zone.CSV and TalkGroups.CSV.  The zone and talk group
+    indexes are None when their export file isn't present.
+    """
 
-        # get "Color Code" value
-        ch_color_code = row['Color Code']
+    channel_index = {}
+    zone_index = None
+    tg_index = None
 
-        # Now loop through rest of columns in k7abd repeaters file and create
-        # a channel for each talk group represented that has a slot specified..
-        repeater_channel_dict = {}
-        for tg_name in talk_group_list:
+    # talk groups first so 868 channels can map contact names to IDs
+    tg_by_name_index = {}
+    tg_export_file = os.path.join(export_dir, 'TalkGroups.CSV')
+    if os.path.exists(tg_export_file):
+        if debug:
+            print("Processing: {}".format(tg_export_file))
+        tg_index = {}
+        tg_df = pandas.read_csv(tg_export_file, dtype=str)
+        tg_df.fillna('', inplace=True)
+        for i,row in tg_df.iterrows():
+            tg_number = int(row['Radio ID'])
+            tg_index.update({tg_number: (row['Name'], row['Call Type'])})
+            tg_by_name_index.update({row['Name']: tg_number})
+        del tg_df
+
+    channels_export_file = os.path.join(export_dir, 'Channel.CSV')
+    if not os.path.exists(channels_export_file):
+        print("ERROR:  Channel export file not found!")
+        print("        (file '{}' must exist)".format(channels_export_file))
+        sys.exit(-1)
+    if debug:
+        print("Processing: {}".format(channels_export_file))
+    channels_df = pandas.read_csv(channels_export_file, dtype=str)
+    channels_df.fillna('', inplace=True)
+    if 'PTT Prohibit' in channels_df.columns:
+        rx_only_column = 'PTT Prohibit'
+    else:
+        rx_only_column = 'TX Prohibit'
+    for i,row in channels_df.iterrows():
+        if row['Channel Type'] == "A-Analog":
+            channel_index.update({row['Channel Name']: diff_channel_record(
+                "Analog", freq_to_hz(row['Receive Frequency']),
+                freq_to_hz(row['Transmit Frequency']),
+                row['Transmit Power'], row['Band Width'],
+                row['CTCSS/DCS Decode'], row['CTCSS/DCS Encode'],
+                row[rx_only_column])})
+        else:
+            if 'Contact TG/DMR ID' in channels_df.columns:
+                tg_number = row['Contact TG/DMR ID']
+            else:
+                tg_number = tg_by_name_index.get(row['Contact'])
+            channel_index.update({row['Channel Name']: diff_channel_record(
+                "Digital", freq_to_hz(row['Receive Frequency']),
+                freq_to_hz(row['Transmit Frequency']), row['Transmit Power'],
+                row['Band Width'], row['CTCSS/DCS Decode'],
+                row['CTCSS/DCS Encode'], row[rx_only_column],
+                row['Color Code'], row['Slot'], tg_number,
+                row['Contact Call Type'], row['Busy Lock/TX Permit'])})
+    del channels_df
+
+    zones_export_file = os.path.join(export_dir, 'Zone.CSV')
+    if os.path.exists(zones_export_file):
+        if debug:
+            print("Processing: {}".format(zones_export_file))
+        zone_index = {}
+        zones_df = pandas.read_csv(zones_export_file, dtype=str)
+        zones_df.fillna('', inplace=True)
+        for i,row in zones_df.iterrows():
+            member_list = [member for member in
+                           row['Zone Channel Member'].split('|') if member]
+            zone_index.update({row['Zone Name']: member_list})
+        del zones_df
+
+    return channel_index, zone_index, tg_index
+
+
+
+def diff_channel_indexes(model_index, radio_index):
+    """This function diffs two channel indexes keyed by channel name.
+
+    Returns (added, removed, changed, renamed) where added are channels
+    only in the model, removed are only on the radio, changed maps names to
+    the differing fields and renamed is a list of (radio name, model name)
+    pairs matched through the channel signature.
+    """
+
+    added_list = []
+    changed_dict = {}
+    for ch_name in model_index.keys():
+        if ch_name not in radio_index:
+            added_list.append(ch_name)
+            continue
+        model_record = model_index[ch_name][0]
+        radio_record = radio_index[ch_name][0]
+        if model_record != radio_record:
+            field_list = []
+            for j in range(len(diff_channel_fields)):
+                if model_record[j] != radio_record[j]:
+                    field_list.append(diff_channel_fields[j])
+            changed_dict.update({ch_name: field_list})
+    removed_list = [ch_name for ch_name in radio_index.keys()
+                    if ch_name not in model_index]
+
+    # pair up added and removed channels sharing a signature
+    added_by_signature = {}
+    for ch_name in added_list:
+        signature = model_index[ch_name][1]
+        added_by_signature.setdefault(signature, []).append(ch_name)
+    renamed_list = []
+    renamed_set = set()
+    for ch_name in removed_list:
+        signature = radio_index[ch_name][1]
+        candidate_list = added_by_signature.get(signature)
+        if candidate_list:
+            new_name = candidate_list.pop(0)
+            renamed_list.append((ch_name, new_name))
+            renamed_set.add(ch_name)
+            renamed_set.add(new_name)
+    added_list = [ch_name for ch_name in added_list
+                  if ch_name not in renamed_set]
+    removed_list = [ch_name for ch_name in removed_list
+                    if ch_name not in renamed_set]
+
+    return added_list, removed_list, changed_dict, renamed_list
+
+
+
+def diff_zone_indexes(model_index, radio_index):
+    """This function diffs two zone indexes keyed by zone name."""
+
+    added_list = [zone_name for zone_name in model_index.keys()
+                  if zone_name not in radio_index]
+    removed_list = [zone_name for zone_name in radio_index.keys()
+                    if zone_name not in model_index]
+    changed_dict = {}
+    for zone_name in model_index.keys():
+        if zone_name in radio_index:
+            model_member_list = model_index[zone_name]
+            radio_member_list = radio_index[zone_name]
+            if model_member_list != radio_member_list:
+                radio_member_set = set(radio_member_list)
+                model_member_set = set(model_member_list)
+                changed_dict.update({zone_name: (
+                    [m for m in model_member_list if m not in radio_member_set],
+                    [m for m in radio_member_list if m not in model_member_set])})
+
+    # zones with identical membership under a different name are renames
+    added_by_members = {}
+    for zone_name in added_list:
+        members_key = frozenset(model_index[zone_name])
+        added_by_members.setdefault(members_key, []).append(zone_name)
+    renamed_list = []
+    renamed_set = set()
+    for zone_name in removed_list:
+        candidate_list = added_by_members.get(
+            frozenset(radio_index[zone_name]))
+        if candidate_list:
+            new_name = candidate_list.pop(0)
+            renamed_list.append((zone_name, new_name))
+            renamed_set.add(zone_name)
+            renamed_set.add(new_name)
+    added_list = [z for z in added_list if z not in renamed_set]
+    removed_list = [z for z in removed_list if z not in renamed_set]
+
+    return added_list, removed_list, changed_dict, renamed_list
+
+
+
+def diff_talk_group_indexes(model_index, radio_index):
+    """This function diffs two talk group indexes keyed by TG number."""
+
+    added_list = [tg_number for tg_number in sorted(model_index.keys())
+                  if tg_number not in radio_index]
+    removed_list = [tg_number for tg_number in sorted(radio_index.keys())
+                    if tg_number not in model_index]
+    changed_dict = {}
+    renamed_list = []
+    for tg_number in sorted(model_index.keys()):
+        if tg_number not in radio_index:
+            continue
+        model_name, model_call_type = model_index[tg_number]
+        radio_name, radio_call_type = radio_index[tg_number]
+        if model_name != radio_name:
+            renamed_list.append((radio_name, model_name))
+        if model_call_type != radio_call_type:
+            changed_dict.update({tg_number: ['Call Type']})
 
-            # get the talk group's slot
-            ch_slot = str(row[tg_name])
+    return added_list, removed_list, changed_dict, renamed_list
 
-            valid_slot_list = ['1','2']
-            if ch_slot not in valid_slot_list:
-                # this talk group not on this repeater, so
-                # don't create a channel for it...
-                continue
 
-            # fix tg_name value - map if needed
-            if tg_name in tg_by_name_dict.keys():
-                # lookup TG number and remap name to first value in
-                # our tg_by_num_dict
-                tg_name = tg_by_num_dict[tg_by_name_dict[tg_name]][0]
-            else:
-                # Bad day...
-                print("ERROR: Undefined talk group: '{}'".format(tg_name))
-                sys.exit(-1)
 
-            # channel name
-            ch_name = ch_prefix + ' ' + tg_name
-            if len(ch_name) >16:
-                print("Warning: '{}' > 16 chars, changed to '{}'.".format(
-                    ch_name, ch_name[:16]))
-                ch_name = ch_name[:16]
+def print_diff_report(export_dir, channel_diff, zone_diff, tg_diff,
+        debug=False):
+    """This function prints a model vs radio export diff report."""
 
-            # now add this channel to the channel dictionary
-            if ch_name in channels_dict.keys():
+    print("")
+    print("Differences between input files and radio export: {}".format(
+        export_dir))
+    print("   ('added' = only in input files, 'removed' = only on radio)")
+    for label, diff in [('Channels', channel_diff), ('Zones', zone_diff),
+                        ('Talk groups', tg_diff)]:
+        if diff is None:
+            print("   {}: not in radio export, skipped".format(label))
+            continue
+        added_list, removed_list, changed_dict, renamed_list = diff
+        print("   {}: {} added, {} removed, {} changed, {} renamed".format(
+            label, len(added_list), len(removed_list), len(changed_dict),
+            len(renamed_list)))
+        for item in added_list:
+            print("      + {}".format(item))
+        for item in removed_list:
+            print("      - {}".format(item))
+        for item in changed_dict.keys():
+            if label == 'Zones':
+                member_add_list, member_remove_list = changed_dict[item]
+                print("      ~ {} (+{} / -{} members)".format(item,
+                    len(member_add_list), len(member_remove_list)))
                 if debug:
-                    print("WARNING:  channel {} already defined.".format(
-                        ch_name))
+                    print("         added: {}".format(member_add_list))
+                    print("         removed: {}".format(member_remove_list))
             else:
-                # Create a new digital channel in our channels_dict
-                channels_dict.update({ch_name : {
-                    'Ch Type':ch_type,
-                    'RX Freq':ch_rx_freq,
-                    'TX Freq':ch_tx_freq,
-                    'Power':ch_tx_power,
-                    'Bandwidth':"12.5",
-                    'CTCSS Decode':"Off",
-                    'CTCSS Encode':"Off",
-                    'Color Code':ch_color_code,
-                    'Talk Group':tg_name,
-                    'TG Number':tg_by_name_dict[tg_name],
-                    'Time Slot':ch_slot,
-                    'Call Type':"Group Call",
-                    'TX Permit':"Same Color Code",
-                    'RX Only':"Off"
-                    }})
-
-            # collect this channel and the specified zone
-            repeater_channel_dict.update({ch_name:zone_name})
-
-        # Now sort the channels; add them to the zones
-        for ch_name in sorted(repeater_channel_dict.keys()):
-            add_channel_to_zone(repeater_channel_dict[ch_name], ch_name,
-                    zones_dict, channels_dict, debug=False)
-
-    # clean-up
-    del k7abd_df
+                print("      ~ {} ({})".format(item,
+                    ', '.join(changed_dict[item])))
+        for old_name, new_name in renamed_list:
+            print("      > '{}' -> '{}'".format(old_name, new_name))
 
     return
 
 
 
-
-
-
-
 ###############################################################################
 #
 # Main program...
@@ -1408,18 +967,6 @@ def add_channels_fm_k7abd_digital_repeaters_file(k7abd_digital_file_name,
 
 
 
-# Global dictionary/list structures
-tg_by_num_dict = {}
-tg_by_name_dict = {}
-tg_name_to_id_dict = {}
-zones_dict = {}
-channels_dict = {}
-rx_groups_dict = {}
-scan_lists_dict = {}
-zones_order_list = []
-supported_cps_targets = ['868','578','878','cs800d','opengd77','uv380']
-
-
 def main():
 
     # Greet the customer
@@ -1435,7 +982,7 @@ def main():
     script_name = sys.argv[0]
     parser = argparse.ArgumentParser(formatter_class =
         argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument('--cps', action='append', required=True,
+    parser.add_argument('--cps', action='append', required=False,
         dest='cps_target',
         help='specify CPS target; multiple targets allowed, or use special target "all" to generate files for all supported targets',
         default=[])
@@ -1454,16 +1001,115 @@ def main():
     parser.add_argument('--rptr_filter',
         help="set the rptr_filter flag; if set, 'MyExcludedRepeaters.csv' must be present in the input files directory",
         required=False, action='store_true')
+    parser.add_argument('--near', action='append', metavar='LAT,LON,KM',
+        help="only keep Analog and Digital-Repeaters rows whose Latitude/Longitude is within KM kilometers of LAT,LON (rows without a location are kept); multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--route', action='append', metavar='ROUTEFILE',
+        help="only keep Analog and Digital-Repeaters rows whose Latitude/Longitude is within --route_radius of the route in this .csv file of Latitude/Longitude points; multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--route_radius', type=float, required=False,
+        help="distance in kilometers from a --route that is kept", default=25.0)
+    parser.add_argument('--repeater_dump', action='append', metavar='DUMPFILE',
+        help="also add the repeaters in this bulk .json, .jsonl or .csv dump (streamed, so it may hold any number of repeaters); multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--dup_check',
+        help="report channels that duplicate another channel (same frequencies, mode, color code, slot, talk group and tones) under a different name",
+        required=False, action='store_true')
+    parser.add_argument('--dup_merge',
+        help="like --dup_check, but also merge each duplicate into the first definition, shared by every zone that referenced it",
+        required=False, action='store_true')
+    parser.add_argument('--band_plan',
+        help="set the band_plan flag; if set, 'MyBandPlan.csv' must be present in the input files directory and every TX-enabled channel is checked against it",
+        required=False, action='store_true')
+    parser.add_argument('--force_rx_only',
+        help="with --band_plan, set 'RX Only' to On for channels that fail the band plan check",
+        required=False, action='store_true')
+    parser.add_argument('--channel_numbers',
+        help="set the channel_numbers flag; if set, channel numbers are kept stable across builds using 'MyChannelNumbers.csv' in the input files directory (created if missing)",
+        required=False, action='store_true')
+    parser.add_argument('--diff', action='append', required=False,
+        dest='diff_dir', metavar='EXPORTDIR',
+        help="compare the input files against an Anytone CPS export directory (Channel.CSV, Zone.CSV, TalkGroups.CSV); multiple directories allowed",
+        default=[])
+    parser.add_argument('--query', action='append', required=False,
+        dest='query', metavar='FREQ|LOW-HIGH',
+        help="list channels and zones with an RX or TX frequency at FREQ or within LOW-HIGH (MHz); multiple queries allowed",
+        default=[])
+    parser.add_argument('--query_cc', type=int, required=False,
+        help="limit --query results to this color code", default=None)
+    parser.add_argument('--query_tg', type=int, required=False,
+        help="limit --query results to this talk group ID", default=None)
+    parser.add_argument('--query_zone', required=False,
+        help="limit --query results to this zone", default=None)
+    parser.add_argument('--conflicts',
+        help="write a report of TX/RX conflicts and 3rd order intermod (2f1-f2) products landing on RX frequencies to the output directory",
+        required=False, action='store_true')
+    parser.add_argument('--conflict_tolerance', type=float, required=False,
+        help="frequency tolerance in kHz used by --conflicts", default=6.25)
+    parser.add_argument('--scan_lists',
+        help="generate a scan list for every zone (split at the radio's member limit) and point each channel at the first scan list it's in; Anytone targets only",
+        required=False, action='store_true')
+    parser.add_argument('--rx_groups', choices=['repeater', 'slot'],
+        help="generate receive group lists from the talk groups each Digital-Repeaters repeater carries, one per repeater or per repeater slot, and point its channels at them (identical lists are shared); Anytone and uv380 targets",
+        required=False, default=None)
+    parser.add_argument('--user_db', metavar='USERDBFILE',
+        help="also write a digital contact list for the 578 and 878 targets from this DMR user database .csv (e.g. RadioID.net's user.csv), streamed through the --user_db_* filters",
+        required=False)
+    parser.add_argument('--user_db_country', action='append', metavar='COUNTRY',
+        help="only keep --user_db users in this country; multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--user_db_region', action='append', metavar='REGION',
+        help="only keep --user_db users in this state/region; multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--user_db_prefix', action='append', metavar='PREFIX',
+        help="only keep --user_db users whose callsign starts with this prefix; multiple allowed",
+        required=False, default=[])
+    parser.add_argument('--delta',
+        help="only write new or changed channels, zones and talk groups since the last build (Anytone targets); the last build is recorded in 'cps_build_snapshot.json' in the output directory",
+        required=False, action='store_true')
+    parser.add_argument('--bundle', metavar='ZIPFILE',
+        help="write the import files for all --cps targets into this zip file, with a manifest of counts and hashes, instead of the output directory",
+        required=False, default=None)
+    parser.add_argument('--serve', metavar='[HOST:]PORT',
+        help="run the local build service on this port instead of building once; the input directory is used as the reference library",
+        required=False, default=None)
+    parser.add_argument('--serve_workers', type=int, required=False,
+        help="number of requests the build service handles at once", default=4)
+    parser.add_argument('--serve_cache', type=int, required=False,
+        help="number of built codeplugs the build service keeps in memory", default=8)
+    parser.add_argument('--benchmark_compare', metavar='BASELINE',
+        nargs='?', const='',
+        help="run the stage benchmarks on a fixed synthetic library and compare them with a baseline JSON (the committed one if no file is given); fails if any stage regresses past --benchmark_threshold",
+        required=False, default=None)
+    parser.add_argument('--benchmark_threshold', type=float, required=False,
+        help="percent growth in a stage's time or peak memory that counts as a regression", default=25.0)
+    parser.add_argument('--benchmark_repeat', type=int, required=False,
+        help="number of timed runs per stage; the fastest is kept", default=3)
+    parser.add_argument('--benchmark_update',
+        help="with --benchmark_compare, save this machine's results as the new baseline instead of comparing",
+        required=False, action='store_true')
+    parser.add_argument('--jobs',
+        help="parse the input files using this many worker processes (default 1)",
+        required=False, type=int, default=1)
     parser.add_argument('--debugmode',
         help='set the debug flag for troubleshooting', required=False,
         action='store_true')
 
     # parse the command line
     args = parser.parse_args()
+    if (not args.cps_target and not args.diff_dir and not args.query and
+            not args.conflicts and not args.serve and
+            args.benchmark_compare is None):
+        parser.error("at least one of --cps, --diff, --query, --conflicts, --serve or --benchmark_compare is required")
     zone_order_flg = args.zone_order
     tg_filter_flg = args.tg_filter
     rptr_filter_flg = args.rptr_filter
     debugflg = args.debugmode
+    jobs = args.jobs
+    if jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not args.route_radius > 0:
+        parser.error("--route_radius must be greater than 0")
 
     # get today's date to stamp output files with today's iso-date.
     if debugflg:
@@ -1483,10 +1129,68 @@ def main():
                 print("Supported targets are: {}".format(supported_cps_targets))
                 sys.exit(-1)
 
+    # load the plugin for each selected target now, so a missing package
+    # is reported before any input files are read
+    for target in supported_cps_targets:
+        if target in args.cps_target:
+            try:
+                load_cps_target(target)
+            except ImportError as err:
+                print("ERROR: {}.".format(err))
+                sys.exit(-1)
+
+    # Run the performance regression gate rather than building
+    if args.benchmark_compare is not None:
+        # only the gate needs the benchmark module (and tracemalloc)
+        from cps_import_builder.benchmark import (benchmark_baseline_file,
+            benchmark_dataset_dict, run_benchmarks, read_benchmark_baseline,
+            write_benchmark_baseline, compare_benchmarks,
+            print_benchmark_comparison)
+        baseline_file = args.benchmark_compare or benchmark_baseline_file
+        if args.benchmark_update:
+            print("Benchmarking build stages on the synthetic library...")
+            stage_dict = run_benchmarks(repeat=args.benchmark_repeat)
+            write_benchmark_baseline(stage_dict, baseline_file)
+            print("Benchmark baseline written to: {}".format(baseline_file))
+            return
+        if not os.path.exists(baseline_file):
+            print("ERROR:  Benchmark baseline '{}' not found!".format(
+                baseline_file))
+            sys.exit(-1)
+        baseline_dict = read_benchmark_baseline(baseline_file)
+        if baseline_dict.get('dataset') != benchmark_dataset_dict:
+            print("ERROR:  Benchmark baseline '{}' was made from a different synthetic library!".format(
+                baseline_file))
+            print("        Re-run with --benchmark_update to make a new one.")
+            sys.exit(-1)
+        print("Benchmarking build stages on the synthetic library...")
+        stage_dict = run_benchmarks(repeat=args.benchmark_repeat)
+        row_list = compare_benchmarks(stage_dict, baseline_dict,
+            threshold=args.benchmark_threshold)
+        if print_benchmark_comparison(row_list, args.benchmark_threshold):
+            print("Aborting.")
+            sys.exit(-1)
+        return
+
     # set working directories from command line values
     inputs_dir = args.inputdir
     print("Reading input files from: '{}'.".format(inputs_dir))
     outputs_dir = args.outputdir
+
+    # Run as a build service rather than building once
+    if args.serve:
+        # only the service needs http.server and the thread pool
+        from cps_import_builder.service import serve
+        host, _, port = args.serve.rpartition(':')
+        try:
+            port = int(port)
+        except ValueError:
+            parser.error("--serve takes [HOST:]PORT")
+        serve(inputs_dir, host=host or '127.0.0.1', port=port,
+            workers=args.serve_workers, max_models=args.serve_cache,
+            debug=debugflg)
+        return
+
     print("Putting output files in: '{}'.".format(outputs_dir))
 
     # Read in optional Zone Order file
@@ -1540,241 +1244,243 @@ def main():
     else:
         rptr_filter_list = []
 
-    # Add talk groups from K7ABD Talkgroups__ files
-    talkgroups_filespec = os.path.join(inputs_dir, 'Talkgroups__*')
-    file_list = []
-    for match in glob.iglob(talkgroups_filespec, recursive=False):
-        file_list.append(match)
-    for talkgroups_filename in sorted(file_list):
-        print("Adding talkgroups:  {}".format(
-            os.path.basename(talkgroups_filename)))
-        add_talkgroups_fm_k7abd_talkgroups_file(talkgroups_filename,
-            tg_by_num_dict, tg_by_name_dict, debug=debugflg)
-
-    # Add channels from K7ABD Analog__ files
-    analog_channels_filespec = os.path.join(inputs_dir, 'Analog__*')
-    file_list = []
-    for match in glob.iglob(analog_channels_filespec, recursive=False):
-        file_list.append(match)
-    for analog_channels_filename in sorted(file_list):
-        print("Adding channels:  {}".format(
-            os.path.basename(analog_channels_filename)))
-        add_channels_fm_k7abd_analog_file(analog_channels_filename,
-            channels_dict, zones_dict, debug=debugflg)
-
-    # Add channels from K7ABD Digital-Others__ files
-    digital_others_filespec = os.path.join(inputs_dir, 'Digital-Others__*')
-    file_list = []
-    for match in glob.iglob(digital_others_filespec, recursive=False):
-        file_list.append(match)
-    for digital_others_filename in sorted(file_list):
-        print("Adding channels:  {}".format(
-            os.path.basename(digital_others_filename)))
-        add_channels_fm_k7abd_digital_others_file(digital_others_filename,
-            channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
-            debug=debugflg)
-
-    # Add channels from K7ABD Digital-Repeaters files
-    digital_repeaters_filespec = os.path.join(inputs_dir,
-        'Digital-Repeaters__*')
-    file_list = []
-    for match in glob.iglob(digital_repeaters_filespec, recursive=False):
-        file_list.append(match)
-    for digital_repeaters_filename in sorted(file_list):
-        print("Adding channels:  {}".format(
-            os.path.basename(digital_repeaters_filename)))
-        add_channels_fm_k7abd_digital_repeaters_file(
-            digital_repeaters_filename, channels_dict, zones_dict,
-            tg_by_num_dict, tg_by_name_dict, tg_filter_list,
-            rptr_filter_list, debug=debugflg)
-
-    if '868' in args.cps_target:
-
-        print("")
-        print("Generating import files for Anytone D868UV")
-
-        # define our export file names
-        zones_output_filename = 'd868uv_zones_{}.csv'.format(isodate)
-        zones_output_file = os.path.join(outputs_dir, zones_output_filename)
-        talk_groups_output_filename = 'd868uv_talk_groups_{}.csv'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'd868uv_channels_{}.csv'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out an Anytone 868 zones import file
-        print("   Zones import file: {}".format(
-            os.path.basename(zones_output_file)))
-        anytone_write_zones_export(zones_dict, zones_order_list,
-            zones_output_file, channels_dict, model="868", debug=debugflg)
-
-        # Write out an Anytone 868 talk groups import file
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        anytone_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, debug=debugflg)
-
-        # Write out an Anytone 868 channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        anytone_write_channels_export(channels_dict,
-            channels_output_file, model="868", debug=debugflg)
-
-    if '578' in args.cps_target:
+    # Set up the optional --near/--route location filter
+    geo_filter = None
+    if args.near or args.route:
+        geo_filter = GeoFilter()
+        for near_str in args.near:
+            try:
+                lat, lon, radius_km = parse_near(near_str)
+            except ValueError:
+                parser.error("--near takes LAT,LON,KM")
+            print("Keeping channels within {} km of {},{}".format(radius_km,
+                lat, lon))
+            geo_filter.add_points([(lat, lon)], radius_km)
+        for route_file in args.route:
+            if not os.path.exists(route_file):
+                print("ERROR:  Route file '{}' not found!".format(route_file))
+                sys.exit(-1)
+            try:
+                route_point_list = read_route_file(route_file,
+                    debug=debugflg)
+            except ValueError as err:
+                print("ERROR:  Route file '{}' {}!".format(route_file, err))
+                sys.exit(-1)
+            print("Keeping channels within {} km of route: {}".format(
+                args.route_radius, os.path.basename(route_file)))
+            geo_filter.add_route(route_point_list, args.route_radius)
+
+    # Set up the optional --user_db digital contact list
+    contact_filter = None
+    if args.user_db is not None:
+        if not os.path.exists(args.user_db):
+            print("ERROR:  User database file '{}' not found!".format(
+                args.user_db))
+            sys.exit(-1)
+        contact_filter = ContactFilter(country_list=args.user_db_country,
+            region_list=args.user_db_region, prefix_list=args.user_db_prefix)
+
+    # Load the K7ABD input files (in parallel with --jobs) into a codeplug
+    codeplug = Codeplug(zones_order_list=zones_order_list,
+        tg_filter_list=tg_filter_list, rptr_filter_list=rptr_filter_list,
+        scan_lists=args.scan_lists, rx_groups=args.rx_groups,
+        geo_filter=geo_filter, user_db_file=args.user_db,
+        contact_filter=contact_filter, debug=debugflg)
+    codeplug.load_dir(inputs_dir, jobs=jobs)
+    for dump_file in args.repeater_dump:
+        if not os.path.exists(dump_file):
+            print("ERROR:  Repeater dump file '{}' not found!".format(
+                dump_file))
+            sys.exit(-1)
+        codeplug.add_repeater_dump(dump_file)
+
+    # Check every record up front and report all problems in one go
+    problems_list = codeplug.validate(args.cps_target)
+    if len(problems_list) > 0:
+        print_problems(problems_list)
+        print("Aborting.")
+        sys.exit(-1)
+    channels_dict = codeplug.channels_dict
+    zones_dict = codeplug.zones_dict
+    tg_by_num_dict = codeplug.tg_by_num_dict
+    names_index = codeplug.names_index
+
+    # Report distinct names that collapse into one when truncated
+    collision_list = find_truncation_collisions(names_index)
+    for kind, short_name, name_list in collision_list:
+        print("Warning:  {} names truncate to the same '{}':".format(kind,
+            short_name))
+        for full_name, source, suggestion in name_list:
+            if suggestion is None:
+                print("             '{}' ({}) keeps it".format(full_name,
+                    source))
+            else:
+                print("             '{}' ({}) suggest '{}'".format(full_name,
+                    source, suggestion))
 
+    # Look for the same channel defined under different names
+    if args.dup_check or args.dup_merge:
+        duplicates_dict = find_duplicate_channels(channels_dict,
+            debug=debugflg)
+        dup_cnt = 0
+        for first_name in duplicates_dict.keys():
+            dup_cnt += len(duplicates_dict[first_name])
+            print("Warning:  '{}' duplicated by: {}".format(first_name,
+                ', '.join(["'{}'".format(name) for name in
+                           duplicates_dict[first_name]])))
+        print("Duplicate check: {} duplicate channels found.".format(dup_cnt))
+        if args.dup_merge and dup_cnt > 0:
+            merge_duplicate_channels(channels_dict, zones_dict,
+                duplicates_dict, debug=debugflg)
+            print("   Merged {} duplicates, {} channels remain.".format(
+                dup_cnt, len(channels_dict)))
+
+    # Check TX-enabled channels against the band plan
+    if args.band_plan:
+        band_plan_filespec = os.path.join(inputs_dir, 'MyBandPlan.csv')
+        # sanity check - file must be present
+        if not os.path.exists(band_plan_filespec):
+            print("ERROR:  option --band_plan set, but band plan file not found!")
+            print("        (file '{}' must exist)".format(band_plan_filespec))
+            sys.exit(-1)
+        print("Reading Band Plan file: {}".format(
+            os.path.basename(band_plan_filespec)))
+        band_plan = read_band_plan_file(band_plan_filespec, debug=debugflg)
+        violation_list = check_band_plan(channels_dict, band_plan,
+            force_rx_only=args.force_rx_only, debug=debugflg)
+        for ch_name, reason in violation_list:
+            if args.force_rx_only:
+                print("Warning:  '{}' {}, set to RX Only.".format(ch_name,
+                    reason))
+            else:
+                print("Warning:  '{}' {}.".format(ch_name, reason))
+        print("Band plan check: {} TX-enabled channels out of plan.".format(
+            len(violation_list)))
+
+    # Compare the resolved model against radio exports
+    if len(args.diff_dir) > 0:
+        model_channel_index, model_zone_index, model_tg_index = \
+            build_model_diff_indexes(channels_dict, zones_dict,
+                tg_by_num_dict)
+        for export_dir in args.diff_dir:
+            radio_channel_index, radio_zone_index, radio_tg_index = \
+                anytone_read_export_diff_indexes(export_dir, debug=debugflg)
+            channel_diff = diff_channel_indexes(model_channel_index,
+                radio_channel_index)
+            zone_diff = None
+            if radio_zone_index is not None:
+                zone_diff = diff_zone_indexes(model_zone_index,
+                    radio_zone_index)
+            tg_diff = None
+            if radio_tg_index is not None:
+                tg_diff = diff_talk_group_indexes(model_tg_index,
+                    radio_tg_index)
+            print_diff_report(export_dir, channel_diff, zone_diff, tg_diff,
+                debug=debugflg)
+
+    # Answer frequency queries against the resolved model
+    if len(args.query) > 0:
+        query_indexes = build_query_indexes(channels_dict, zones_dict)
+        for query_str in args.query:
+            low_hz, high_hz = parse_query_range(query_str)
+            match_set = query_channels(query_indexes, low_hz, high_hz,
+                color_code=args.query_cc, tg_number=args.query_tg,
+                zone_name=args.query_zone)
+            print_query_results(query_str, match_set, channels_dict,
+                query_indexes)
+
+    # Look for TX/RX and intermod conflicts across the codeplug
+    if args.conflicts:
         print("")
-        print("Generating import files for Anytone D578UV")
-
-        # define our export file names
-        zones_output_filename = 'd578uv_zones_{}.csv'.format(isodate)
-        zones_output_file = os.path.join(outputs_dir, zones_output_filename)
-        talk_groups_output_filename = 'd578uv_talk_groups_{}.csv'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'd578uv_channels_{}.csv'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out an Anytone 578 zones import file
-        print("   Zones import file: {}".format(
-            os.path.basename(zones_output_file)))
-        anytone_write_zones_export(zones_dict, zones_order_list,
-            zones_output_file, channels_dict, model="578", debug=debugflg)
-
-        # Write out an Anytone 578 talk groups import file
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        anytone_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, debug=debugflg)
-
-        # Write out an Anytone 578 channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        anytone_write_channels_export(channels_dict,
-            channels_output_file, model="578", debug=debugflg)
-
-
-    if '878' in args.cps_target:
-
+        print("Analyzing frequency conflicts (tolerance {} kHz)".format(
+            args.conflict_tolerance))
+        report_list = analyze_frequency_conflicts(channels_dict,
+            tolerance_hz=int(round(args.conflict_tolerance * 1000)),
+            debug=debugflg)
+        conflicts_output_file = os.path.join(outputs_dir,
+            'frequency_conflicts_{}.csv'.format(isodate))
+        print("   Conflicts report file: {}".format(
+            os.path.basename(conflicts_output_file)))
+        write_frequency_conflicts_report(report_list, conflicts_output_file,
+            debug=debugflg)
+        conflict_count_dict = {'TX/RX': 0, 'IM3': 0}
+        for report_row in report_list:
+            conflict_count_dict[report_row[0]] += 1
+        print("   {} TX/RX conflicts, {} RX frequencies hit by IM3 products".format(
+            conflict_count_dict['TX/RX'], conflict_count_dict['IM3']))
+
+    # Assign persistent channel numbers
+    if args.channel_numbers:
+        channel_numbers_filespec = os.path.join(inputs_dir,
+            'MyChannelNumbers.csv')
+        if os.path.exists(channel_numbers_filespec):
+            print("Reading Channel Numbers file: {}".format(
+                os.path.basename(channel_numbers_filespec)))
+            channel_numbers_dict = read_channel_numbers_file(
+                channel_numbers_filespec, debug=debugflg)
+        else:
+            channel_numbers_dict = {}
+        channel_numbers_dict = assign_channel_numbers(channels_dict,
+            channel_numbers_dict, debug=debugflg)
+    else:
+        channel_numbers_dict = None
+
+    # Compare the model against the last build's snapshot
+    snapshot_file = os.path.join(outputs_dir, 'cps_build_snapshot.json')
+    prev_snapshot_dict = read_build_snapshot(snapshot_file, debug=debugflg)
+    build_dict = codeplug.resolve(channel_numbers_dict=channel_numbers_dict,
+        prev_snapshot_dict=prev_snapshot_dict, delta=args.delta)
+    changed_dict = build_dict['changed']
+    if args.delta:
         print("")
-        print("Generating import files for Anytone D878UV")
-
-        # define our export file names
-        zones_output_filename = 'd878uv_zones_{}.csv'.format(isodate)
-        zones_output_file = os.path.join(outputs_dir, zones_output_filename)
-        talk_groups_output_filename = 'd878uv_talk_groups_{}.csv'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'd878uv_channels_{}.csv'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out an Anytone 878 zones import file
-        print("   Zones import file: {}".format(
-            os.path.basename(zones_output_file)))
-        anytone_write_zones_export(zones_dict, zones_order_list,
-            zones_output_file, channels_dict, model="878", debug=debugflg)
-
-        # Write out an Anytone 878 talk groups import file
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        anytone_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, debug=debugflg)
-
-        # Write out an Anytone 878 channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        anytone_write_channels_export(channels_dict,
-            channels_output_file, model="878", debug=debugflg)
-
-
-    # Generate import files for Connect Systems CS800D
-    if 'cs800d' in args.cps_target:
+        print("Delta build: {} channels, {} zones, {} talk groups new or changed.".format(
+            len(changed_dict['channels']), len(changed_dict['zones']),
+            len(changed_dict['talk groups'])))
 
+    # Stream the import files into a zip bundle instead of outputs_dir
+    if args.bundle is not None and len(args.cps_target) > 0:
         print("")
-        print("Generating import files for Connect Systems CS800D")
-
-        # define our export file names
-        talk_groups_output_filename = 'cs800d_talk_groups_{}.xlsx'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'cs800d_channels_{}.xlsx'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out a CS800D talk groups import file
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        cs800d_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, debug=debugflg)
-
-        # Write out a CS800D channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        cs800d_write_channels_export(channels_dict,
-            channels_output_file, debug=debugflg)
-
+        print("Writing import files to bundle: {}".format(args.bundle))
+        bundle_dict = open_output_bundle(args.bundle, debug=debugflg)
+    else:
+        bundle_dict = None
 
-    # Generate import files for Connect Systems CS800D
-    if 'opengd77' in args.cps_target:
+    # Generate import files for each selected CPS target
+    for target in supported_cps_targets:
+        if target not in args.cps_target:
+            continue
+        target_dict = cps_target_registry[target]
 
         print("")
-        print("Generating import files for Open GD77 CPS")
-
-        # define our export file names
-        talk_groups_output_filename = 'opengd77_talk_groups_{}.csv'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'opengd77_channels_{}.csv'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out an opengd77 talk groups import file
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        opengd77_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, debug=debugflg)
-
-        # Write out an opengd77 channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        opengd77_write_channels_export(channels_dict,
-            channels_output_file, debug=debugflg)
-
-
-    # Generate import files for Tytera MD-UV380/MD-UV390
-    if 'uv380' in args.cps_target:
-
+        print("Generating import files for {}".format(
+            target_dict['description']))
+        if args.delta and not target_dict['delta']:
+            print("   Delta import not supported by this CPS, writing full files.")
+
+        open_output = functools.partial(open_output_file, bundle_dict,
+            outputs_dir, target=target)
+        codeplug.write_files(target, open_output, isodate=isodate)
+
+    # Finish the bundle with its manifest
+    if bundle_dict is not None:
+        close_output_bundle(bundle_dict, codeplug.counts(), isodate,
+            debug=debugflg)
         print("")
-        print("Generating import files for Tytera MD-UV380/MD-UV390")
-
-        # define our export file names
-        talk_groups_output_filename = 'uv380_talk_groups_{}.csv'.format(
-            isodate)
-        talk_groups_output_file = os.path.join(outputs_dir,
-        talk_groups_output_filename)
-        channels_output_filename = 'uv380_channels_{}.csv'.format(isodate)
-        channels_output_file = os.path.join(outputs_dir,
-            channels_output_filename)
-
-        # Write out an MD-UV380 talk groups import file
-        tytera_tg_index_dict = {}
-        print("   Talk group import file: {}".format(
-            os.path.basename(talk_groups_output_file)))
-        uv380_write_talk_groups_export(tg_by_num_dict,
-            talk_groups_output_file, tytera_tg_index_dict, debug=debugflg)
-
-        # Write out an MD-UV380 channel import file
-        print("   Channels import file: {}".format(
-            os.path.basename(channels_output_file)))
-        uv380_write_channels_export(channels_dict,
-            channels_output_file, tytera_tg_index_dict, debug=debugflg)
+        print("Bundle {}: {} import files and manifest.json".format(
+            args.bundle, len(bundle_dict['files'])))
+
+    # Save the snapshot for the next --delta build and the channel numbers;
+    # a bundle leaves outputs_dir alone, so its delta baseline stays put
+    if len(args.cps_target) > 0:
+        if bundle_dict is None:
+            write_build_snapshot(codeplug.snapshot_dict, snapshot_file,
+                debug=debugflg)
+        if channel_numbers_dict is not None:
+            print("")
+            print("Updating Channel Numbers file: {}".format(
+                os.path.basename(channel_numbers_filespec)))
+            write_channel_numbers_file(channel_numbers_dict,
+                channel_numbers_filespec, debug=debugflg)
 
     print("")
     print("All done!")
@@ -0,0 +1,17 @@
+# coding: utf-8
+#
+# Library side of cps-import-builder.  The Codeplug object loads K7ABD
+# style input files and writes import files for any supported CPS target
+# without going through the command line script:
+#
+#     from cps_import_builder import Codeplug
+#
+#     codeplug = Codeplug()
+#     codeplug.load_dir('input_data_files')
+#     with open('d878uv.zip', 'wb') as stream:
+#         codeplug.write('878', stream)
+#
+
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.targets import supported_cps_targets
@@ -0,0 +1,278 @@
+# coding: utf-8
+#
+# Stage benchmarks and the performance regression gate.  A fixed synthetic
+# K7ABD library is generated, each build stage is timed (best of a few
+# runs) and its peak Python memory measured, and the results are compared
+# with a committed baseline JSON.
+#
+
+
+import contextlib
+import functools
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.common import ctcss_list
+from cps_import_builder.k7abd import k7abd_file_types, find_k7abd_files
+from cps_import_builder.output import open_output_file
+
+
+# the committed baseline, next to this module
+benchmark_baseline_file = os.path.join(os.path.dirname(__file__),
+    'benchmark_baseline.json')
+
+# size of the synthetic library, large enough that the main stages run
+# for a good fraction of a second; changing any of these invalidates the
+# committed baseline, so re-run with --benchmark_update afterwards
+benchmark_dataset_dict = {'seed': 7300, 'talk groups': 200,
+    'analog channels': 7500, 'digital-others channels': 2000,
+    'repeaters': 1200, 'talk groups per repeater': 24}
+
+# targets whose writers are benchmarked
+benchmark_target_list = ['878', 'uv380']
+
+# regressions smaller than this are noise, whatever the percentage; run
+# to run jitter on a busy machine reaches tens of milliseconds, so the
+# short stages only fail on a large absolute slowdown
+benchmark_min_seconds = 0.1
+benchmark_min_peak_kib = 1024
+
+
+
+def write_benchmark_dataset(inputs_dir, dataset_dict=None):
+    """This function writes the synthetic K7ABD library into inputs_dir.
+
+    The library is generated from a fixed seed, so every run (and every
+    machine) benchmarks exactly the same input.
+    """
+
+    if dataset_dict is None:
+        dataset_dict = benchmark_dataset_dict
+    rand = random.Random(dataset_dict['seed'])
+
+    # talk groups: Talkgroups__ files have no header line
+    tg_name_list = ['Bench TG {:03d}'.format(i)
+                    for i in range(dataset_dict['talk groups'])]
+    tg_df = pandas.DataFrame([[tg_name, 31000 + i]
+                              for i, tg_name in enumerate(tg_name_list)])
+    tg_df.to_csv(os.path.join(inputs_dir, 'Talkgroups__Bench.csv'),
+        header=False, index=False)
+
+    # analog channels spread over 2m and 70cm
+    row_list = []
+    for i in range(dataset_dict['analog channels']):
+        if i % 2:
+            rx_freq = 144.0 + rand.randrange(0, 4000) * 0.0005
+        else:
+            rx_freq = 440.0 + rand.randrange(0, 10000) * 0.0005
+        tone = rand.choice(['Off'] + ctcss_list)
+        row_list.append(['Bench Analog {:02d}'.format(i // 64),
+            'Bench A{:05d}'.format(i), rand.choice(['12.5K', '25K']),
+            rand.choice(['Low', 'Medium', 'High']), round(rx_freq, 4),
+            round(rx_freq + rand.choice([0.0, 0.6, 5.0]), 4), tone, tone,
+            rand.choice(['Off', 'Off', 'On'])])
+    pandas.DataFrame(row_list, columns=['Zone', 'Channel Name', 'Bandwidth',
+        'Power', 'RX Freq', 'TX Freq', 'CTCSS Decode', 'CTCSS Encode',
+        'TX Prohibit']).to_csv(os.path.join(inputs_dir,
+        'Analog__Bench.csv'), index=False)
+
+    # digital simplex and hotspot channels
+    row_list = []
+    for i in range(dataset_dict['digital-others channels']):
+        rx_freq = round(430.0 + rand.randrange(0, 20000) * 0.0005, 4)
+        row_list.append(['Bench Digital {:02d}'.format(i // 64),
+            'Bench D{:05d}'.format(i), rand.choice(['Low', 'High']),
+            rx_freq, rx_freq, rand.randrange(0, 16),
+            rand.choice(tg_name_list), rand.choice([1, 2]), 'Group Call',
+            rand.choice(['Always', 'Same Color Code'])])
+    pandas.DataFrame(row_list, columns=['Zone', 'Channel Name', 'Power',
+        'RX Freq', 'TX Freq', 'Color Code', 'Talk Group', 'TimeSlot',
+        'Call Type', 'TX Permit']).to_csv(os.path.join(inputs_dir,
+        'Digital-Others__Bench.csv'), index=False)
+
+    # a wide repeater sheet: one talk group column each, slot or "-"
+    row_list = []
+    for i in range(dataset_dict['repeaters']):
+        rx_freq = round(440.0 + rand.randrange(0, 10000) * 0.0005, 4)
+        slot_dict = dict((tg_name, rand.choice(['1', '2'])) for tg_name in
+            rand.sample(tg_name_list, dataset_dict['talk groups per repeater']))
+        row_list.append(['Bench Rptr {:03d};r{:03d}'.format(i, i),
+            'Repeater {}'.format(i), rand.choice(['Low', 'High']), rx_freq,
+            round(rx_freq + 5.0, 4), rand.randrange(1, 16)] +
+            [slot_dict.get(tg_name, '-') for tg_name in tg_name_list])
+    pandas.DataFrame(row_list, columns=['Zone Name', 'Comment', 'Power',
+        'RX Freq', 'TX Freq', 'Color Code'] + tg_name_list).to_csv(
+        os.path.join(inputs_dir, 'Digital-Repeaters__Bench.csv'), index=False)
+
+    return
+
+
+
+def run_benchmark_stages(inputs_dir, outputs_dir, measure_memory=False):
+    """This function runs every build stage once.
+
+    Returns {stage: seconds} or, with measure_memory, {stage: peak KiB}
+    as traced by tracemalloc (tracing slows the stages down, so time and
+    memory are measured in separate runs).
+    """
+
+    file_spec_list = find_k7abd_files(inputs_dir)
+    codeplug = Codeplug()
+
+    def load_files(file_type):
+        for spec_type, file_name in file_spec_list:
+            if spec_type == file_type:
+                codeplug.add_file(file_type, file_name)
+
+    stage_list = []
+    for file_type in k7abd_file_types:
+        stage_list.append(('load ' + file_type.rstrip('_').lower(),
+            functools.partial(load_files, file_type)))
+    stage_list.append(('validate', codeplug.validate))
+    stage_list.append(('resolve', codeplug.resolve))
+    for target in benchmark_target_list:
+        stage_list.append(('write ' + target, functools.partial(
+            codeplug.write_files, target, functools.partial(open_output_file,
+            None, outputs_dir, target=target), isodate='bench')))
+
+    result_dict = {}
+    for stage, stage_func in stage_list:
+        # the stages chat about what they load and write
+        with contextlib.redirect_stdout(io.StringIO()), \
+                warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            if measure_memory:
+                tracemalloc.start()
+                stage_func()
+                result_dict.update({stage:
+                    round(tracemalloc.get_traced_memory()[1] / 1024.0)})
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                stage_func()
+                result_dict.update({stage: time.perf_counter() - start})
+
+    return result_dict
+
+
+
+def run_benchmarks(repeat=3):
+    """This function benchmarks the build stages on the synthetic library.
+
+    Returns {stage: {'seconds': best of repeat runs, 'peak kib': peak
+    memory}} with the stages in build order.
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs_dir = os.path.join(work_dir, 'inputs')
+        outputs_dir = os.path.join(work_dir, 'outputs')
+        os.mkdir(inputs_dir)
+        os.mkdir(outputs_dir)
+        write_benchmark_dataset(inputs_dir)
+
+        seconds_list = [run_benchmark_stages(inputs_dir, outputs_dir)
+                        for i in range(max(1, repeat))]
+        peak_dict = run_benchmark_stages(inputs_dir, outputs_dir,
+            measure_memory=True)
+
+    stage_dict = {}
+    for stage in peak_dict.keys():
+        stage_dict.update({stage: {
+            'seconds': round(min([seconds_dict[stage] for seconds_dict in
+                                  seconds_list]), 4),
+            'peak kib': peak_dict[stage]}})
+
+    return stage_dict
+
+
+
+def read_benchmark_baseline(baseline_file):
+    """This function reads a baseline written by write_benchmark_baseline()."""
+
+    with open(baseline_file, 'r') as baseline_fd:
+        baseline_dict = json.load(baseline_fd)
+
+    return baseline_dict
+
+
+
+def write_benchmark_baseline(stage_dict, baseline_file):
+    """This function saves benchmark results as the new baseline."""
+
+    baseline_dict = {'dataset': benchmark_dataset_dict,
+                     'targets': benchmark_target_list,
+                     'stages': stage_dict}
+    with open(baseline_file, 'w') as baseline_fd:
+        json.dump(baseline_dict, baseline_fd, indent=2)
+        baseline_fd.write('\n')
+
+    return
+
+
+
+def compare_benchmarks(stage_dict, baseline_dict, threshold=25.0):
+    """This function compares stage results with a baseline.
+
+    A stage regresses when its time or peak memory grows by more than
+    threshold percent (and by more than the noise floor).  Returns a list
+    of (stage, measure, baseline, current, percent, regressed) rows;
+    stages missing from either side are skipped.
+    """
+
+    row_list = []
+    baseline_stage_dict = baseline_dict['stages']
+    for stage in stage_dict.keys():
+        if stage not in baseline_stage_dict:
+            continue
+        for measure, floor in [('seconds', benchmark_min_seconds),
+                               ('peak kib', benchmark_min_peak_kib)]:
+            base_val = baseline_stage_dict[stage][measure]
+            cur_val = stage_dict[stage][measure]
+            if base_val > 0:
+                percent = (cur_val - base_val) * 100.0 / base_val
+            else:
+                percent = 0.0
+            regressed = (percent > threshold and
+                         cur_val - base_val > floor)
+            row_list.append((stage, measure, base_val, cur_val, percent,
+                             regressed))
+
+    return row_list
+
+
+
+def print_benchmark_comparison(row_list, threshold):
+    """This function prints the per-stage deltas and returns True on a regression."""
+
+    print("{:<26} {:>9} {:>12} {:>12} {:>9}".format('Stage', 'Measure',
+        'Baseline', 'Current', 'Delta'))
+    regression_cnt = 0
+    for stage, measure, base_val, cur_val, percent, regressed in row_list:
+        if measure == 'seconds':
+            base_str = '{:.4f}'.format(base_val)
+            cur_str = '{:.4f}'.format(cur_val)
+        else:
+            base_str = '{:d}'.format(int(base_val))
+            cur_str = '{:d}'.format(int(cur_val))
+        flag = ''
+        if regressed:
+            flag = '  REGRESSION'
+            regression_cnt += 1
+        print("{:<26} {:>9} {:>12} {:>12} {:>+8.1f}%{}".format(stage,
+            measure, base_str, cur_str, percent, flag))
+    if regression_cnt > 0:
+        print("{} measure(s) regressed by more than {}%.".format(
+            regression_cnt, threshold))
+    else:
+        print("No stage regressed by more than {}%.".format(threshold))
+
+    return regression_cnt > 0
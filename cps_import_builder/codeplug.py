@@ -0,0 +1,330 @@
+# coding: utf-8
+#
+# The Codeplug object: a channel, zone and talk group model built from
+# K7ABD style input files that can write import files for any CPS target.
+#
+#  Our internal channel dictionary contains a set of channel
+#  attributes which are in stored in a dictionary for that
+#  channel. Here are the keys available in the attribute dict:
+#
+#  Key          Comments
+#  'Ch Type'        Analog or Digital
+#  'RX Freq'        Receive frequency of the channel, integer Hz
+#  'TX Freq'        Transmit frequency of the channel, integer Hz
+#  'Power'          Power level to operate at Low,Medium,High,Turbo
+#                   (Turbo & High are equivalent when not supported)
+#  'Bandwidth'      Channel bandwidth 12.5 or 25
+#  'CTCSS Decode'   Rx tone decode value
+#  'CTCSS Encode'   Tx tone encode value
+#  'RX Only'        Make channel receive only if set to "On"
+#
+#  Additional attributes for a digital channel:
+#
+#  Key
+#  'Color Code'     Integer val 1-14
+#  'Talk Group'     Contact/TG Name
+#  'TG Number'      Talk group ID
+#  'Time Slot'      "1" or "2"
+#  'Call Type'      "Group Call" or "Private Call"
+#  'TX Permit'      "Same Color Code" or "Always"
+#
+
+
+import functools
+import os
+import time
+
+from cps_import_builder.common import new_target_names
+from cps_import_builder.dumps import add_channels_fm_repeater_dump
+from cps_import_builder.k7abd import (find_k7abd_files,
+    read_k7abd_file_batches, add_talkgroups_fm_k7abd_talkgroups_file,
+    add_channels_fm_k7abd_analog_file,
+    add_channels_fm_k7abd_digital_others_file,
+    add_channels_fm_k7abd_digital_repeaters_file)
+from cps_import_builder.lists import build_zone_scan_lists, build_rx_groups
+from cps_import_builder.output import (open_output_bundle, open_output_file,
+    close_output_bundle)
+from cps_import_builder.snapshot import (build_snapshot_hashes,
+    changed_snapshot_keys)
+from cps_import_builder.targets import cps_target_file_names, load_cps_target
+from cps_import_builder.validate import (validate_channels,
+    validate_targets, sort_problems)
+
+
+class Codeplug:
+    """A channel, zone and talk group model and the builds made from it.
+
+    Everything a build needs lives on the object rather than in module
+    globals, so a long running process can keep a loaded codeplug warm and
+    write any target from it as often as it likes.  Typical use:
+
+        codeplug = Codeplug()
+        codeplug.load_dir('input_data_files')
+        codeplug.resolve()
+        with open('d878uv.zip', 'wb') as stream:
+            codeplug.write('878', stream)
+    """
+
+    def __init__(self, zones_order_list=None, tg_filter_list=None,
+            rptr_filter_list=None, scan_lists=False, rx_groups=None,
+            geo_filter=None, user_db_file=None, contact_filter=None,
+            debug=False):
+        self.channels_dict = {}
+        self.zones_dict = {}
+        self.tg_by_num_dict = {}
+        self.tg_by_name_dict = {}
+        self.rx_groups_dict = {}
+        self.rx_group_by_channel_dict = {}
+        self.repeater_talk_groups_dict = {}
+        self.scan_lists_dict = {}
+        self.names_index = {}
+        self.sources_dict = {}
+        self.problems_list = []
+        self.zones_order_list = list(zones_order_list or [])
+        self.tg_filter_list = list(tg_filter_list or [])
+        self.rptr_filter_list = list(rptr_filter_list or [])
+        self.scan_lists = scan_lists
+        self.rx_groups = rx_groups
+        self.geo_filter = geo_filter
+        self.user_db_file = user_db_file
+        self.contact_filter = contact_filter
+        self.debug = debug
+        self.build_dict = None
+        self.snapshot_dict = None
+
+    def counts(self):
+        """Returns the number of channels, zones and talk groups."""
+
+        return {'channels': len(self.channels_dict),
+                'zones': len(self.zones_dict),
+                'talk groups': len(self.tg_by_num_dict)}
+
+    def load_dir(self, inputs_dir, jobs=1):
+        """Adds every K7ABD input file in a directory, in load order.
+
+        With jobs > 1 the files are parsed by a process pool first; they
+        are still added one at a time in the same order, so the first
+        definition of a name wins exactly as in a serial run.
+        """
+
+        file_spec_list = find_k7abd_files(inputs_dir)
+        if jobs > 1:
+            print("Parsing {} input files using {} jobs".format(
+                len(file_spec_list), jobs))
+            batch_list = read_k7abd_file_batches(file_spec_list, jobs=jobs)
+        else:
+            # serial runs let each loader read its own file (in chunks for
+            # Digital-Repeaters__ sheets) to keep memory use down
+            batch_list = [None] * len(file_spec_list)
+        for (file_type, file_name), file_batch in zip(file_spec_list,
+                batch_list):
+            self.add_file(file_type, file_name, file_batch=file_batch)
+
+        return
+
+    def add_file(self, file_type, file_name, file_batch=None):
+        """Adds one K7ABD input file given its type ('Analog__', ...)."""
+
+        if file_type == 'Talkgroups__':
+            self.add_talkgroups_file(file_name, file_batch=file_batch)
+        elif file_type == 'Analog__':
+            self.add_analog_file(file_name, file_batch=file_batch)
+        elif file_type == 'Digital-Others__':
+            self.add_digital_others_file(file_name, file_batch=file_batch)
+        else:
+            self.add_digital_repeaters_file(file_name, file_batch=file_batch)
+
+        return
+
+    def add_talkgroups_file(self, file_name, file_batch=None):
+        """Adds the talk groups from a K7ABD Talkgroups__ file."""
+
+        print("Adding talkgroups:  {}".format(os.path.basename(file_name)))
+        add_talkgroups_fm_k7abd_talkgroups_file(file_name,
+            self.tg_by_num_dict, self.tg_by_name_dict,
+            names_index=self.names_index, file_batch=file_batch,
+            sources_dict=self.sources_dict, problems_list=self.problems_list,
+            debug=self.debug)
+        self.build_dict = None
+
+        return
+
+    def add_analog_file(self, file_name, file_batch=None):
+        """Adds the channels from a K7ABD Analog__ file."""
+
+        print("Adding channels:  {}".format(os.path.basename(file_name)))
+        add_channels_fm_k7abd_analog_file(file_name, self.channels_dict,
+            self.zones_dict, names_index=self.names_index,
+            file_batch=file_batch, sources_dict=self.sources_dict,
+            problems_list=self.problems_list, geo_filter=self.geo_filter,
+            debug=self.debug)
+        self.build_dict = None
+
+        return
+
+    def add_digital_others_file(self, file_name, file_batch=None):
+        """Adds the channels from a K7ABD Digital-Others__ file."""
+
+        print("Adding channels:  {}".format(os.path.basename(file_name)))
+        add_channels_fm_k7abd_digital_others_file(file_name,
+            self.channels_dict, self.zones_dict, self.tg_by_num_dict,
+            self.tg_by_name_dict, names_index=self.names_index,
+            file_batch=file_batch, sources_dict=self.sources_dict,
+            problems_list=self.problems_list, debug=self.debug)
+        self.build_dict = None
+
+        return
+
+    def add_digital_repeaters_file(self, file_name, file_batch=None):
+        """Adds the channels from a K7ABD Digital-Repeaters__ file."""
+
+        print("Adding channels:  {}".format(os.path.basename(file_name)))
+        add_channels_fm_k7abd_digital_repeaters_file(file_name,
+            self.channels_dict, self.zones_dict, self.tg_by_num_dict,
+            self.tg_by_name_dict, self.tg_filter_list,
+            self.rptr_filter_list, names_index=self.names_index,
+            file_batch=file_batch, sources_dict=self.sources_dict,
+            problems_list=self.problems_list,
+            repeater_talk_groups_dict=(self.repeater_talk_groups_dict
+                if self.rx_groups else None),
+            geo_filter=self.geo_filter, debug=self.debug)
+        self.build_dict = None
+
+        return
+
+    def add_repeater_dump(self, file_name):
+        """Adds the repeaters from a bulk .json, .jsonl or .csv dump file.
+
+        Each record is expanded exactly like a Digital-Repeaters__ row;
+        the dump is streamed, so it may hold any number of repeaters.
+        """
+
+        print("Adding repeaters:  {}".format(os.path.basename(file_name)))
+        add_channels_fm_repeater_dump(file_name, self.channels_dict,
+            self.zones_dict, self.tg_by_num_dict, self.tg_by_name_dict,
+            self.tg_filter_list, self.rptr_filter_list,
+            names_index=self.names_index, sources_dict=self.sources_dict,
+            problems_list=self.problems_list,
+            repeater_talk_groups_dict=(self.repeater_talk_groups_dict
+                if self.rx_groups else None),
+            geo_filter=self.geo_filter, debug=self.debug)
+        self.build_dict = None
+
+        return
+
+    def validate(self, target_list=None):
+        """Returns every problem in the loaded model, by file and line.
+
+        Combines the problems the loaders collected (bad frequencies,
+        conflicting or undefined talk groups) with a bulk check of every
+        channel's attributes and, for each target in target_list, the
+        values and limits that target's CPS accepts.  Each problem is a
+        ((file name, line), message) pair; an empty list means the model
+        is safe to write.
+        """
+
+        return sort_problems(self.problems_list +
+            validate_channels(self.channels_dict, self.sources_dict) +
+            validate_targets(self.channels_dict, target_list or [],
+                             self.sources_dict))
+
+    def resolve(self, channel_numbers_dict=None, prev_snapshot_dict=None,
+            delta=False):
+        """Fixes the loaded model as the input for the target writers.
+
+        Hashes the model for the build snapshot and, for a delta build,
+        works out what changed since prev_snapshot_dict.  Returns the
+        build dict handed to every target's write_import_files().
+        """
+
+        if prev_snapshot_dict is None:
+            prev_snapshot_dict = {'hashes': {}, 'numbers': {}}
+        self.snapshot_dict = {
+            'hashes': build_snapshot_hashes(self.channels_dict,
+                self.zones_dict, self.tg_by_num_dict),
+            'numbers': dict(prev_snapshot_dict['numbers'])}
+        # one scan list per zone, for the targets that write them
+        if self.scan_lists:
+            self.scan_lists_dict = build_zone_scan_lists(self.zones_dict,
+                self.zones_order_list)
+        else:
+            self.scan_lists_dict = {}
+
+        # receive group lists per repeater or per slot ('repeater'/'slot')
+        if self.rx_groups:
+            self.rx_groups_dict, self.rx_group_by_channel_dict = \
+                build_rx_groups(self.repeater_talk_groups_dict,
+                mode=self.rx_groups)
+            rx_groups_build_dict = {'groups': self.rx_groups_dict,
+                                    'channels': self.rx_group_by_channel_dict}
+        else:
+            rx_groups_build_dict = None
+
+        changed_dict = {}
+        for kind in ['channels','zones','talk groups']:
+            if delta:
+                changed_dict.update({kind: changed_snapshot_keys(
+                    self.snapshot_dict['hashes'][kind],
+                    prev_snapshot_dict['hashes'].get(kind, {}))})
+            else:
+                changed_dict.update({kind: None})
+        self.build_dict = {
+            'channels': self.channels_dict,
+            'zones': self.zones_dict,
+            'talk groups': self.tg_by_num_dict,
+            'zones order': self.zones_order_list,
+            'scan lists': self.scan_lists_dict if self.scan_lists else None,
+            'rx groups': rx_groups_build_dict,
+            'user db': ({'file': self.user_db_file,
+                         'filter': self.contact_filter}
+                        if self.user_db_file is not None else None),
+            'channel numbers': channel_numbers_dict,
+            'changed': changed_dict,
+            'prev snapshot': prev_snapshot_dict,
+            'delta': delta}
+
+        return self.build_dict
+
+    def write_files(self, target, open_output, isodate=None):
+        """Writes a target's import files through open_output(file name).
+
+        open_output is a context manager factory yielding a path or a
+        stream for each file (see cps_import_builder.output).  Returns the
+        target's file names by kind.
+        """
+
+        if self.build_dict is None:
+            self.resolve()
+        if isodate is None:
+            isodate = time.strftime("%Y-%m-%d")
+        file_name_dict = cps_target_file_names(target,
+            self.build_dict['delta'], isodate)
+        # names are converted through a cache that lasts for this build
+        build_dict = dict(self.build_dict)
+        build_dict.update({'target names': new_target_names()})
+        numbers_dict = load_cps_target(target).write_import_files(target,
+            build_dict, file_name_dict, open_output, debug=self.debug)
+
+        # Record this build's numbering for the next delta build
+        if numbers_dict is not None:
+            self.snapshot_dict['numbers'].update({target: numbers_dict})
+
+        return file_name_dict
+
+    def write(self, target, stream, isodate=None):
+        """Writes a target's import files into stream as a zip bundle.
+
+        stream is any writable binary file object; nothing is written to
+        disk.  The bundle holds the import files and a manifest.json with
+        counts and hashes.  Returns the manifest's file list.
+        """
+
+        if isodate is None:
+            isodate = time.strftime("%Y-%m-%d")
+        bundle_dict = open_output_bundle(stream, debug=self.debug)
+        self.write_files(target, functools.partial(open_output_file,
+            bundle_dict, None, target=target), isodate=isodate)
+        close_output_bundle(bundle_dict, self.counts(), isodate,
+            debug=self.debug)
+
+        return bundle_dict['files']
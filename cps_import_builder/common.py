@@ -0,0 +1,85 @@
+# coding: utf-8
+#
+# Helpers shared by cps-import-builder and its CPS target writers.
+#
+
+
+import functools
+import re
+
+
+# global lists of all CTCSS values
+ctcss_list = ['67','67.0','69.4','71.9','74.4','77','77.0','79.7','82.5','85.4',
+              '88.5','91.5','94.8','97.4','100','100.0','103.5','107.2',
+              '110.9','114.8','118.8','123','123.0','127.3','131.8','136.5',
+              '141.3','146.2','150','150.0','151.4','156.7','159.8',
+              '162.2','165.5','167.9','171.3','173.8','177.3','179.9',
+              '183.5','186.2','189.9','192.8','196.6','199.5','203.5',
+              '206.5','210.7','218.1','225.7','229.1','233.6','241.8',
+              '250.3','254.1']
+
+cdcss_list = ['D023N','D025N','D026N','D031N','D032N','D043N','D047N','D051N',
+              'D054N','D065N','D071N','D072N','D073N','D074N','D114N','D115N',
+              'D116N','D125N','D131N','D132N','D134N','D143N','D152N','D155N',
+              'D156N','D162N','D165N','D172N','D174N','D205N','D223N','D226N',
+              'D243N','D244N','D245N','D251N','D261N','D263N','D265N','D271N',
+              'D306N','D311N','D315N','D331N','D343N','D346N','D351N','D364N',
+              'D365N','D371N','D411N','D412N','D413N','D423N','D431N','D432N',
+              'D445N','D464N','D465N','D466N','D503N','D506N','D516N','D532N',
+              'D546N','D565N','D606N','D612N','D624N','D627N','D631N','D632N',
+              'D654N','D662N','D664N','D703N','D712N','D723N','D731N','D732N',
+              'D734N','D743N','D754N']
+
+
+# distinct (name, target) forms one build remembers; each build gets its
+# own bounded cache from new_target_names()
+target_name_cache_size = 8192
+
+
+def freq_to_hz(freq):
+    """This function converts a frequency in MHz to an integer Hz value."""
+
+    return int(round(float(freq) * 1000000))
+
+
+
+def hz_to_mhz(hz):
+    """This function converts an integer Hz frequency to MHz for output."""
+
+    return hz / 1000000.0
+
+
+
+def target_name(name, target, debug=False):
+    """This function returns a name in the form a CPS target accepts.
+
+    'anytone' and 'uv380' truncate to 16 characters; 'cs800d' also turns
+    runs of characters its CPS rejects into a space first.  A truncated
+    name is reported with a warning.
+    """
+
+    out_name = str(name)
+    if target == 'cs800d':
+        # Need to translate non-alphanumeric characters to spaces
+        out_name = re.sub('[^0-9a-zA-Z~ ]+', ' ', out_name)
+    if len(out_name) > 16:
+        print("WARNING:  Name '{}' > 16, truncating to '{}' for {}".format(
+            out_name, out_name[:16], target))
+        out_name = out_name[:16]
+    if debug and out_name != name:
+        print("   {} name '{}' -> '{}'".format(target, name, out_name))
+
+    return out_name
+
+
+
+def new_target_names(cache_size=target_name_cache_size):
+    """This function returns a target_name() that remembers its results.
+
+    Each distinct name is converted once per build, so the truncation
+    warning is printed once per name rather than once per row.  The cache
+    is bounded and belongs to the build, so nothing grows or goes quiet
+    across the builds of a long running service.
+    """
+
+    return functools.lru_cache(maxsize=cache_size)(target_name)
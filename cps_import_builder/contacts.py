@@ -0,0 +1,244 @@
+# coding: utf-8
+#
+# DMR user database (digital contact list) support.  A user database .csv
+# (e.g. RadioID.net's user.csv) is streamed a row at a time through the
+# country/region/callsign filters and cleaned up for the radio, so a list
+# of any size is written in constant memory.
+#
+#  The database needs a radio ID and a callsign column; the rest are
+#  optional.  Columns are matched ignoring case, spaces, '_' and '-':
+#
+#  Field        Also accepted as
+#  'Radio ID'   id, dmr id
+#  'Callsign'   call
+#  'Name'       first name (with 'Last Name'/surname appended if present)
+#  'City'
+#  'State'      region, province
+#  'Country'
+#  'Remarks'    remark
+#
+
+
+import csv
+import functools
+import itertools
+import unicodedata
+
+from cps_import_builder.dumps import normalize_dump_field
+
+
+# user database column aliases, normalized by normalize_dump_field()
+user_db_field_dict = {
+    'Radio ID': ['radioid', 'id', 'dmrid'],
+    'Callsign': ['callsign', 'call'],
+    'Name': ['name', 'firstname', 'fname'],
+    'Last Name': ['lastname', 'surname', 'lname'],
+    'City': ['city'],
+    'State': ['state', 'region', 'province'],
+    'Country': ['country'],
+    'Remarks': ['remarks', 'remark'],
+    }
+
+# column order of a database without a header line
+user_db_default_columns = ['Radio ID', 'Callsign', 'Name', 'City', 'State',
+                           'Country', 'Remarks']
+
+# DMR radio IDs are 24 bit
+max_radio_id = 16777215
+
+# longest text the radios keep in a contact field
+max_contact_field_len = 16
+
+# distinct field values whose clean up is remembered; cities, states,
+# countries and names repeat a lot, and the cache is bounded
+contact_text_cache_size = 65536
+
+# control characters, dropped from contact fields; tabs and line breaks
+# count as blanks so the words either side of them stay apart
+contact_control_dict = dict((code, None) for code in
+    list(range(0, 32)) + list(range(127, 160)))
+contact_control_dict.update(dict((ord(char), ' ') for char in '\t\n\v\f\r'))
+
+
+
+def user_db_columns(header_list):
+    """This function finds the user database fields in a header line.
+
+    Returns {field: column index}; raises ValueError if there is no radio
+    ID or callsign column.
+    """
+
+    alias_dict = dict((alias, field) for field, alias_list in
+        user_db_field_dict.items() for alias in alias_list)
+    column_dict = {}
+    for index, column in enumerate(header_list):
+        field = alias_dict.get(normalize_dump_field(column))
+        if field is not None and field not in column_dict:
+            column_dict.update({field: index})
+    for field in ['Radio ID', 'Callsign']:
+        if field not in column_dict:
+            raise ValueError("no '{}' column".format(field))
+
+    return column_dict
+
+
+
+def sanitize_contact_text(text, max_len=max_contact_field_len):
+    """This function cleans up a contact field for the radio.
+
+    Accented letters become plain ASCII (anything else non-ASCII is
+    dropped), control characters are removed, double quotes become single
+    quotes, runs of blanks become one space, and the result is cut to
+    max_len characters.  Plain ASCII text takes the fast path.
+    """
+
+    # already clean: printable ASCII with no quotes or doubled blanks
+    if text.isascii() and text.isprintable() and '"' not in text and \
+            '  ' not in text:
+        return text.strip()[:max_len].rstrip()
+
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii',
+            'ignore').decode('ascii')
+    if not text.isprintable():
+        text = text.translate(contact_control_dict)
+    if '"' in text:
+        text = text.replace('"', "'")
+
+    return ' '.join(text.split())[:max_len].rstrip()
+
+
+
+class ContactFilter:
+    """Keeps DMR users by country, state/region and callsign prefix.
+
+    Each kind of filter that is given must match (matching any one of its
+    values); countries and regions are compared ignoring case, and
+    callsign prefixes match the start of the callsign.
+    """
+
+    def __init__(self, country_list=None, region_list=None,
+            prefix_list=None):
+        self.country_set = set([country.strip().casefold()
+                                for country in country_list or []])
+        self.region_set = set([region.strip().casefold()
+                               for region in region_list or []])
+        self.prefix_tuple = tuple([prefix.strip().upper()
+                                   for prefix in prefix_list or []])
+
+    def keeps(self, callsign, state, country):
+        """Returns True if a user passes every filter that was given."""
+
+        if self.country_set and \
+                country.strip().casefold() not in self.country_set:
+            return False
+        if self.region_set and \
+                state.strip().casefold() not in self.region_set:
+            return False
+        if self.prefix_tuple and \
+                not callsign.strip().upper().startswith(self.prefix_tuple):
+            return False
+
+        return True
+
+
+
+def iter_user_db_contacts(user_db_file_name, contact_filter=None,
+        stats_dict=None):
+    """This function yields the contacts to write from a user database.
+
+    Yields (radio ID, callsign, name, city, state, country, remarks) for
+    each user that passes contact_filter, sanitized for the radio.  Rows
+    with a bad radio ID and repeats of an ID already written are skipped;
+    repeats are found with a fixed 2 MiB bitmap of the 24 bit ID space
+    rather than a growing set.  stats_dict, if given, counts the rows
+    'read', 'filtered', 'invalid' and 'duplicate'.  Raises ValueError if
+    the header can't be used.
+    """
+
+    if stats_dict is None:
+        stats_dict = {}
+    for key in ['read', 'filtered', 'invalid', 'duplicate']:
+        stats_dict.update({key: 0})
+    seen_id_bitmap = bytearray((max_radio_id >> 3) + 1)
+    sanitize_text = functools.lru_cache(maxsize=contact_text_cache_size)(
+        sanitize_contact_text)
+
+    with open(user_db_file_name, 'r', encoding='utf-8', errors='replace',
+            newline='') as user_db_fd:
+        user_db_reader = csv.reader(user_db_fd)
+        first_row = next(user_db_reader, None)
+        if first_row is None:
+            return
+
+        # a database without a header line starts with a radio ID
+        if len(first_row) > 0 and first_row[0].strip().isdigit():
+            column_dict = dict((field, index) for index, field in
+                               enumerate(user_db_default_columns))
+            user_db_reader = itertools.chain([first_row], user_db_reader)
+        else:
+            column_dict = user_db_columns(first_row)
+
+        # missing fields read an empty cell added after the last column
+        column_cnt = max(column_dict.values()) + 1
+        index_list = [column_dict.get(field, column_cnt) for field in [
+            'Radio ID', 'Callsign', 'Name', 'Last Name', 'City', 'State',
+            'Country', 'Remarks']]
+        (id_index, call_index, name_index, last_index, city_index,
+            state_index, country_index, remarks_index) = index_list
+        read_cnt = 0
+
+        try:
+            for row in user_db_reader:
+                read_cnt += 1
+                if len(row) == column_cnt:
+                    row.append('')
+                elif len(row) < column_cnt:
+                    row.extend([''] * (column_cnt + 1 - len(row)))
+
+                # radio ID and callsign are required
+                try:
+                    radio_id = int(row[id_index])
+                except ValueError:
+                    stats_dict['invalid'] += 1
+                    continue
+                callsign = row[call_index]
+                if radio_id < 1 or radio_id > max_radio_id or \
+                        callsign.strip() == '':
+                    stats_dict['invalid'] += 1
+                    continue
+
+                # filter on the raw fields, before any clean up work
+                state = row[state_index]
+                country = row[country_index]
+                if contact_filter is not None and \
+                        not contact_filter.keeps(callsign, state, country):
+                    stats_dict['filtered'] += 1
+                    continue
+
+                # one contact per radio ID
+                byte_index = radio_id >> 3
+                bit = 1 << (radio_id & 7)
+                if seen_id_bitmap[byte_index] & bit:
+                    stats_dict['duplicate'] += 1
+                    continue
+                seen_id_bitmap[byte_index] |= bit
+
+                # first and last names are cleaned up (and cached) apart
+                name = sanitize_text(row[name_index])
+                last_name = sanitize_text(row[last_index])
+                if last_name != '':
+                    name = (name + ' ' + last_name).strip()[
+                        :max_contact_field_len].rstrip()
+                yield (radio_id,
+                       sanitize_contact_text(callsign).upper().replace(' ', ''),
+                       name,
+                       sanitize_text(row[city_index]),
+                       sanitize_text(state),
+                       sanitize_text(country),
+                       sanitize_text(row[remarks_index]))
+        finally:
+            # also counted when the caller stops early
+            stats_dict.update({'read': read_cnt})
+
+    return
@@ -0,0 +1,432 @@
+# coding: utf-8
+#
+# Streaming import of bulk repeater database dumps (.json, .jsonl or .csv).
+# A dump is read a chunk at a time, each record is mapped to the shape of
+# a Digital-Repeaters__ row, and the rows go through the same channel
+# expansion as the K7ABD repeater sheets, one repeater at a time.
+#
+#  A record has these fields (matched ignoring case, spaces, '_' and '-'):
+#
+#  Field            Also accepted as
+#  'Zone Name'      zone, name         ("zone;prefix" like the sheets, or
+#  'Prefix'         channel prefix      the prefix in its own field)
+#  'Power'
+#  'RX Freq'        rx frequency, frequency, output (MHz)
+#  'TX Freq'        tx frequency, input freq, input (MHz)
+#  'Color Code'     cc
+#  'Latitude'       lat                (optional, for --near/--route)
+#  'Longitude'      lon, lng, long
+#  'Talk Groups'    talkgroups, tgs    {TG name: slot} or a list of
+#                                      {'name': TG name, 'slot': slot}
+#
+#  In a .csv dump every other column (except 'Comment') is a talk group
+#  column holding the slot, exactly like a Digital-Repeaters__ sheet.
+#
+
+
+import json
+import math
+import os
+import pandas
+
+from cps_import_builder.k7abd import (add_channels_fm_digital_repeater_rows,
+    record_k7abd_problem)
+
+
+# characters of JSON read at a time, and rows of a .csv dump per chunk
+repeater_dump_chunk_chars = 65536
+repeater_dump_chunk_rows = 4096
+
+# a JSON value longer than this is taken to be a broken file, not a record
+repeater_dump_max_value_chars = 16777216
+
+# characters that may carry on a JSON number cut at the end of a chunk
+repeater_dump_number_chars = '0123456789+-.eE'
+
+# dump field aliases, normalized by normalize_dump_field()
+repeater_dump_field_dict = {
+    'Zone Name': ['zonename', 'zone', 'name'],
+    'Prefix': ['prefix', 'channelprefix'],
+    'Power': ['power'],
+    'RX Freq': ['rxfreq', 'rxfrequency', 'frequency', 'output'],
+    'TX Freq': ['txfreq', 'txfrequency', 'inputfreq', 'input'],
+    'Color Code': ['colorcode', 'cc'],
+    'Latitude': ['latitude', 'lat'],
+    'Longitude': ['longitude', 'lon', 'lng', 'long'],
+    'Talk Groups': ['talkgroups', 'tgs'],
+    'Comment': ['comment'],
+    }
+repeater_dump_alias_dict = dict((alias, field) for field, alias_list in
+    repeater_dump_field_dict.items() for alias in alias_list)
+repeater_dump_tg_name_list = ['name', 'talkgroup', 'tg']
+repeater_dump_tg_slot_list = ['slot', 'timeslot', 'ts']
+
+# keys of a top level JSON object that may hold the list of records
+repeater_dump_list_keys = ['results', 'repeaters', 'records', 'data']
+
+
+
+def normalize_dump_field(field):
+    """This function normalizes a dump field name for matching aliases."""
+
+    return ''.join([char for char in str(field).lower()
+                    if char not in ' _-'])
+
+
+
+def repeater_dump_fields(key_list):
+    """This function maps dump keys to the repeater fields they hold.
+
+    Returns {field: key} for the fields found and the list of keys that
+    are not a known field (the talk group columns of a .csv dump).
+    """
+
+    field_dict = {}
+    other_key_list = []
+    for key in key_list:
+        field = repeater_dump_alias_dict.get(normalize_dump_field(key))
+        if field is None:
+            other_key_list.append(key)
+        elif field not in field_dict:
+            field_dict.update({field: key})
+
+    return field_dict, other_key_list
+
+
+
+def dump_value(record, field_dict, field):
+    """This function returns a record's value for a field, or None if blank."""
+
+    key = field_dict.get(field)
+    if key is None:
+        return None
+    value = record.get(key)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+
+    return value
+
+
+
+def dump_slot(slot):
+    """This function returns a dump slot value as a string, "1" or "2"."""
+
+    if isinstance(slot, float) and not math.isnan(slot) and slot % 1 == 0:
+        slot = int(slot)
+
+    return str(slot).strip()
+
+
+
+class JsonStreamReader:
+    """Reads the values of a JSON document one at a time.
+
+    The file is read chunk_chars characters at a time and the buffer only
+    ever holds the chunk being parsed plus the rest of the current value,
+    so a dump of any size is parsed in about the memory of one record.
+    """
+
+    def __init__(self, json_fd, chunk_chars=None):
+        self.json_fd = json_fd
+        self.chunk_chars = chunk_chars or repeater_dump_chunk_chars
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        """Drops the parsed part of the buffer and reads another chunk."""
+
+        chunk = self.json_fd.read(self.chunk_chars)
+        if chunk == '':
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+        return True
+
+    def peek(self):
+        """Returns the next non-blank character, or '' at the end."""
+
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read_more():
+                return ''
+
+    def expect(self, char_list):
+        """Consumes the next character, which must be one of char_list."""
+
+        char = self.peek()
+        if char == '' or char not in char_list:
+            raise ValueError("expected one of {} but found '{}'".format(
+                ' '.join(["'{}'".format(item) for item in char_list]), char))
+        self.pos += 1
+
+        return char
+
+    def value(self):
+        """Parses and returns the next JSON value."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # the value goes on in the next chunk
+                if len(self.buf) - self.pos > repeater_dump_max_value_chars:
+                    raise ValueError("value at character {} is too long "
+                        "or malformed".format(self.pos))
+                if self.read_more():
+                    continue
+                raise
+            # a number at the end of the buffer may go on in the next chunk,
+            # e.g. "12345" of "12345.678"
+            if (not self.eof and (end == len(self.buf) or
+                    (self.buf[end] in repeater_dump_number_chars and
+                     isinstance(value, (int, float)))) and
+                    len(self.buf) - self.pos <= repeater_dump_max_value_chars
+                    and self.read_more()):
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        """Yields the values of the JSON array starting here."""
+
+        self.expect(['['])
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect([',', ']']) == ']':
+                return
+
+
+
+def iter_json_dump_records(json_fd, chunk_chars=None):
+    """This function yields the records of a JSON repeater dump.
+
+    The dump is either an array of records or an object holding one under
+    a 'results', 'repeaters', 'records' or 'data' key (other keys, e.g. a
+    record count, are skipped).
+    """
+
+    reader = JsonStreamReader(json_fd, chunk_chars)
+    char = reader.peek()
+    if char == '[':
+        for record in reader.iter_array():
+            yield record
+        return
+    reader.expect(['{'])
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect([':'])
+        if (normalize_dump_field(key) in repeater_dump_list_keys and
+                reader.peek() == '['):
+            for record in reader.iter_array():
+                yield record
+            return
+        reader.value()
+        if reader.expect([',', '}']) == '}':
+            return
+
+
+
+def iter_repeater_dump_records(dump_file_name, chunk_rows=None):
+    """This function yields (line, record, columns) for each dump record.
+
+    The format follows the file extension: .json, .jsonl/.ndjson (one
+    record per line) or .csv.  line is the file line for .jsonl and .csv
+    dumps and the record number for .json dumps.  For a .csv dump columns
+    is the header mapped once by repeater_dump_fields(), otherwise None.
+    Raises ValueError if the file can't be parsed.
+    """
+
+    extension = os.path.splitext(dump_file_name)[1].lower()
+    if extension == '.csv':
+        if chunk_rows is None:
+            chunk_rows = repeater_dump_chunk_rows
+        column_list = list(pandas.read_csv(dump_file_name, nrows=0).columns)
+        columns = repeater_dump_fields(column_list)
+        dump_reader = pandas.read_csv(dump_file_name, dtype=str,
+            chunksize=chunk_rows)
+        line = 2
+        for dump_df in dump_reader:
+            for record in dump_df.to_dict('records'):
+                yield line, record, columns
+                line += 1
+    elif extension in ['.jsonl', '.ndjson']:
+        with open(dump_file_name, 'r', encoding='utf-8') as dump_fd:
+            for line, text in enumerate(dump_fd, start=1):
+                if text.strip() != '':
+                    yield line, json.loads(text), None
+    elif extension == '.json':
+        with open(dump_file_name, 'r', encoding='utf-8') as dump_fd:
+            for line, record in enumerate(iter_json_dump_records(dump_fd),
+                    start=1):
+                yield line, record, None
+    else:
+        raise ValueError("unknown dump format '{}'".format(extension))
+
+    return
+
+
+
+def repeater_dump_row(record, tg_filter_list, columns=None):
+    """This function maps a dump record to a Digital-Repeaters__ row.
+
+    Returns (row, talk group list), the row holding the slot of each talk
+    group the repeater carries; raises ValueError naming the first field
+    that is missing.  columns is the mapped .csv header, if any.
+    """
+
+    if not isinstance(record, dict):
+        raise ValueError("not a repeater record")
+    if columns is not None:
+        field_dict, tg_column_list = columns
+    else:
+        field_dict = repeater_dump_fields(record.keys())[0]
+        tg_column_list = []
+
+    zone_name = dump_value(record, field_dict, 'Zone Name')
+    if zone_name is None:
+        raise ValueError("repeater record has no 'Zone Name'")
+    zone_name = str(zone_name)
+    if ';' not in zone_name:
+        ch_prefix = dump_value(record, field_dict, 'Prefix')
+        if ch_prefix is None:
+            raise ValueError("no channel prefix for repeater '{}'".format(
+                zone_name))
+        zone_name = '{};{}'.format(zone_name, ch_prefix)
+
+    row = {'Zone Name': zone_name}
+    for field in ['Power', 'RX Freq', 'TX Freq', 'Color Code']:
+        value = dump_value(record, field_dict, field)
+        if value is None:
+            raise ValueError("no '{}' for repeater '{}'".format(field,
+                zone_name.split(';')[0]))
+        row.update({field: value})
+    try:
+        row.update({'Color Code': int(float(row['Color Code']))})
+    except ValueError:
+        pass
+    for field in ['Latitude', 'Longitude']:
+        row.update({field: dump_value(record, field_dict, field)})
+
+    # talk group slots: .csv columns, then the 'Talk Groups' field
+    slot_dict = {}
+    for tg_name in tg_column_list:
+        slot = dump_value(record, {tg_name: tg_name}, tg_name)
+        if slot is not None:
+            slot_dict.update({str(tg_name): dump_slot(slot)})
+    talk_groups = dump_value(record, field_dict, 'Talk Groups')
+    if isinstance(talk_groups, dict):
+        for tg_name, slot in talk_groups.items():
+            slot_dict.update({str(tg_name): dump_slot(slot)})
+    elif isinstance(talk_groups, list):
+        for tg_record in talk_groups:
+            tg_field_dict = {}
+            if isinstance(tg_record, dict):
+                for key in tg_record.keys():
+                    tg_field_dict.setdefault(normalize_dump_field(key), key)
+            name_key = next((tg_field_dict[alias] for alias in
+                repeater_dump_tg_name_list if alias in tg_field_dict), None)
+            slot_key = next((tg_field_dict[alias] for alias in
+                repeater_dump_tg_slot_list if alias in tg_field_dict), None)
+            if name_key is None or slot_key is None:
+                raise ValueError("bad talk group entry for repeater "
+                    "'{}'".format(zone_name.split(';')[0]))
+            slot_dict.update({str(tg_record[name_key]):
+                              dump_slot(tg_record[slot_key])})
+    elif talk_groups is not None:
+        raise ValueError("bad 'Talk Groups' for repeater '{}'".format(
+            zone_name.split(';')[0]))
+
+    talk_group_list = []
+    for tg_name, slot in slot_dict.items():
+        if tg_name not in tg_filter_list:
+            talk_group_list.append(tg_name)
+            row.update({tg_name: slot})
+
+    return row, talk_group_list
+
+
+
+def iter_repeater_dump_rows(dump_file_name, tg_filter_list,
+        problems_list=None, chunk_rows=None):
+    """This function yields (line, row, talk group list) from a dump file.
+
+    Records that can't be mapped are reported as problems and skipped; a
+    file that stops parsing part way is reported and its earlier records
+    are kept.  JSON records nearly always share one set of keys, so the
+    field mapping is worked out once per set of keys, not per record.
+    """
+
+    base_name = os.path.basename(dump_file_name)
+    record_iter = iter_repeater_dump_records(dump_file_name, chunk_rows)
+    columns_by_keys_dict = {}
+    line = 0
+    while True:
+        try:
+            line, record, columns = next(record_iter)
+        except StopIteration:
+            return
+        except (ValueError, OSError) as err:
+            record_k7abd_problem(problems_list, (base_name, line + 1),
+                "Unreadable repeater dump '{}': {}".format(base_name, err))
+            return
+        if columns is None and isinstance(record, dict):
+            key_tuple = tuple(record.keys())
+            columns = columns_by_keys_dict.get(key_tuple)
+            if columns is None:
+                if len(columns_by_keys_dict) >= 64:
+                    columns_by_keys_dict.clear()
+                columns = (repeater_dump_fields(key_tuple)[0], [])
+                columns_by_keys_dict.update({key_tuple: columns})
+        try:
+            row, talk_group_list = repeater_dump_row(record, tg_filter_list,
+                columns)
+        except ValueError as err:
+            record_k7abd_problem(problems_list, (base_name, line),
+                "Invalid repeater dump record: {}".format(err))
+            continue
+        yield line, row, talk_group_list
+
+
+
+def add_channels_fm_repeater_dump(dump_file_name, channels_dict, zones_dict,
+        tg_by_num_dict, tg_by_name_dict, tg_filter_list, rptr_filter_list,
+        names_index=None, sources_dict=None, problems_list=None,
+        repeater_talk_groups_dict=None, geo_filter=None, chunk_rows=None,
+        debug=False):
+    """This function adds the repeaters in a bulk dump file.
+
+    Each record becomes a zone with a channel per talk group, exactly as
+    a row of a Digital-Repeaters__ file would (see
+    add_channels_fm_k7abd_digital_repeaters_file()).  The dump is streamed
+    a record at a time, so only the channels made from it stay in memory.
+    """
+
+    if debug:
+        print("Processing: {}".format(dump_file_name))
+    add_channels_fm_digital_repeater_rows(dump_file_name,
+        iter_repeater_dump_rows(dump_file_name, tg_filter_list,
+        problems_list=problems_list, chunk_rows=chunk_rows),
+        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
+        rptr_filter_list, names_index=names_index, sources_dict=sources_dict,
+        problems_list=problems_list,
+        repeater_talk_groups_dict=repeater_talk_groups_dict,
+        geo_filter=geo_filter, debug=debug)
+
+    return
@@ -0,0 +1,205 @@
+# coding: utf-8
+#
+# Location filters for --near and --route.  Analog__ and Digital-Repeaters__
+# files may carry optional 'Latitude' and 'Longitude' columns (decimal
+# degrees); a GeoFilter says whether such a location is within range of a
+# point or of any point along a route.
+#
+
+
+import math
+import pandas
+
+
+# optional K7ABD location columns
+k7abd_location_columns = ['Latitude', 'Longitude']
+
+# mean earth radius and the length of one degree of latitude, km
+earth_radius_km = 6371.0
+km_per_degree = math.pi * earth_radius_km / 180.0
+
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """This function returns the great circle distance between two points."""
+
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) *
+         math.sin((lon2 - lon1) / 2) ** 2)
+
+    return 2 * earth_radius_km * math.asin(min(1.0, math.sqrt(a)))
+
+
+
+def check_radius(radius_km):
+    """This function raises ValueError unless a radius is greater than 0."""
+
+    if not radius_km > 0:
+        raise ValueError("radius must be greater than 0 km, not {}".format(
+            radius_km))
+
+    return
+
+
+
+class GeoIndex:
+    """Grid index of points, for "within radius_km of any point" lookups.
+
+    Points go into grid cells at least radius_km wide, so a lookup only
+    measures the distance to points in the 3 x 3 cells around it; a route
+    of thousands of points costs about as much to check as a single one.
+    """
+
+    def __init__(self, point_list, radius_km):
+        check_radius(radius_km)
+        self.radius_km = radius_km
+        max_abs_lat = max([abs(lat) for lat, lon in point_list] + [0.0])
+        self.lat_cell = max(radius_km / km_per_degree, 1e-6)
+        self.lon_cell = min(360.0, self.lat_cell /
+            max(math.cos(math.radians(min(max_abs_lat + self.lat_cell,
+            90.0))), 0.01))
+        self.cell_dict = {}
+        for lat, lon in point_list:
+            self.cell_dict.setdefault(self.cell(lat, lon), []).append(
+                (lat, lon))
+
+    def cell(self, lat, lon):
+        return (int(math.floor(lat / self.lat_cell)),
+                int(math.floor(lon / self.lon_cell)))
+
+    def contains(self, lat, lon):
+        """Returns True if (lat, lon) is within radius_km of any point."""
+
+        lat_cell, lon_cell = self.cell(lat, lon)
+        for i in [-1, 0, 1]:
+            for j in [-1, 0, 1]:
+                for point_lat, point_lon in self.cell_dict.get(
+                        (lat_cell + i, lon_cell + j), []):
+                    if distance_km(lat, lon, point_lat,
+                            point_lon) <= self.radius_km:
+                        return True
+
+        return False
+
+
+
+class GeoFilter:
+    """Keeps locations near any of its points (--near) or routes (--route)."""
+
+    def __init__(self):
+        self.index_list = []
+
+    def add_points(self, point_list, radius_km):
+        """Adds points (and a radius around them) the filter accepts."""
+
+        if len(point_list) > 0:
+            self.index_list.append(GeoIndex(point_list, radius_km))
+
+        return
+
+    def add_route(self, point_list, radius_km):
+        """Adds a route: everything within radius_km of the path.
+
+        Legs between route points are filled in with points every half
+        radius, so sparse waypoints still cover the road between them.
+        Raises ValueError unless radius_km is greater than 0.
+        """
+
+        check_radius(radius_km)
+        path_list = []
+        for i, (lat, lon) in enumerate(point_list):
+            if i > 0:
+                prev_lat, prev_lon = point_list[i - 1]
+                step_cnt = int(math.ceil(distance_km(prev_lat, prev_lon,
+                    lat, lon) / (radius_km / 2.0)))
+                for step in range(1, step_cnt):
+                    path_list.append((
+                        prev_lat + (lat - prev_lat) * step / step_cnt,
+                        prev_lon + (lon - prev_lon) * step / step_cnt))
+            path_list.append((lat, lon))
+        self.add_points(path_list, radius_km)
+
+        return
+
+    def contains(self, lat, lon):
+        """Returns True if (lat, lon) is within range of any added point."""
+
+        for geo_index in self.index_list:
+            if geo_index.contains(lat, lon):
+                return True
+
+        return False
+
+    def keeps(self, row):
+        """Returns True unless a K7ABD row's location is out of range.
+
+        Rows without a location (no columns, or empty cells) are kept.
+        """
+
+        location = k7abd_row_location(row)
+        if location is None:
+            return True
+
+        return self.contains(*location)
+
+
+
+def k7abd_row_location(row):
+    """This function returns a K7ABD row's (latitude, longitude), or None."""
+
+    try:
+        lat = float(row.get('Latitude'))
+        lon = float(row.get('Longitude'))
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(lat) or math.isnan(lon):
+        return None
+
+    return lat, lon
+
+
+
+def parse_near(near_str):
+    """This function parses a "LAT,LON,KM" --near value.
+
+    Returns (lat, lon, radius km); raises ValueError if it doesn't parse.
+    """
+
+    value_list = [float(value) for value in near_str.split(',')]
+    if len(value_list) != 3:
+        raise ValueError("expected LAT,LON,KM")
+    lat, lon, radius_km = value_list
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and
+            radius_km > 0):
+        raise ValueError("expected LAT,LON,KM")
+
+    return lat, lon, radius_km
+
+
+
+def read_route_file(file_path, debug=False):
+    """This function reads the points of a route .csv file.
+
+    The file has 'Latitude' and 'Longitude' columns, one row per point
+    along the route (e.g. exported from a mapping tool).  Raises ValueError
+    if the file has no such columns or no points.
+    """
+
+    if debug:
+        print("Processing: {}".format(file_path))
+    try:
+        route_df = pandas.read_csv(file_path, usecols=k7abd_location_columns)
+    except ValueError:
+        # includes pandas' EmptyDataError for an empty file
+        raise ValueError("needs 'Latitude' and 'Longitude' columns")
+    try:
+        point_list = [(float(row['Latitude']), float(row['Longitude']))
+                      for row in route_df.to_dict('records')]
+    except ValueError:
+        raise ValueError("has a Latitude/Longitude that isn't a number")
+    point_list = [(lat, lon) for lat, lon in point_list
+                  if not (math.isnan(lat) or math.isnan(lon))]
+    if len(point_list) == 0:
+        raise ValueError("has no Latitude/Longitude points")
+
+    return point_list
@@ -0,0 +1,753 @@
+# coding: utf-8
+#
+# Readers for the K7ABD style input files (Talkgroups__, Analog__,
+# Digital-Others__ and Digital-Repeaters__) and the optional My*.csv files.
+#
+
+
+import pandas
+import sys
+import os
+import glob
+import concurrent.futures
+
+from cps_import_builder.common import freq_to_hz
+from cps_import_builder.geo import k7abd_location_columns
+
+
+# K7ABD input file name prefixes, in the order they are loaded
+k7abd_file_types = ['Talkgroups__', 'Analog__', 'Digital-Others__',
+                    'Digital-Repeaters__']
+
+# rows per chunk when reading K7ABD Digital-Repeaters__ files
+k7abd_chunk_rows = 256
+
+
+
+def read_zone_order_file(file_path, debug=False):
+    """This function reads the Zone_Order.csv file and builds the zones_order_list."""
+
+    # read in the Zone_Order.csv file
+    if debug:
+        print("Processing: {}".format(file_path))
+    zones_order_df = pandas.read_csv(file_path)
+
+    # loop through k7abd file rows
+    zones_order_list = []
+    for i,row in zones_order_df.iterrows():
+
+        # get zone
+        zone_name = row['Zone Name']
+        zones_order_list.append(zone_name)
+
+    if debug:
+        print("   Returning zones_order_list: {}".format(zones_order_list))
+
+    return zones_order_list
+
+
+
+def read_tg_filter_file(file_path, debug=False):
+    """This function reads a talkgroup filter .csv file and builds the tg_filter_list."""
+
+    # read in the talk group filter .csv file
+    if debug:
+        print("Processing: {}".format(file_path))
+    talk_group_filter_df = pandas.read_csv(file_path)
+
+    # loop through file rows
+    tg_filter_list = []
+    for i,row in talk_group_filter_df.iterrows():
+
+        # get talk group name
+        tg_name = row['TG Name']
+        tg_filter_list.append(tg_name)
+
+    if debug:
+        print("   Returning tg_filter_list: {}".format(tg_filter_list))
+
+    return tg_filter_list
+
+
+
+def read_rptr_filter_file(file_path, debug=False):
+    """This function reads a repeater filter .csv file and builds the rptr_filter_list."""
+
+    # read in the repeater filter .csv file
+    if debug:
+        print("Processing: {}".format(file_path))
+    rptr_filter_df = pandas.read_csv(file_path)
+
+    # loop through file rows
+    rptr_filter_list = []
+    for i,row in rptr_filter_df.iterrows():
+
+        # get talk group name
+        rptr_name = row['Repeater Name']
+        rptr_filter_list.append(rptr_name)
+
+    if debug:
+        print("   Returning rptr_filter_list: {}".format(rptr_filter_list))
+
+    return rptr_filter_list
+
+
+
+def record_truncated_name(names_index, kind, full_name, source, key=None):
+    """This function records a name under its 16 character form.
+
+    names_index maps kind ('Channel' or 'Talk Group') to a dict keyed by
+    the truncated name, holding each distinct full name with its source
+    file and key.  Names sharing a key (e.g. aliases of one TG number)
+    aren't treated as colliding; channel names use the full name as key.
+    """
+
+    full_name = str(full_name)
+    if key is None:
+        key = full_name
+    short_dict = names_index.setdefault(kind, {})
+    full_dict = short_dict.setdefault(full_name[:16], {})
+    if full_name not in full_dict:
+        full_dict.update({full_name: (source, key)})
+
+    return
+
+
+
+def add_channel_to_zone(zone_name, channel_name, zones_dict,
+        channels_dict, debug=False):
+    """This function adds a channel to our zone dictionary."""
+
+
+    if zone_name in zones_dict.keys():
+        # zone already created, just append channel
+        zone_member_list = zones_dict[zone_name]
+        zone_member_list.append(channel_name)
+        if debug:
+            print("Zone '{}' updated with '{}'.".format(
+                zone_name, channel_name))
+            print("    zone_dict[{}] = {}".format(
+                zone_name, zones_dict[zone_name]))
+    else:
+        # new zone, so create it
+        zones_dict.update({zone_name: [channel_name]})
+
+    return
+
+
+
+def record_k7abd_problem(problems_list, source, message):
+    """This function records a problem found while loading a K7ABD file.
+
+    source is a (file name, line) pair.  Without a problems_list the
+    problem is fatal, as it always used to be; with one it is collected so
+    every problem in a library can be reported in a single run.
+    """
+
+    if problems_list is None:
+        print("ERROR:  {}".format(message))
+        sys.exit(-1)
+    problems_list.append((source, message))
+
+    return
+
+
+
+def record_k7abd_source(sources_dict, kind, name, source):
+    """This function records the file and line that first defined a name."""
+
+    if sources_dict is not None and (kind, name) not in sources_dict:
+        sources_dict.update({(kind, name): source})
+
+    return
+
+
+
+def k7abd_freq_to_hz(freq, k7abd_file_name, name, source=None,
+        problems_list=None):
+    """This function parses a K7ABD file frequency into integer Hz.
+
+    Returns None for a bad value when problems are being collected.
+    """
+
+    try:
+        return freq_to_hz(freq)
+    except (TypeError, ValueError):
+        record_k7abd_problem(problems_list, source,
+            "Invalid frequency '{}' for '{}' in file '{}'".format(
+            freq, name, os.path.basename(k7abd_file_name)))
+        return None
+
+
+
+def find_k7abd_files(inputs_dir):
+    """This function lists the K7ABD input files in a directory.
+
+    Returns (file type, file name) pairs in load order: Talkgroups__,
+    Analog__, Digital-Others__ then Digital-Repeaters__ files, each type
+    sorted by file name.
+    """
+
+    file_spec_list = []
+    for file_type in k7abd_file_types:
+        file_list = []
+        for match in glob.iglob(os.path.join(inputs_dir, file_type + '*'),
+                recursive=False):
+            file_list.append(match)
+        for file_name in sorted(file_list):
+            file_spec_list.append((file_type, file_name))
+
+    return file_spec_list
+
+
+
+def read_k7abd_file_batch(k7abd_file_name, file_type):
+    """This function parses one K7ABD input file into a record batch.
+
+    Parsing doesn't depend on any other file, so batches can be built in
+    parallel; the add_*_fm_k7abd_* functions then merge them in order.
+    Returns a dict with the file's 'columns' and its rows as 'records'.
+    """
+
+    # repeater sheets go through the same reader as a serial run, so slot
+    # columns are parsed the same way (as strings) either way
+    if file_type == 'Digital-Repeaters__':
+        column_items = list(pandas.read_csv(k7abd_file_name, nrows=0).columns)
+        talk_group_list, location_column_list = \
+            k7abd_digital_repeaters_columns(column_items)
+        return {'columns': column_items,
+                'records': list(iter_k7abd_digital_repeaters_rows(
+                    k7abd_file_name, talk_group_list,
+                    location_column_list=location_column_list))}
+
+    if file_type == 'Talkgroups__':
+        k7abd_df = pandas.read_csv(k7abd_file_name, header=None)
+    else:
+        k7abd_df = pandas.read_csv(k7abd_file_name)
+    file_batch = {'columns': list(k7abd_df.columns),
+                  'records': k7abd_df.to_dict('records')}
+
+    # clean-up
+    del k7abd_df
+
+    return file_batch
+
+
+
+def read_k7abd_file_batches(file_spec_list, jobs=1):
+    """This function parses K7ABD input files, in parallel if jobs > 1.
+
+    file_spec_list holds (file type, file name) pairs; the batches are
+    returned in the same order, so merging them one after the other
+    makes exactly the decisions a serial run would.
+    """
+
+    if jobs <= 1 or len(file_spec_list) <= 1:
+        return [read_k7abd_file_batch(file_name, file_type)
+                for file_type, file_name in file_spec_list]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        batch_list = list(executor.map(read_k7abd_file_batch,
+            [file_name for file_type, file_name in file_spec_list],
+            [file_type for file_type, file_name in file_spec_list]))
+
+    return batch_list
+
+
+
+def add_channels_fm_k7abd_analog_file(k7abd_analog_file_name, channels_dict,
+                                      zones_dict, names_index=None,
+                                      file_batch=None, sources_dict=None,
+                                      problems_list=None, geo_filter=None,
+                                      debug=False):
+    """This function adds new analog channels from a K7ABD analog file.
+
+    With a geo_filter, rows whose optional Latitude/Longitude are out of
+    range are skipped.
+    """
+
+    # read in the k7abd analog file unless it was parsed ahead of time
+    if file_batch is None:
+        file_batch = read_k7abd_file_batch(k7abd_analog_file_name,
+            'Analog__')
+
+    # loop through k7abd file rows (line 1 is the header)
+    base_name = os.path.basename(k7abd_analog_file_name)
+    for line, row in enumerate(file_batch['records'], start=2):
+
+        # Short circuit if the channel is out of --near/--route range
+        if geo_filter is not None and not geo_filter.keeps(row):
+            continue
+
+        # get zone
+        zone_name = row['Zone']
+
+        # Set channel values
+        ch_type = "Analog"
+        ch_name = row['Channel Name']
+        ch_rx_freq = k7abd_freq_to_hz(row['RX Freq'],
+            k7abd_analog_file_name, ch_name, source=(base_name, line),
+            problems_list=problems_list)
+        ch_tx_freq = k7abd_freq_to_hz(row['TX Freq'],
+            k7abd_analog_file_name, ch_name, source=(base_name, line),
+            problems_list=problems_list)
+        if ch_rx_freq is None or ch_tx_freq is None:
+            continue
+        ch_tx_pwr = row['Power']
+        ch_bandwidth = row['Bandwidth']
+        ch_ctcss_dcs_decode = row['CTCSS Decode']
+        ch_ctcss_dcs_encode = row['CTCSS Encode']
+        ch_tx_prohibit = row['TX Prohibit']
+
+        # the CPS keeps only the first 16 characters of the name
+        if names_index is not None:
+            record_truncated_name(names_index, 'Channel', ch_name,
+                os.path.basename(k7abd_analog_file_name))
+
+        if ch_name in channels_dict.keys():
+            if debug:
+                print("WARNING:  channel {} already defined.".format(
+                    ch_name))
+        else:
+            # Create a new analog channel in our channels_dict
+            record_k7abd_source(sources_dict, 'Channel', ch_name,
+                (base_name, line))
+            channels_dict.update({ch_name : {
+                 'Ch Type':ch_type,
+                 'RX Freq':ch_rx_freq,
+                 'TX Freq':ch_tx_freq,
+                 'Power':ch_tx_pwr,
+                 'Bandwidth':ch_bandwidth,
+                 'CTCSS Decode':ch_ctcss_dcs_decode,
+                 'CTCSS Encode':ch_ctcss_dcs_encode,
+                 'RX Only':ch_tx_prohibit
+                 }})
+
+        # add this channel to the specified zone
+        add_channel_to_zone(zone_name, ch_name, zones_dict,
+            channels_dict, debug=False)
+
+    return
+
+
+
+def add_talkgroups_fm_k7abd_talkgroups_file(k7abd_tg_file, tg_by_num_dict,
+        tg_by_name_dict, names_index=None, file_batch=None, sources_dict=None,
+        problems_list=None, debug=False):
+    """This function reads a talk groups file in K7ABD format."""
+
+    # Debug output
+    if debug:
+        print("Processing: {}".format(k7abd_tg_file))
+
+    # Read in the K7ABD talk groups file unless it was parsed ahead of time
+    if file_batch is None:
+        file_batch = read_k7abd_file_batch(k7abd_tg_file, 'Talkgroups__')
+
+    # hack to protect Private Call entries (like Brandmeister Parrot)
+    private_call_list = [9990]
+
+    # loop through the talk groups building dictionaries (no header line)
+    base_name = os.path.basename(k7abd_tg_file)
+    for line, row in enumerate(file_batch['records'], start=1):
+        tg_name = row[0]
+        tg_number = row[1]
+        if tg_number not in private_call_list:
+            tg_call_type = "Group Call"
+        else:
+            tg_call_type = "Private Call"
+        tg_call_alert = "None"
+
+        # check the talk group name for valid length...
+        if len(tg_name) > 16:
+            print("WARNING: ",tg_name,"exceeds 16 characters. Length = ",len(tg_name))
+            print("   truncating to: ",str(tg_name[:16]))
+        if names_index is not None:
+            record_truncated_name(names_index, 'Talk Group', tg_name,
+                os.path.basename(k7abd_tg_file), key=tg_number)
+
+        # First definition of a talk group name sets the name that will
+        # be used for that talk group number in any channel definitions.
+        # We allow multiple names for the same talk group number.
+        # Redefinitions for any talk group name must always equate to
+        # the same talk group number.
+        if tg_number not in tg_by_num_dict.keys():
+
+            # sanity check: if tg name already exists it appears in this
+            # case to have been defined as a different number...
+            # That isn't allowed, so ERROR out.
+            if tg_name in tg_by_name_dict.keys():
+                record_k7abd_problem(problems_list, (base_name, line),
+                    "Talkgroup '{}' already defined as: '{}'".format(
+                    tg_name, tg_by_name_dict[tg_name]))
+                continue
+
+            # now safe to add to tg_by_num_dict - becomes default TG name
+            record_k7abd_source(sources_dict, 'Talk Group', tg_number,
+                (base_name, line))
+            tg_by_num_dict.update({tg_number:
+                [str(tg_name[:16]), tg_call_type, tg_call_alert]})
+        else:
+
+            # sanity check: if tg_name already exists in this case,
+            # we need to make sure this repeat definition equates
+            # to the same talk group number
+            if tg_name in tg_by_name_dict.keys():
+
+                if tg_by_name_dict[tg_name] != tg_number:
+                    record_k7abd_problem(problems_list, (base_name, line),
+                        "Talkgroup '{}' already defined as: '{}'".format(
+                        tg_name, tg_by_name_dict[tg_name]))
+                    continue
+
+        # passed sanity checks, safe to add to tg_by_name_dict
+        tg_by_name_dict.update({tg_name[:16]:tg_number})
+
+    return
+
+
+
+def add_channels_fm_k7abd_digital_others_file(k7abd_digital_others_file_name,
+        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
+        names_index=None, file_batch=None, sources_dict=None,
+        problems_list=None, debug=False):
+    """This function writes out a k7abd formatted Digital-Others__ file"""
+
+    # Reference of file format - column headings in digital-others file:
+    # ['Zone','Channel Name','Power','RX Freq','TX Freq','Color Code',
+    #  'Talk Group','TimeSlot','Call Type','TX Permit']
+
+    # read in the K7ABD digital-others file unless parsed ahead of time
+    if debug:
+        print("Processing: {}".format(k7abd_digital_others_file_name))
+    if file_batch is None:
+        file_batch = read_k7abd_file_batch(k7abd_digital_others_file_name,
+            'Digital-Others__')
+
+    # loop through k7abd file rows (line 1 is the header)
+    base_name = os.path.basename(k7abd_digital_others_file_name)
+    for line, row in enumerate(file_batch['records'], start=2):
+
+        # get "Zone" value
+        zone_name = row['Zone']
+
+        # channel name
+        ch_name = row['Channel Name']
+        if names_index is not None:
+            record_truncated_name(names_index, 'Channel', ch_name,
+                os.path.basename(k7abd_digital_others_file_name))
+        if len(ch_name) >16:
+            print("Warning: '{}' exceeds 16 chars({}).".format(
+                ch_name, len(ch_name)))
+            ch_name = ch_name[:16]
+
+        # set channel type
+        ch_type = "Digital"
+
+        # set bandwidth
+        ch_bandwidth = "12.5"
+
+        # get "contact" value (mapped if needed)
+        tg_name = row['Talk Group']
+        if tg_name in tg_by_name_dict.keys():
+            # lookup TG number and remap name to value in tg_by_num_dict
+            tg_name = tg_by_num_dict[tg_by_name_dict[tg_name]][0]
+        else:
+            # Bad day...
+            record_k7abd_problem(problems_list, (base_name, line),
+                "Undefined talk group: '{}'".format(tg_name))
+            continue
+        ch_contact = tg_name
+
+        # get channel attributes
+        ch_tx_power = row['Power']
+        ch_rx_freq = k7abd_freq_to_hz(row['RX Freq'],
+            k7abd_digital_others_file_name, ch_name,
+            source=(base_name, line), problems_list=problems_list)
+        ch_tx_freq = k7abd_freq_to_hz(row['TX Freq'],
+            k7abd_digital_others_file_name, ch_name,
+            source=(base_name, line), problems_list=problems_list)
+        if ch_rx_freq is None or ch_tx_freq is None:
+            continue
+        ch_tx_pwr = row['Power']
+        ch_color_code = row['Color Code']
+        ch_slot = row['TimeSlot']
+        ch_call_type = row['Call Type']
+        ch_contact_tg_num = str(tg_by_name_dict[tg_name])
+        ch_tx_permit = row['TX Permit']
+
+        # now add this channel to the channel dictionary
+        if ch_name in channels_dict.keys():
+            if debug:
+                print("WARNING:  channel {} already defined.".format(
+                    ch_name))
+        else:
+            # Create a new digital channel in our channels_dict
+            record_k7abd_source(sources_dict, 'Channel', ch_name,
+                (base_name, line))
+            channels_dict.update({ch_name : {
+                 'Ch Type':ch_type,
+                 'RX Freq':ch_rx_freq,
+                 'TX Freq':ch_tx_freq,
+                 'Power':ch_tx_pwr,
+                 'Bandwidth':ch_bandwidth,
+                 'CTCSS Decode':"Off",
+                 'CTCSS Encode':"Off",
+                 'Color Code':ch_color_code,
+                 'Talk Group':ch_contact,
+                 'TG Number':tg_by_name_dict[ch_contact],
+                 'Time Slot':ch_slot,
+                 'Call Type':ch_call_type,
+                 'TX Permit':ch_tx_permit,
+                 'RX Only':"Off"
+                 }})
+
+        # add this channel to the specified zone
+        add_channel_to_zone(zone_name, ch_name, zones_dict,
+            channels_dict, debug=False)
+
+    return
+
+
+
+def k7abd_digital_repeaters_columns(column_items):
+    """This function splits a digital repeaters header into its columns.
+
+    Returns the talk group columns (every column that isn't a repeater
+    column) and the optional location columns present.
+    """
+
+    talk_group_list = []
+    for item in column_items:
+        if item not in ['Zone Name','Comment','Power',
+                        'RX Freq','TX Freq','Color Code'] + \
+                        k7abd_location_columns:
+            talk_group_list.append(item)
+    location_column_list = [column for column in k7abd_location_columns
+                            if column in column_items]
+
+    return talk_group_list, location_column_list
+
+
+
+def iter_k7abd_digital_repeaters_rows(k7abd_digital_file_name,
+        talk_group_list, chunk_rows=None, location_column_list=None):
+    """This function yields the rows of a K7ABD digital repeaters file.
+
+    Network-wide sheets can have thousands of repeaters and hundreds of
+    talk group columns, so the file is parsed chunk_rows rows at a time
+    and only the repeater columns plus the talk groups in talk_group_list
+    (the columns left after the talk group filter) are read, plus any
+    location columns in location_column_list.  Slot values
+    are kept as strings.  Peak memory is one chunk, not the whole sheet.
+    """
+
+    if chunk_rows is None:
+        chunk_rows = k7abd_chunk_rows
+    repeater_column_list = ['Zone Name', 'Power', 'RX Freq', 'TX Freq',
+                            'Color Code']
+    dtype_dict = {}
+    for tg_name in talk_group_list:
+        dtype_dict.update({tg_name: str})
+
+    k7abd_reader = pandas.read_csv(k7abd_digital_file_name,
+        usecols=(repeater_column_list + list(location_column_list or []) +
+                 talk_group_list), dtype=dtype_dict,
+        chunksize=chunk_rows)
+    for k7abd_df in k7abd_reader:
+        for row in k7abd_df.to_dict('records'):
+            yield row
+
+    return
+
+
+
+def add_channels_fm_k7abd_digital_repeaters_file(k7abd_digital_file_name,
+        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
+        tg_filter_list, rptr_filter_list, names_index=None, file_batch=None,
+        sources_dict=None, problems_list=None, repeater_talk_groups_dict=None,
+        geo_filter=None, debug=False):
+    """This function adds a channel per talk group per repeater from a K7ABD
+    Digital-Repeaters__ file, with a zone for each repeater.
+
+    If repeater_talk_groups_dict is given, the talk group numbers each
+    repeater carries are recorded in it by slot, along with the channels
+    the repeater defined, for building receive group lists:
+    {zone name: {'slots': {slot: [TG numbers]}, 'channels': {name: slot}}}
+
+    With a geo_filter, repeaters whose optional Latitude/Longitude are out
+    of range are skipped before any channels are made for them.
+    """
+
+    # read in the k7abd digital repeaters header unless parsed ahead of time
+    if debug:
+        print("Processing: {}".format(k7abd_digital_file_name))
+    if file_batch is None:
+        column_items = list(pandas.read_csv(k7abd_digital_file_name,
+            nrows=0).columns)
+    else:
+        column_items = file_batch['columns']
+
+    # build talk groups list from column headings, leaving out talk groups
+    # in the filter list
+    talk_group_column_list, location_column_list = \
+        k7abd_digital_repeaters_columns(column_items)
+    talk_group_list = [item for item in talk_group_column_list
+                       if item not in tg_filter_list]
+
+    # loop through k7abd repeaters file rows - each row is a repeater; the
+    # file is read a chunk at a time and only the wanted columns are kept
+    if file_batch is None:
+        row_iter = iter_k7abd_digital_repeaters_rows(k7abd_digital_file_name,
+            talk_group_list, location_column_list=location_column_list)
+    else:
+        row_iter = iter(file_batch['records'])
+    add_channels_fm_digital_repeater_rows(k7abd_digital_file_name,
+        ((line, row, talk_group_list) for line, row in enumerate(row_iter,
+        start=2)), channels_dict, zones_dict, tg_by_num_dict,
+        tg_by_name_dict, rptr_filter_list, names_index=names_index,
+        sources_dict=sources_dict, problems_list=problems_list,
+        repeater_talk_groups_dict=repeater_talk_groups_dict,
+        geo_filter=geo_filter, debug=debug)
+
+    return
+
+
+
+def add_channels_fm_digital_repeater_rows(k7abd_digital_file_name, row_iter,
+        channels_dict, zones_dict, tg_by_num_dict, tg_by_name_dict,
+        rptr_filter_list, names_index=None, sources_dict=None,
+        problems_list=None, repeater_talk_groups_dict=None, geo_filter=None,
+        debug=False):
+    """This function expands repeater rows into channels and zones.
+
+    row_iter yields (line, row, talk group list) one repeater at a time,
+    where row maps the Digital-Repeaters__ columns ('Zone Name', 'Power',
+    'RX Freq', 'TX Freq', 'Color Code', optional location) and each talk
+    group in the list to its slot.  It is shared by the Digital-Repeaters__
+    loader and the repeater dump importer, so both build the same channels.
+    """
+
+    base_name = os.path.basename(k7abd_digital_file_name)
+    undefined_tg_list = []
+    for line, row, talk_group_list in row_iter:
+
+        # Get repeater name (zone name) and pull out channel prefix
+        zone_name = row['Zone Name']
+        zone_name_list = zone_name.split(';')
+        zone_name = zone_name_list[0]
+        ch_prefix = zone_name_list[1]
+        ch_prefix = ch_prefix.lower()
+
+        # Short circuit if repeater is in rptr_filter_list
+        if zone_name in rptr_filter_list:
+            continue
+
+        # Short circuit if repeater is out of --near/--route range
+        if geo_filter is not None and not geo_filter.keeps(row):
+            continue
+
+        if debug:
+            print("   Working on Zone: ", zone_name)
+
+        # set channel type
+        ch_type = "Digital"
+
+        # get "Transmit Power" value
+        ch_tx_power = row['Power']
+
+        # get "Receive Frequency" & "Transmit Frequency"
+        ch_rx_freq = k7abd_freq_to_hz(row['RX Freq'],
+            k7abd_digital_file_name, zone_name, source=(base_name, line),
+            problems_list=problems_list)
+        ch_tx_freq = k7abd_freq_to_hz(row['TX Freq'],
+            k7abd_digital_file_name, zone_name, source=(base_name, line),
+            problems_list=problems_list)
+        if ch_rx_freq is None or ch_tx_freq is None:
+            continue
+
+        # get "Color Code" value
+        ch_color_code = row['Color Code']
+
+        # Now loop through rest of columns in k7abd repeaters file and create
+        # a channel for each talk group represented that has a slot specified..
+        repeater_channel_dict = {}
+        if repeater_talk_groups_dict is not None:
+            repeater_tgs_dict = repeater_talk_groups_dict.setdefault(
+                zone_name, {'slots': {}, 'channels': {}})
+        for tg_name in talk_group_list:
+
+            # get the talk group's slot
+            ch_slot = str(row[tg_name])
+
+            valid_slot_list = ['1','2']
+            if ch_slot not in valid_slot_list:
+                # this talk group not on this repeater, so
+                # don't create a channel for it...
+                continue
+
+            # fix tg_name value - map if needed
+            if tg_name in tg_by_name_dict.keys():
+                # lookup TG number and remap name to first value in
+                # our tg_by_num_dict
+                tg_name = tg_by_num_dict[tg_by_name_dict[tg_name]][0]
+            else:
+                # Bad day... (reported once per talk group column)
+                if tg_name not in undefined_tg_list:
+                    undefined_tg_list.append(tg_name)
+                    record_k7abd_problem(problems_list, (base_name, line),
+                        "Undefined talk group: '{}'".format(tg_name))
+                continue
+
+            # channel name
+            ch_name = ch_prefix + ' ' + tg_name
+            if names_index is not None:
+                record_truncated_name(names_index, 'Channel', ch_name,
+                    os.path.basename(k7abd_digital_file_name))
+            if len(ch_name) >16:
+                print("Warning: '{}' > 16 chars, changed to '{}'.".format(
+                    ch_name, ch_name[:16]))
+                ch_name = ch_name[:16]
+
+            # now add this channel to the channel dictionary
+            if ch_name in channels_dict.keys():
+                if debug:
+                    print("WARNING:  channel {} already defined.".format(
+                        ch_name))
+            else:
+                # Create a new digital channel in our channels_dict
+                record_k7abd_source(sources_dict, 'Channel', ch_name,
+                    (base_name, line))
+                channels_dict.update({ch_name : {
+                    'Ch Type':ch_type,
+                    'RX Freq':ch_rx_freq,
+                    'TX Freq':ch_tx_freq,
+                    'Power':ch_tx_power,
+                    'Bandwidth':"12.5",
+                    'CTCSS Decode':"Off",
+                    'CTCSS Encode':"Off",
+                    'Color Code':ch_color_code,
+                    'Talk Group':tg_name,
+                    'TG Number':tg_by_name_dict[tg_name],
+                    'Time Slot':ch_slot,
+                    'Call Type':"Group Call",
+                    'TX Permit':"Same Color Code",
+                    'RX Only':"Off"
+                    }})
+                if repeater_talk_groups_dict is not None:
+                    repeater_tgs_dict['channels'].update({ch_name: ch_slot})
+
+            # note what this repeater carries on the slot
+            if repeater_talk_groups_dict is not None:
+                repeater_tgs_dict['slots'].setdefault(ch_slot, []).append(
+                    tg_by_name_dict[tg_name])
+
+            # collect this channel and the specified zone
+            repeater_channel_dict.update({ch_name:zone_name})
+
+        # Now sort the channels; add them to the zones
+        for ch_name in sorted(repeater_channel_dict.keys()):
+            add_channel_to_zone(repeater_channel_dict[ch_name], ch_name,
+                    zones_dict, channels_dict, debug=False)
+
+    return
@@ -0,0 +1,203 @@
+# coding: utf-8
+#
+# Channel lists built from the zones and repeaters: scan lists, receive
+# group lists, and splitting any member list at a radio's per-list limit.
+#
+
+
+def ordered_zone_names(zones_dict, zones_order_list):
+    """This function lists zone names in the order the zones are written.
+
+    Zones named in zones_order_list come first, in that order; the rest
+    follow in the order they were loaded.
+    """
+
+    zone_name_list = [zone_name for zone_name in zones_order_list
+                      if zone_name in zones_dict]
+    ordered_set = set(zone_name_list)
+    for zone_name in zones_dict.keys():
+        if zone_name not in ordered_set:
+            zone_name_list.append(zone_name)
+
+    return zone_name_list
+
+
+
+def unique_list_name(list_name, used_dict, max_name_len=16):
+    """This function shortens a list name and numbers it if already used."""
+
+    unique_name = list_name[:max_name_len]
+    cnt = 2
+    while unique_name in used_dict:
+        suffix = ' {}'.format(cnt)
+        unique_name = list_name[:max_name_len - len(suffix)].rstrip() + suffix
+        cnt += 1
+
+    return unique_name
+
+
+
+def split_member_list(list_name, member_list, max_members, max_name_len=16,
+        used_dict=None):
+    """This function splits a member list at a per-list limit.
+
+    Returns (name, members) pairs, keeping the member order.  A list that
+    fits is returned as is; otherwise the parts are numbered "name 1",
+    "name 2", ... with the name shortened so each still fits in
+    max_name_len characters.  used_dict, if given, holds the names already
+    taken: the names returned are made unique against it with
+    unique_list_name() and added to it.
+    """
+
+    if max_members is None or len(member_list) <= max_members:
+        name_list = [list_name]
+        member_part_list = [list(member_list)]
+    else:
+        name_list = []
+        member_part_list = []
+        part_cnt = (len(member_list) + max_members - 1) // max_members
+        for part in range(part_cnt):
+            suffix = ' {}'.format(part + 1)
+            name_list.append(list_name[:max_name_len - len(suffix)].rstrip() +
+                suffix)
+            member_part_list.append(
+                member_list[part * max_members:(part + 1) * max_members])
+
+    part_list = []
+    for part_name, part_member_list in zip(name_list, member_part_list):
+        if used_dict is not None:
+            part_name = unique_list_name(part_name, used_dict, max_name_len)
+            used_dict.update({part_name: None})
+        part_list.append((part_name, part_member_list))
+
+    return part_list
+
+
+
+def split_zones(zones_dict, zones_order_list, max_members, max_name_len=16):
+    """This function splits zones that hold more channels than a radio allows.
+
+    A zone over max_members becomes numbered sub-zones ("name 1",
+    "name 2", ...) of its members in the order the zone files list them
+    (sorted); zones that fit are kept as they are.  The sub-zones take the
+    zone's place, both in load order and in zones_order_list; a sub-zone
+    name that another zone already has is numbered on (see
+    unique_list_name()) rather than replacing that zone.  Returns the new
+    zones dict, the new zones order list and {zone name: sub-zone names}
+    for the zones that were split.
+    """
+
+    # zones that fit keep their names, so reserve them all up front
+    used_dict = dict((zone_name, None) for zone_name, member_list in
+                     zones_dict.items() if len(member_list) <= max_members)
+
+    split_zones_dict = {}
+    part_names_dict = {}
+    for zone_name, member_list in zones_dict.items():
+        if len(member_list) <= max_members:
+            split_zones_dict.update({zone_name: member_list})
+            continue
+        part_list = split_member_list(zone_name, sorted(member_list),
+            max_members, max_name_len, used_dict=used_dict)
+        part_names_dict.update({zone_name: [part_name for part_name,
+            part_member_list in part_list]})
+        for part_name, part_member_list in part_list:
+            split_zones_dict.update({part_name: part_member_list})
+
+    split_zones_order_list = []
+    for zone_name in zones_order_list:
+        split_zones_order_list.extend(part_names_dict.get(zone_name,
+            [zone_name]))
+
+    return split_zones_dict, split_zones_order_list, part_names_dict
+
+
+
+def build_zone_scan_lists(zones_dict, zones_order_list):
+    """This function builds one scan list per zone.
+
+    Returns {scan list name: member list} in zone order, members in the
+    same (sorted) order the zone files list them.
+    """
+
+    scan_lists_dict = {}
+    for zone_name in ordered_zone_names(zones_dict, zones_order_list):
+        scan_lists_dict.update({zone_name: sorted(zones_dict[zone_name])})
+
+    return scan_lists_dict
+
+
+
+def assign_scan_lists(scan_lists_dict, max_members, max_name_len=16):
+    """This function splits scan lists at a radio's limit and assigns channels.
+
+    Each channel can only point at one scan list, so it gets the first
+    list it appears in.  Names cut to max_name_len that clash with an
+    earlier list are numbered on (see unique_list_name()).  Returns the
+    (name, members) scan lists to write and {channel name: scan list
+    name}; the work is linear in the total number of list members.
+    """
+
+    scan_list_out_list = []
+    scan_list_by_channel_dict = {}
+    used_dict = {}
+    for list_name, member_list in scan_lists_dict.items():
+        for part_name, part_member_list in split_member_list(
+                list_name, member_list, max_members, max_name_len,
+                used_dict=used_dict):
+            scan_list_out_list.append((part_name, part_member_list))
+            for ch_name in part_member_list:
+                if ch_name not in scan_list_by_channel_dict:
+                    scan_list_by_channel_dict.update({ch_name: part_name})
+
+    return scan_list_out_list, scan_list_by_channel_dict
+
+
+
+def build_rx_groups(repeater_talk_groups_dict, mode='slot', max_name_len=16):
+    """This function builds receive group lists from the repeaters' talk groups.
+
+    repeater_talk_groups_dict is filled by the Digital-Repeaters__ loader.
+    With mode 'slot' each repeater slot gets a list of the talk groups it
+    carries; with 'repeater' both slots share one list.  Repeaters
+    carrying the same set of talk groups share a list: each list is
+    keyed by its member set, and the first repeater to use it names it.
+    Returns {list name: sorted TG numbers} and {channel name: list name}.
+    """
+
+    rx_groups_dict = {}
+    rx_group_by_members_dict = {}
+    rx_group_by_channel_dict = {}
+    for zone_name, repeater_tgs_dict in repeater_talk_groups_dict.items():
+
+        # the member set of each list this repeater needs
+        members_by_slot_dict = {}
+        if mode == 'repeater':
+            member_set = frozenset([tg_number for tg_list in
+                repeater_tgs_dict['slots'].values() for tg_number in tg_list])
+            for slot in repeater_tgs_dict['slots'].keys():
+                members_by_slot_dict.update({slot: member_set})
+        else:
+            for slot, tg_list in repeater_tgs_dict['slots'].items():
+                members_by_slot_dict.update({slot: frozenset(tg_list)})
+
+        # reuse an identical list, or name a new one after this repeater
+        name_by_slot_dict = {}
+        for slot, member_set in sorted(members_by_slot_dict.items()):
+            list_name = rx_group_by_members_dict.get(member_set)
+            if list_name is None:
+                if mode == 'repeater':
+                    base_name = zone_name
+                else:
+                    base_name = '{} TS{}'.format(
+                        zone_name[:max_name_len - 4].rstrip(), slot)
+                list_name = unique_list_name(base_name, rx_groups_dict,
+                    max_name_len)
+                rx_group_by_members_dict.update({member_set: list_name})
+                rx_groups_dict.update({list_name: sorted(member_set)})
+            name_by_slot_dict.update({slot: list_name})
+
+        for ch_name, slot in repeater_tgs_dict['channels'].items():
+            rx_group_by_channel_dict.update({ch_name: name_by_slot_dict[slot]})
+
+    return rx_groups_dict, rx_group_by_channel_dict
@@ -0,0 +1,118 @@
+# coding: utf-8
+#
+# Output helpers: import files go either to a directory or, with --bundle,
+# straight into zip entries with a manifest.
+#
+
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+
+class ManifestStream(io.RawIOBase):
+    """Write-only stream that hashes and counts bytes on their way out.
+
+    Used for --bundle entries, so the manifest can list each file's size
+    and SHA-256 without reading the zip entry back.
+    """
+
+    def __init__(self, out_fd):
+        self.out_fd = out_fd
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.out_fd.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+        return len(data)
+
+
+
+def open_output_bundle(bundle_file, debug=False):
+    """This function starts a --bundle zip file and its manifest."""
+
+    if debug:
+        print("Writing output to: ", bundle_file)
+    bundle_dict = {
+        'file': bundle_file,
+        'zip': zipfile.ZipFile(bundle_file, 'w',
+            compression=zipfile.ZIP_DEFLATED),
+        'files': []}
+
+    return bundle_dict
+
+
+
+@contextlib.contextmanager
+def open_output_file(bundle_dict, outputs_dir, file_name, target):
+    """This function opens an import file for one of the target writers.
+
+    Without a bundle it yields the path in outputs_dir, as the writers have
+    always used.  With one it yields a stream into a new zip entry (text
+    for .csv, binary for .xlsx) that the writer's to_csv/ExcelWriter call
+    writes straight into, and records the entry for the manifest.
+    """
+
+    if bundle_dict is None:
+        yield os.path.join(outputs_dir, file_name)
+        return
+
+    with bundle_dict['zip'].open(file_name, 'w') as entry_fd:
+        manifest_stream = ManifestStream(entry_fd)
+        if file_name.endswith('.xlsx'):
+            yield manifest_stream
+        else:
+            text_fd = io.TextIOWrapper(io.BufferedWriter(manifest_stream),
+                encoding='utf-8', newline='')
+            yield text_fd
+            text_fd.flush()
+            text_fd.detach()
+    bundle_dict['files'].append({'name': file_name, 'target': target,
+        'bytes': manifest_stream.size,
+        'sha256': manifest_stream.sha256.hexdigest()})
+
+    return
+
+
+
+@contextlib.contextmanager
+def open_text_output(output_file):
+    """This function opens a writer's output for the csv module.
+
+    output_file is what open_output_file() yielded: a path, opened here,
+    or a text stream into a --bundle entry, used as is.
+    """
+
+    if isinstance(output_file, str):
+        with open(output_file, 'w', encoding='utf-8',
+                newline='') as output_fd:
+            yield output_fd
+    else:
+        yield output_file
+
+
+
+def close_output_bundle(bundle_dict, count_dict, isodate, debug=False):
+    """This function adds the manifest to a --bundle zip file and closes it.
+
+    The manifest lists the model's channel, zone and talk group counts and
+    the name, target, size and SHA-256 of every import file in the bundle.
+    """
+
+    manifest_dict = {'created': isodate, 'counts': count_dict,
+                     'files': bundle_dict['files']}
+    if debug:
+        print("Writing manifest to: ", bundle_dict['file'])
+    bundle_dict['zip'].writestr('manifest.json',
+        json.dumps(manifest_dict, indent=2, sort_keys=True))
+    bundle_dict['zip'].close()
+
+    return
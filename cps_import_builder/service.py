@@ -0,0 +1,394 @@
+# coding: utf-8
+#
+# Local build service: a small HTTP server that keeps parsed reference
+# files and built codeplugs in memory and sends import files back as a
+# zip bundle, so callers don't pay a cold start for every build.
+#
+#   GET  /targets  -> JSON list of supported CPS targets
+#   GET  /stats    -> JSON cache statistics
+#   POST /build    -> zip bundle (import files + manifest.json)
+#
+# The /build request body is JSON:
+#
+#   {"targets": ["878", "uv380"],
+#    "files": {"Analog__My_Channels.csv": "<csv text>", ...},
+#    "tg_filter": ["<talk group name>", ...],
+#    "rptr_filter": ["<repeater zone name>", ...],
+#    "zone_order": ["<zone name>", ...],
+#    "scan_lists": true,
+#    "rx_groups": "slot",
+#    "near": ["<lat>,<lon>,<km>", ...],
+#    "route": [[<lat>, <lon>], ...], "route_radius": <km>}
+#
+# "files" are overlaid on the reference directory: a file with the same
+# name replaces the reference file, any other K7ABD file is added.
+#
+
+
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.geo import GeoFilter, parse_near
+from cps_import_builder.k7abd import (k7abd_file_types, find_k7abd_files,
+    read_k7abd_file_batch)
+from cps_import_builder.output import (open_output_bundle, open_output_file,
+    close_output_bundle)
+from cps_import_builder.targets import supported_cps_targets, load_cps_target
+from cps_import_builder.validate import (validate_targets, sort_problems,
+    format_problem_source)
+
+
+# zip bundles up to this size are built in memory, bigger ones spill to a
+# temporary file
+bundle_spool_size = 16 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe least recently used cache keyed by content hash."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entry_dict = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entry_dict:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entry_dict.move_to_end(key)
+            return self.entry_dict[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entry_dict[key] = value
+            self.entry_dict.move_to_end(key)
+            while len(self.entry_dict) > self.max_entries:
+                self.entry_dict.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entry_dict),
+                    'max entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+
+def k7abd_file_type(file_name):
+    """This function returns the K7ABD type prefix of a file name, or None."""
+
+    for file_type in k7abd_file_types:
+        if file_name.startswith(file_type):
+            return file_type
+
+    return None
+
+
+
+def raise_problems(problems_list):
+    """This function raises ValueError listing any problems found."""
+
+    if len(problems_list) > 0:
+        raise ValueError("{} problem(s) in the input files: {}".format(
+            len(problems_list), '; '.join(["{}: {}".format(
+            format_problem_source(source), message)
+            for source, message in sort_problems(problems_list)])))
+
+    return
+
+
+
+class BuildService:
+    """Warm model cache behind the build service.
+
+    Parsed files are cached by the SHA-1 of their contents and built
+    codeplugs by the hash of every file hash plus the filter options, so
+    an unchanged reference library is parsed once and a repeated request
+    skips loading altogether.  Both caches evict the least recently used
+    entry when full.
+    """
+
+    def __init__(self, reference_dir, max_models=8, max_files=1024,
+            debug=False):
+        self.reference_dir = reference_dir
+        self.debug = debug
+        self.batch_cache = LRUCache(max_files)
+        self.model_cache = LRUCache(max_models)
+        self.reference_hash_dict = {}
+        self.reference_lock = threading.Lock()
+
+    def reference_files(self):
+        """Returns {file name: (file type, content hash, path)}.
+
+        Files are only re-hashed when their size or modification time
+        changes.
+        """
+
+        file_dict = {}
+        with self.reference_lock:
+            for file_type, path in find_k7abd_files(self.reference_dir):
+                stat = os.stat(path)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+                cached = self.reference_hash_dict.get(path)
+                if cached is None or cached[0] != stamp:
+                    with open(path, 'rb') as file_fd:
+                        content_hash = hashlib.sha1(file_fd.read()).hexdigest()
+                    cached = (stamp, content_hash)
+                    self.reference_hash_dict.update({path: cached})
+                file_dict.update({os.path.basename(path):
+                    (file_type, cached[1], path)})
+
+        return file_dict
+
+    def file_batch(self, file_type, content_hash, source):
+        """Returns the parsed batch for a file, parsing it on a cache miss.
+
+        source is a path or the file's bytes.
+        """
+
+        file_batch = self.batch_cache.get(content_hash)
+        if file_batch is None:
+            if isinstance(source, bytes):
+                source = io.BytesIO(source)
+            file_batch = read_k7abd_file_batch(source, file_type)
+            self.batch_cache.put(content_hash, file_batch)
+
+        return file_batch
+
+    def codeplug(self, request_dict):
+        """Returns the resolved Codeplug for a /build request."""
+
+        # overlay the request's files on the reference library
+        file_dict = self.reference_files()
+        for file_name, content in request_dict.get('files', {}).items():
+            file_name = os.path.basename(file_name)
+            file_type = k7abd_file_type(file_name)
+            if file_type is None:
+                raise ValueError("'{}' is not a K7ABD input file".format(
+                    file_name))
+            content = content.encode('utf-8')
+            file_dict.update({file_name: (file_type,
+                hashlib.sha1(content).hexdigest(), content)})
+
+        # same load order as a directory: by type, then by name
+        spec_list = []
+        for file_type in k7abd_file_types:
+            for file_name in sorted(file_dict.keys()):
+                if file_dict[file_name][0] == file_type:
+                    spec_list.append((file_name,) + file_dict[file_name])
+
+        tg_filter_list = list(request_dict.get('tg_filter', []))
+        rptr_filter_list = list(request_dict.get('rptr_filter', []))
+        zones_order_list = list(request_dict.get('zone_order', []))
+        scan_lists = bool(request_dict.get('scan_lists', False))
+        rx_groups = request_dict.get('rx_groups')
+        if rx_groups not in [None, 'repeater', 'slot']:
+            raise ValueError("rx_groups must be 'repeater' or 'slot'")
+        near_list = [parse_near(near_str) for near_str in
+                     request_dict.get('near', [])]
+        route_list = [(float(lat), float(lon)) for lat, lon in
+                      request_dict.get('route', [])]
+        route_radius = float(request_dict.get('route_radius', 25.0))
+        if not route_radius > 0:
+            raise ValueError("route_radius must be greater than 0")
+        geo_filter = None
+        if near_list or route_list:
+            geo_filter = GeoFilter()
+            for lat, lon, radius_km in near_list:
+                geo_filter.add_points([(lat, lon)], radius_km)
+            geo_filter.add_route(route_list, route_radius)
+        model_key = hashlib.sha1(json.dumps(
+            [[(name, content_hash) for name, file_type, content_hash, source
+              in spec_list], tg_filter_list, rptr_filter_list,
+             zones_order_list, scan_lists, rx_groups, near_list, route_list,
+             route_radius]).encode('utf-8')).hexdigest()
+
+        codeplug = self.model_cache.get(model_key)
+        if codeplug is None:
+            codeplug = Codeplug(zones_order_list=zones_order_list,
+                tg_filter_list=tg_filter_list,
+                rptr_filter_list=rptr_filter_list, scan_lists=scan_lists,
+                rx_groups=rx_groups, geo_filter=geo_filter, debug=self.debug)
+            for file_name, file_type, content_hash, source in spec_list:
+                codeplug.add_file(file_type, file_name,
+                    file_batch=self.file_batch(file_type, content_hash,
+                    source))
+            raise_problems(codeplug.validate())
+            codeplug.resolve()
+            self.model_cache.put(model_key, codeplug)
+
+        return codeplug
+
+    def build(self, request_dict):
+        """Checks a /build request and returns (codeplug, target list).
+
+        Raises ValueError for a bad request and ImportError if a target's
+        plugin can't be loaded.
+        """
+
+        target_list = request_dict.get('targets', [])
+        if len(target_list) == 0:
+            raise ValueError("no targets given")
+        for target in target_list:
+            if target not in supported_cps_targets:
+                raise ValueError("{} not a supported CPS target".format(
+                    target))
+            load_cps_target(target)
+
+        # the cached model passed the common checks; the targets' own
+        # limits depend on the request
+        codeplug = self.codeplug(request_dict)
+        raise_problems(validate_targets(codeplug.channels_dict, target_list,
+                                        codeplug.sources_dict))
+
+        return codeplug, target_list
+
+    def write(self, codeplug, target_list, stream):
+        """Streams the import files for the targets into stream as a zip."""
+
+        isodate = time.strftime("%Y-%m-%d")
+        bundle_dict = open_output_bundle(stream, debug=self.debug)
+        for target in supported_cps_targets:
+            if target in target_list:
+                codeplug.write_files(target, functools.partial(
+                    open_output_file, bundle_dict, None, target=target),
+                    isodate=isodate)
+        close_output_bundle(bundle_dict, codeplug.counts(), isodate,
+            debug=self.debug)
+
+        return
+
+    def stats(self):
+        """Returns the cache statistics."""
+
+        return {'files': self.batch_cache.stats(),
+                'models': self.model_cache.stats()}
+
+
+
+class BuildRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for a BuildService (server.service)."""
+
+    def send_json(self, status, value):
+        body = json.dumps(value, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/targets':
+            self.send_json(200, supported_cps_targets)
+        elif self.path == '/stats':
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/build':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request_dict = json.loads(self.rfile.read(length))
+            codeplug, target_list = self.server.service.build(request_dict)
+        except (ValueError, KeyError, TypeError, ImportError) as err:
+            self.send_json(400, {'error': str(err)})
+            return
+        except SystemExit:
+            # anything that exits while loading has printed why
+            self.send_json(400, {'error': 'build failed, see service log'})
+            return
+        except Exception as err:
+            self.log_error("build failed: %r", err)
+            self.send_json(500, {'error': 'build failed: {}'.format(err)})
+            return
+
+        # the whole zip is built before answering, so a writer that fails
+        # (or exits) still gets an error response rather than a cut off 200
+        with tempfile.SpooledTemporaryFile(max_size=bundle_spool_size) \
+                as bundle_fd:
+            try:
+                self.server.service.write(codeplug, target_list, bundle_fd)
+            except SystemExit:
+                self.send_json(500, {'error':
+                    'writing the import files failed, see service log'})
+                return
+            except Exception as err:
+                self.log_error("writing the import files failed: %r", err)
+                self.send_json(500, {'error':
+                    'writing the import files failed: {}'.format(err)})
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Disposition',
+                'attachment; filename="cps_import_files.zip"')
+            self.send_header('Content-Length', str(bundle_fd.tell()))
+            self.end_headers()
+            bundle_fd.seek(0)
+            shutil.copyfileobj(bundle_fd, self.wfile)
+
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTP server that handles requests on a fixed pool of worker threads."""
+
+    def __init__(self, server_address, handler_class, service, workers=4):
+        http.server.HTTPServer.__init__(self, server_address, handler_class)
+        self.service = service
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_worker, request,
+            client_address)
+
+    def process_request_worker(self, request, client_address):
+        # a SystemExit from a reader or writer must not end the worker
+        # without an answer or a log entry
+        try:
+            self.finish_request(request, client_address)
+        except (Exception, SystemExit):
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        http.server.HTTPServer.server_close(self)
+        self.executor.shutdown(wait=True)
+
+
+
+def serve(reference_dir, host='127.0.0.1', port=8073, workers=4,
+        max_models=8, debug=False):
+    """This function runs the build service until interrupted."""
+
+    service = BuildService(reference_dir, max_models=max_models, debug=debug)
+    server = PooledHTTPServer((host, port), BuildRequestHandler, service,
+        workers=workers)
+    print("Build service on http://{}:{}/ ({} workers), reference files: '{}'".format(
+        host, port, workers, reference_dir))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return
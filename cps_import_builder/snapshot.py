@@ -0,0 +1,86 @@
+# coding: utf-8
+#
+# Build snapshots: short hashes of every channel, zone and talk group plus
+# the numbering each target used, kept between builds for --delta.
+#
+
+
+import hashlib
+import json
+import os
+
+
+def build_snapshot_hashes(channels_dict, zones_dict, tg_by_num_dict):
+    """This function hashes every channel, zone and talk group of the model.
+
+    Zone hashes cover the member frequencies too, since those are written
+    into the Anytone zone rows.
+    """
+
+    def short_hash(item_list):
+        return hashlib.sha1(repr(item_list).encode('utf-8')).hexdigest()[:16]
+
+    channel_hash_dict = {}
+    for ch_name in channels_dict.keys():
+        attr_dict = channels_dict[ch_name]
+        channel_hash_dict.update({str(ch_name): short_hash(
+            [(key, str(attr_dict[key])) for key in sorted(attr_dict.keys())])})
+
+    zone_hash_dict = {}
+    for zone_name in zones_dict.keys():
+        member_list = []
+        for ch_name in sorted(zones_dict[zone_name]):
+            member_list.append((ch_name,
+                str(channels_dict[ch_name]['RX Freq']),
+                str(channels_dict[ch_name]['TX Freq'])))
+        zone_hash_dict.update({str(zone_name): short_hash(member_list)})
+
+    tg_hash_dict = {}
+    for tg_number in tg_by_num_dict.keys():
+        tg_hash_dict.update({str(tg_number): short_hash(
+            [str(item) for item in tg_by_num_dict[tg_number]])})
+
+    return {'channels': channel_hash_dict, 'zones': zone_hash_dict,
+            'talk groups': tg_hash_dict}
+
+
+
+def changed_snapshot_keys(hash_dict, prev_hash_dict):
+    """This function returns the set of keys that are new or changed."""
+
+    changed_set = set()
+    for key in hash_dict.keys():
+        if prev_hash_dict.get(key) != hash_dict[key]:
+            changed_set.add(key)
+
+    return changed_set
+
+
+
+def read_build_snapshot(snapshot_file, debug=False):
+    """This function reads the snapshot left by the previous build."""
+
+    if not os.path.exists(snapshot_file):
+        if debug:
+            print("No build snapshot found at: {}".format(snapshot_file))
+        return {'hashes': {'channels': {}, 'zones': {}, 'talk groups': {}},
+                'numbers': {}}
+    if debug:
+        print("Processing: {}".format(snapshot_file))
+    with open(snapshot_file, 'r') as snapshot_fd:
+        snapshot_dict = json.load(snapshot_fd)
+
+    return snapshot_dict
+
+
+
+def write_build_snapshot(snapshot_dict, snapshot_file, debug=False):
+    """This function writes the build snapshot used by --delta."""
+
+    if debug:
+        print("Writing output to: ", snapshot_file)
+    with open(snapshot_file, 'w') as snapshot_fd:
+        json.dump(snapshot_dict, snapshot_fd, sort_keys=True,
+            separators=(',', ':'))
+
+    return
@@ -0,0 +1,140 @@
+# coding: utf-8
+#
+# Registry of the CPS targets cps-import-builder can generate files for.
+#
+# Each target is a plugin module in this package that is only imported
+# when the target is selected.  The registry says which module handles a
+# target, which import files it writes and which optional packages it
+# needs, so listing or checking targets never loads any writer code.
+#
+
+
+import importlib
+import importlib.util
+
+from cps_import_builder.common import ctcss_list, cdcss_list
+
+
+# target -> plugin module, description, output files and heavy dependencies;
+# file names are formatted with {delta} ('_delta' or '') and {date}.
+# 'analog values' and 'digital values' narrow a channel attribute to the
+# values the target's writer can convert and 'max channels' is its channel
+# limit (None if it has none), so a build is checked before any file is
+# written; attributes a target passes through as they are aren't listed
+cps_target_registry = {
+    '868': {
+        'module': 'anytone',
+        'description': 'Anytone D868UV',
+        'files': {'zones': 'd868uv_zones{delta}_{date}.csv',
+                  'talk groups': 'd868uv_talk_groups{delta}_{date}.csv',
+                  'channels': 'd868uv_channels{delta}_{date}.csv',
+                  'scan lists': 'd868uv_scan_lists_{date}.csv',
+                  'rx groups': 'd868uv_rx_groups_{date}.csv'},
+        'requires': [],
+        'delta': True,
+        'analog values': {},
+        'digital values': {},
+        'max channels': None},
+    '578': {
+        'module': 'anytone',
+        'description': 'Anytone D578UV',
+        'files': {'zones': 'd578uv_zones{delta}_{date}.csv',
+                  'talk groups': 'd578uv_talk_groups{delta}_{date}.csv',
+                  'channels': 'd578uv_channels{delta}_{date}.csv',
+                  'scan lists': 'd578uv_scan_lists_{date}.csv',
+                  'rx groups': 'd578uv_rx_groups_{date}.csv',
+                  'digital contacts': 'd578uv_digital_contacts_{date}.csv'},
+        'requires': [],
+        'delta': True,
+        'analog values': {},
+        'digital values': {},
+        'max channels': None},
+    '878': {
+        'module': 'anytone',
+        'description': 'Anytone D878UV',
+        'files': {'zones': 'd878uv_zones{delta}_{date}.csv',
+                  'talk groups': 'd878uv_talk_groups{delta}_{date}.csv',
+                  'channels': 'd878uv_channels{delta}_{date}.csv',
+                  'scan lists': 'd878uv_scan_lists_{date}.csv',
+                  'rx groups': 'd878uv_rx_groups_{date}.csv',
+                  'digital contacts': 'd878uv_digital_contacts_{date}.csv'},
+        'requires': [],
+        'delta': True,
+        'analog values': {},
+        'digital values': {},
+        'max channels': None},
+    'cs800d': {
+        'module': 'cs800d',
+        'description': 'Connect Systems CS800D',
+        'files': {'talk groups': 'cs800d_talk_groups_{date}.xlsx',
+                  'channels': 'cs800d_channels_{date}.xlsx'},
+        'requires': ['xlsxwriter'],
+        'delta': False,
+        'analog values': {'CTCSS Decode': ['Off'] + ctcss_list + cdcss_list,
+                          'CTCSS Encode': ['Off'] + ctcss_list + cdcss_list},
+        'digital values': {},
+        'max channels': 2000},
+    'opengd77': {
+        'module': 'opengd77',
+        'description': 'Open GD77 CPS',
+        'files': {'talk groups': 'opengd77_talk_groups_{date}.csv',
+                  'channels': 'opengd77_channels_{date}.csv'},
+        'requires': [],
+        'delta': False,
+        'analog values': {},
+        'digital values': {},
+        'max channels': None},
+    'uv380': {
+        'module': 'uv380',
+        'description': 'Tytera MD-UV380/MD-UV390',
+        'files': {'talk groups': 'uv380_talk_groups_{date}.csv',
+                  'channels': 'uv380_channels_{date}.csv',
+                  'rx groups': 'uv380_rx_groups_{date}.csv'},
+        'requires': [],
+        'delta': False,
+        'analog values': {'Bandwidth': ['12.5K', '20K', '25K'],
+                          'Power': ['Low', 'Medium', 'High', 'Turbo']},
+        'digital values': {'Power': ['Low', 'Medium', 'High', 'Turbo'],
+                           'TX Permit': ['Always', 'Same Color Code']},
+        'max channels': None},
+}
+
+# targets in the order their files are generated
+supported_cps_targets = list(cps_target_registry.keys())
+
+
+
+def cps_target_file_names(target, delta, isodate):
+    """This function returns a target's import file names by file kind.
+
+    delta only changes the names of targets that support delta builds.
+    """
+
+    target_dict = cps_target_registry[target]
+    if delta and target_dict['delta']:
+        delta_name = '_delta'
+    else:
+        delta_name = ''
+    file_name_dict = {}
+    for kind, pattern in target_dict['files'].items():
+        file_name_dict.update({kind: pattern.format(delta=delta_name,
+            date=isodate)})
+
+    return file_name_dict
+
+
+
+def load_cps_target(target):
+    """This function imports and returns the plugin module for a target.
+
+    Raises ImportError, naming the missing package, if one of the target's
+    dependencies isn't installed.
+    """
+
+    target_dict = cps_target_registry[target]
+    for package in target_dict['requires']:
+        if importlib.util.find_spec(package) is None:
+            raise ImportError("CPS target '{}' needs the '{}' package".format(
+                target, package))
+
+    return importlib.import_module('.' + target_dict['module'], __name__)
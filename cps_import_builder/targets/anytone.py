@@ -0,0 +1,723 @@
+# coding: utf-8
+#
+# Anytone D868UV, D578UV and D878UV import files (zones, talk groups,
+# channels, scan lists, receive group lists and, for the 578 and 878, the
+# digital contact list), with --delta support.
+#
+
+
+import pandas
+import csv
+
+from cps_import_builder.common import hz_to_mhz, target_name
+from cps_import_builder.contacts import iter_user_db_contacts
+from cps_import_builder.lists import assign_scan_lists, split_zones
+from cps_import_builder.output import open_text_output
+
+
+# most channels a zone holds, by model
+anytone_zone_max_members = {'868': 250, '578': 250, '878': 250}
+
+
+# per-radio scan list limits (the same on the 868, 578 and 878)
+anytone_scan_list_max_members = 50
+anytone_scan_list_max_lists = 250
+
+# per-radio receive group list limits
+anytone_rx_group_max_members = 64
+anytone_rx_group_max_lists = 250
+
+# most digital contacts (DMR users) a radio holds, by model
+anytone_digital_contact_max = {'578': 500000, '878': 200000}
+
+
+def select_delta_rows(out_df, key_column, delta_dict):
+    """This function trims a numbered output dataframe for a delta build.
+
+    delta_dict holds the 'changed' set of keys (None for a full build) and
+    the 'prev numbers' dict from the last build's snapshot.  A row is kept
+    if its key changed or its "No." differs from the last build, so a
+    partial import never lands on the wrong slot.  The current numbering
+    is recorded in delta_dict['numbers'] and the row counts in 'written'
+    and 'total'.
+    """
+
+    changed_set = delta_dict['changed']
+    prev_number_dict = delta_dict['prev numbers']
+    number_dict = {}
+    keep_list = []
+    for i in range(len(out_df.index)):
+        key = str(out_df.at[i, key_column])
+        number = int(out_df.at[i, 'No.'])
+        number_dict.update({key: number})
+        if changed_set is None:
+            keep_list.append(True)
+        else:
+            keep_list.append(key in changed_set or
+                prev_number_dict.get(key) != number)
+    delta_dict.update({'numbers': number_dict,
+                       'written': sum(keep_list),
+                       'total': len(keep_list)})
+
+    return out_df[keep_list]
+
+
+
+def new_delta_dicts(model, changed_dict, prev_snapshot_dict):
+    """This function sets up the per-file delta bookkeeping for a model."""
+
+    prev_numbers_dict = prev_snapshot_dict['numbers'].get(model, {})
+    delta_dicts = {}
+    for kind in ['channels','zones','talk groups']:
+        delta_dicts.update({kind: {'changed': changed_dict[kind],
+            'prev numbers': prev_numbers_dict.get(kind, {})}})
+
+    return delta_dicts
+
+
+
+def print_delta_summary(delta_dicts):
+    """This function prints what a delta build left out."""
+
+    for kind in ['channels','zones','talk groups']:
+        delta_dict = delta_dicts[kind]
+        print("      Delta {}: {} of {} written, {} unchanged left out".format(
+            kind, delta_dict['written'], delta_dict['total'],
+            delta_dict['total'] - delta_dict['written']))
+
+    return
+
+
+
+def anytone_write_zones_export(zones_dict, zones_order_list,
+        zones_export_file, channels_dict, model, delta_dict=None,
+        debug=False):
+    """This function writes out an Anytone zones import/export file"""
+
+    if debug:
+            print("Preparing Zones Export File...")
+
+    # Create a dataframe from the zones dict
+    header_row_868 = ['No.','Zone Name','Zone Channel Member',
+                  'A Channel','B Channel']
+    header_row_878 = ['No.','Zone Name','Zone Channel Member',
+                  'Zone Channel Member RX Frequency',
+                  'Zone Channel Member TX Frequency',
+                  'A Channel','A Channel RX Frequency',
+                  'A Channel TX Frequency',
+                  'B Channel','B Channel RX Frequency',
+                  'B Channel TX Frequency']
+    zones_out_dict = {}
+    zones_not_ordered_list = []
+    cnt = 1
+    for zone_name in zones_dict.keys():
+        if debug:
+            print("   Adding zone {} with following members:".format(zone_name))
+            print("   ", zones_dict[zone_name])
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(zone_name)
+
+        # build Zone Channel Member string from list
+        zone_member_list = sorted(zones_dict[zone_name])
+        member_str = '|'.join(zone_member_list)
+        if debug:
+            print("   Member string: '{}'".format(member_str))
+        row_list.append(member_str)
+
+        if model != "868":
+
+            # build Zone Channel Rx Freq string
+            rx_freq_list = []
+            for member in zone_member_list:
+                channel_rx_freq = str(hz_to_mhz(
+                    channels_dict[member]['RX Freq']))
+                rx_freq_list.append(channel_rx_freq)
+            rx_freq_str = '|'.join(rx_freq_list)
+            row_list.append(rx_freq_str)
+
+            # build Zone Channel Tx Freq string
+            tx_freq_list = []
+            for member in zone_member_list:
+                channel_tx_freq = str(hz_to_mhz(
+                    channels_dict[member]['TX Freq']))
+                tx_freq_list.append(channel_tx_freq)
+            tx_freq_str = '|'.join(tx_freq_list)
+            row_list.append(tx_freq_str)
+
+        # now use first member channel info as the "A" & "B" VFO default
+        first_member_name = zones_dict[zone_name][0]
+        attr_dict = channels_dict[first_member_name]
+        row_list.append(first_member_name)
+        if model != "868":
+            row_list.append(hz_to_mhz(attr_dict['RX Freq']))
+            row_list.append(hz_to_mhz(attr_dict['TX Freq']))
+        row_list.append(first_member_name)
+        if model != "868":
+            row_list.append(hz_to_mhz(attr_dict['RX Freq']))
+            row_list.append(hz_to_mhz(attr_dict['TX Freq']))
+        zones_out_dict.update({zone_name:row_list})
+        if zone_name not in zones_order_list:
+            zones_not_ordered_list.append(row_list)
+
+    # Build zones_out_list to match zones_order_list; all the rest of the zones
+    # go to bottom of list in the order they were processed
+    zones_out_list = []
+    for zone_name in zones_order_list:
+        if zone_name in zones_out_dict.keys():
+            if debug:
+                print("   Adding zone to zones_out_list: {}".format(zone_name))
+            zones_out_list.append(zones_out_dict[zone_name])
+        else:
+            print("Warning:  Zone '{}' specified in Zones_Order.csv file not used!".format(zone_name))
+    for i in range(len(zones_not_ordered_list)):
+        if debug:
+            print("   Adding zone to zones_out_list: {}".format(zones_not_ordered_list[i][1]))
+        zones_out_list.append(zones_not_ordered_list[i])
+
+    # Output our Zones dataframe
+    if model == "868":
+        zones_out_df = pandas.DataFrame(zones_out_list, columns=header_row_868)
+    else:
+        # 578 and 878 zone files are the same
+        zones_out_df = pandas.DataFrame(zones_out_list, columns=header_row_878)
+
+    # renumber the "No." column to match new order
+    for i in range(len(zones_out_df.index)):
+        zones_out_df.at[i, 'No.'] = i+1
+
+    # trim to new/changed zones for a delta build
+    if delta_dict is not None:
+        zones_out_df = select_delta_rows(zones_out_df, 'Zone Name',
+            delta_dict)
+
+    if debug:
+        print("Writing output to: ", zones_export_file)
+    zones_out_df.to_csv(zones_export_file, index=False, header=True, quoting=csv.QUOTE_ALL,
+                   line_terminator='\r\n')
+
+    # clean up...
+    del zones_out_list
+    del zones_out_df
+
+    return
+
+
+
+def anytone_write_talk_groups_export(talk_groups_dict,
+        talk_groups_export_file, delta_dict=None, target_names=None,
+        debug=False):
+    """This function writes out an Anytone D878 talk groups file"""
+
+    if target_names is None:
+        target_names = target_name
+
+    # Create a dataframe from the talk groups dict and output it...
+    header_row = ['No.','Radio ID','Name','Call Type','Call Alert']
+    talk_groups_out_list = []
+    cnt = 1
+    for tg_id in sorted(talk_groups_dict.keys()):
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(tg_id)
+        tg_name = target_names(talk_groups_dict[tg_id][0], 'anytone')
+        row_list.append(tg_name)
+        tg_call_type = talk_groups_dict[tg_id][1]
+        row_list.append(tg_call_type)
+        tg_call_alert = talk_groups_dict[tg_id][2]
+        row_list.append(tg_call_alert)
+        talk_groups_out_list.append(row_list)
+    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list,
+        columns=header_row)
+
+    # trim to new/changed talk groups for a delta build
+    if delta_dict is not None:
+        talk_groups_out_df = select_delta_rows(talk_groups_out_df,
+            'Radio ID', delta_dict)
+
+    if debug:
+        print("Writing output to: ", talk_groups_export_file)
+    talk_groups_out_df.to_csv(talk_groups_export_file, index=False,
+            header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+
+    # clean up...
+    del talk_groups_out_list
+    del talk_groups_out_df
+
+    return
+
+
+
+def anytone_write_scan_lists_export(scan_list_out_list,
+        scan_lists_export_file, channels_dict, model, debug=False):
+    """This function writes out an Anytone scan lists import/export file"""
+
+    header_row_868 = ['No.','Scan List Name','Scan Channel Member',
+                  'Scan Mode','Priority Channel Select','Priority Channel 1',
+                  'Priority Channel 2','Revert Channel',
+                  'Look Back Time A[s]','Look Back Time B[s]',
+                  'Dropout Delay Time[s]','Dwell Time[s]']
+    header_row_878 = ['No.','Scan List Name','Scan Channel Member',
+                  'Scan Channel Member RX Frequency',
+                  'Scan Channel Member TX Frequency',
+                  'Scan Mode','Priority Channel Select','Priority Channel 1',
+                  'Priority Channel 1 RX Frequency',
+                  'Priority Channel 1 TX Frequency','Priority Channel 2',
+                  'Priority Channel 2 RX Frequency',
+                  'Priority Channel 2 TX Frequency','Revert Channel',
+                  'Look Back Time A[s]','Look Back Time B[s]',
+                  'Dropout Delay Time[s]','Dwell Time[s]']
+
+    scan_lists_out_list = []
+    cnt = 1
+    for list_name, member_list in scan_list_out_list:
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(list_name)
+        row_list.append('|'.join(member_list))  # Scan Channel Member
+        if model != "868":
+            row_list.append('|'.join([str(hz_to_mhz(
+                channels_dict[member]['RX Freq'])) for member in member_list]))
+            row_list.append('|'.join([str(hz_to_mhz(
+                channels_dict[member]['TX Freq'])) for member in member_list]))
+        row_list.append("Off")                  # Scan Mode
+        row_list.append("Off")                  # Priority Channel Select
+        row_list.append("Off")                  # Priority Channel 1
+        if model != "868":
+            row_list.append("")                 # Priority Channel 1 RX Freq
+            row_list.append("")                 # Priority Channel 1 TX Freq
+        row_list.append("Off")                  # Priority Channel 2
+        if model != "868":
+            row_list.append("")                 # Priority Channel 2 RX Freq
+            row_list.append("")                 # Priority Channel 2 TX Freq
+        row_list.append("Selected")             # Revert Channel
+        row_list.append("2.0")                  # Look Back Time A[s]
+        row_list.append("3.0")                  # Look Back Time B[s]
+        row_list.append("3.1")                  # Dropout Delay Time[s]
+        row_list.append("3.1")                  # Dwell Time[s]
+        scan_lists_out_list.append(row_list)
+
+    if model == "868":
+        scan_lists_out_df = pandas.DataFrame(scan_lists_out_list,
+            columns=header_row_868)
+    else:
+        scan_lists_out_df = pandas.DataFrame(scan_lists_out_list,
+            columns=header_row_878)
+
+    if debug:
+        print("Writing output to: ", scan_lists_export_file)
+    scan_lists_out_df.to_csv(scan_lists_export_file, index=False,
+        header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+
+    # clean up...
+    del scan_lists_out_list
+    del scan_lists_out_df
+
+    return
+
+
+
+def anytone_write_rx_groups_export(rx_groups_dict, rx_groups_export_file,
+        talk_groups_dict, model, target_names=None, debug=False):
+    """This function writes out an Anytone receive group lists import file"""
+
+    if target_names is None:
+        target_names = target_name
+
+    header_row_868 = ['No.','Group Name','Contact']
+    header_row_878 = ['No.','Group Name','Contact','Contact TG/DMR ID']
+
+    rx_groups_out_list = []
+    cnt = 1
+    for group_name, tg_number_list in rx_groups_dict.items():
+        if len(tg_number_list) > anytone_rx_group_max_members:
+            print("   Warning:  receive group '{}' has {} talk groups, keeping the first {}.".format(
+                group_name, len(tg_number_list),
+                anytone_rx_group_max_members))
+            tg_number_list = tg_number_list[:anytone_rx_group_max_members]
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(group_name)
+        row_list.append('|'.join([target_names(talk_groups_dict[tg_number][0],
+            'anytone') for tg_number in tg_number_list]))   # Contact
+        if model != "868":
+            row_list.append('|'.join([str(tg_number) for tg_number in
+                tg_number_list]))                           # Contact TG/DMR ID
+        rx_groups_out_list.append(row_list)
+
+    if model == "868":
+        rx_groups_out_df = pandas.DataFrame(rx_groups_out_list,
+            columns=header_row_868)
+    else:
+        rx_groups_out_df = pandas.DataFrame(rx_groups_out_list,
+            columns=header_row_878)
+
+    if debug:
+        print("Writing output to: ", rx_groups_export_file)
+    rx_groups_out_df.to_csv(rx_groups_export_file, index=False,
+        header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+
+    # clean up...
+    del rx_groups_out_list
+    del rx_groups_out_df
+
+    return
+
+
+
+def anytone_write_digital_contacts_export(user_db_file,
+        digital_contacts_export_file, model, contact_filter=None,
+        debug=False):
+    """This function writes out an Anytone digital contact list import file
+
+    The DMR user database is streamed straight through to the import file
+    with the csv module, one contact at a time, so memory use doesn't grow
+    with the size of the database.  Stops at the radio's contact limit.
+    Returns the counts from iter_user_db_contacts() plus 'written'.
+    """
+
+    header_row = ['No.','Radio ID','Callsign','Name','City','State',
+                  'Country','Remarks','Call Type','Call Alert']
+
+    if debug:
+        print("Writing output to: ", digital_contacts_export_file)
+    stats_dict = {}
+    cnt = 0
+    with open_text_output(digital_contacts_export_file) as output_fd:
+        contacts_writer = csv.writer(output_fd, quoting=csv.QUOTE_ALL,
+            lineterminator='\r\n')
+        contacts_writer.writerow(header_row)
+        for (radio_id, callsign, name, city, state, country,
+                remarks) in iter_user_db_contacts(user_db_file,
+                contact_filter=contact_filter, stats_dict=stats_dict):
+            if cnt == anytone_digital_contact_max[model]:
+                print("   Warning:  the {} holds {} digital contacts, the rest were left out.".format(
+                    model, anytone_digital_contact_max[model]))
+                break
+            cnt = cnt + 1
+            contacts_writer.writerow([cnt, radio_id, callsign, name, city,
+                state, country, remarks, 'Private Call', 'None'])
+    stats_dict.update({'written': cnt})
+
+    return stats_dict
+
+
+
+def anytone_write_channels_export(channels_dict, channels_export_file,
+        model, channel_numbers_dict=None, delta_dict=None,
+        scan_list_by_channel_dict=None, rx_group_by_channel_dict=None,
+        target_names=None, debug=False):
+    """This function writes out an Anytone D878 channels import/export file"""
+
+    if target_names is None:
+        target_names = target_name
+
+    # Header for Anytone 868
+    header_row_868 = ['No.','Channel Name','Receive Frequency',
+                  'Transmit Frequency','Channel Type','Transmit Power',
+                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
+                  'Contact','Contact Call Type','Radio ID',
+                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
+                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
+                  'Slot','CH Scan List','Receive Group List','TX Prohibit',
+                  'Reverse','Simplex TDMA','TDMA Adaptive',
+                  'Encryption Type','Digital Encryption',
+                  'Call Confirmation','Talk Around','Work Alone',
+                  'Custom CTCSS','2TONE Decode','Ranging','Through Mode',
+                  'APRS Report','APRS Report Channel']
+
+    # Header for Anytone 578
+    header_row_578 = ['No.','Channel Name','Receive Frequency',
+                  'Transmit Frequency','Channel Type','Transmit Power',
+                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
+                  'Contact','Contact Call Type','Contact TG/DMR ID','Radio ID',
+                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
+                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
+                  'Slot','Scan List','Receive Group List','PTT Prohibit',
+                  'Reverse','TDMA','TDMA Adaptive',
+                  'AES Digital Encryption','Digital Encryption',
+                  'Call Confirmation','Talk Around(Simplex)','Work Alone',
+                  'Custom CTCSS','2TONE Decode','Ranging','Simplex',
+                  'Digi APRS RX','Analog APRS PTT Mode',
+                  'Digital APRS PTT Mode','APRS Report Type',
+                  'Digital APRS Report Channel','Correct Frequency[Hz]',
+                  'SMS Confirmation','Exclude channel from roaming',
+                  'DMR MODE','DataACK Disable','R5toneBot','R5ToneEot']
+
+    # Header for Anytone 878
+    header_row_878 = ['No.','Channel Name','Receive Frequency',
+                  'Transmit Frequency','Channel Type','Transmit Power',
+                  'Band Width','CTCSS/DCS Decode','CTCSS/DCS Encode',
+                  'Contact','Contact Call Type','Contact TG/DMR ID','Radio ID',
+                  'Busy Lock/TX Permit','Squelch Mode','Optional Signal',
+                  "DTMF ID",'2Tone ID','5Tone ID','PTT ID','Color Code',
+                  'Slot','Scan List','Receive Group List','PTT Prohibit',
+                  'Reverse','Simplex TDMA','Slot Suit',
+                  'AES Digital Encryption','Digital Encryption',
+                  'Call Confirmation','Talk Around(Simplex)','Work Alone',
+                  'Custom CTCSS','2TONE Decode','Ranging','Through Mode',
+                  'Digi APRS RX','Analog APRS PTT Mode',
+                  'Digital APRS PTT Mode','APRS Report Type',
+                  'Digital APRS Report Channel','Correct Frequency[Hz]',
+                  'SMS Confirmation','Exclude channel from roaming',
+                  'DMR MODE','DataACK Disable','R5toneBot','R5ToneEot']
+
+    # Create a dataframe from the channels dict and output it...
+    channels_out_list = []
+    cnt = 1
+    for ch_name in channels_dict.keys():
+
+        # get channel attributes dictionary
+        attr_dict = channels_dict[ch_name]
+
+        # now fill out this row in correct order for Anytone 878
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(ch_name)
+        row_list.append(hz_to_mhz(attr_dict['RX Freq']))  # Receive Frequency
+        row_list.append(hz_to_mhz(attr_dict['TX Freq']))  # Transmit Frequency
+        ch_type = attr_dict['Ch Type']
+        if ch_type == "Analog":
+            row_list.append("A-Analog")
+        else:
+            row_list.append("D-Digital")        # Channel Type
+
+        # get power and translate "High" to "Turbo"
+        rf_power = attr_dict['Power']
+        if rf_power == "High":
+            rf_power = "Turbo"
+        row_list.append(rf_power)               # Transmit Power
+
+        row_list.append(attr_dict['Bandwidth']) # Bandwidth
+        row_list.append(attr_dict['CTCSS Decode'])  # CTCSS/DCS Decode
+        row_list.append(attr_dict['CTCSS Encode'])  # CTCSS/DCS Encode
+        if ch_type == "Analog":
+            # use fixed items
+            row_list.append("0_Analog")             # Talk Group
+            row_list.append("Group Call")           # Contact Call Type
+            if model != "868":
+                row_list.append("0")                # Contact TG/DMR ID
+            row_list.append("none")                 # Radio ID
+            row_list.append("0")                    # Busy Lock/TX Permit
+        else:
+            # use digital channel attributes
+            row_list.append(target_names(attr_dict['Talk Group'],
+                'anytone'))                         # Talk Group
+            row_list.append(attr_dict['Call Type']) # Contact Call Type
+            if model != "868":
+                row_list.append(attr_dict['TG Number']) # Contact TG/DMR ID
+            row_list.append("My_DMR_ID")            # Radio ID
+            row_list.append(attr_dict['TX Permit']) # Busy Lock/TX Permit
+        row_list.append("Carrier")                  # Squelch Mode
+        row_list.append("Off")                      # Optional Signal
+        row_list.append("1")                        # DTMF ID
+        row_list.append("1")                        # 2Tone ID
+        row_list.append("1")                        # 5Tone ID
+        row_list.append("Off")                      # PTT ID
+        if ch_type == "Analog":
+            # use fixed items
+            row_list.append("1")                    # Color Code
+            row_list.append("1")                    # Time Slot
+        else:
+            # use digital channel attributes
+            row_list.append(attr_dict['Color Code'])# Color Code
+            row_list.append(attr_dict['Time Slot']) # Time Slot
+        if scan_list_by_channel_dict is not None:
+            row_list.append(scan_list_by_channel_dict.get(ch_name,
+                "None"))                            # Scan List
+        else:
+            row_list.append("None")                 # Scan List
+        if rx_group_by_channel_dict is not None:
+            row_list.append(rx_group_by_channel_dict.get(ch_name,
+                "None"))                            # Receive Group List
+        else:
+            row_list.append("None")                 # Receive Group List
+        row_list.append(attr_dict['RX Only'])       # PTT Prohibit
+        row_list.append("Off")                      # Reverse
+        row_list.append("Off")                      # Simplex TDMA
+        row_list.append("Off")                      # TDMA Adaptive
+        row_list.append("Normal Encryption")        # AES Digital Encryption
+        row_list.append("Off")                      # Digital Encryption
+        row_list.append("Off")                      # Call Confirmation
+        row_list.append("Off")                      # Talk Around
+        row_list.append("Off")                      # Work Alone
+        row_list.append("251.1")                    # Custom CTCSS
+        row_list.append("1")                        # 2TONE Decode
+        row_list.append("Off")                      # Ranging
+        row_list.append("Off")                      # Through Mode
+
+        if model == "868":
+           row_list.append("Off")                   # APRS Report
+           row_list.append("1")                     # APRS Channel
+        else:
+            row_list.append("Off")                  # Digi APRS RX
+            row_list.append("Off")                  # Analog APRS PTT Mode
+            row_list.append("Off")                  # Digital APRS PTT Mode
+            row_list.append("Off")                  # APRS Report Type
+            row_list.append("1")                # Digtial APRS Report Channel
+            row_list.append("0")                    # Correct Frequency[Hz]
+            row_list.append("Off")                  # SMS Confirmation
+            row_list.append("0")                # Exclude channel from roaming
+            # calculate DMR Mode
+            if (attr_dict['RX Freq'] == attr_dict['TX Freq']):
+                # assume simplex mode
+                row_list.append(0)
+            else:
+                row_list.append(1)
+            row_list.append("0")                    # DataACK Disable
+            row_list.append("0")                    # R5toneBot
+            row_list.append("0")                    # R5ToneEot
+
+        # now add this row to the channels list
+        channels_out_list.append(row_list)
+
+    if model == "868":
+        channels_out_df = pandas.DataFrame(channels_out_list,
+                            columns=header_row_868)
+    elif model == "578":
+        channels_out_df = pandas.DataFrame(channels_out_list,
+                            columns=header_row_578)
+    else:
+        channels_out_df = pandas.DataFrame(channels_out_list,
+                            columns=header_row_878)
+
+    # Group channels by Channel Type (analog then digital)
+    channels_out_df.sort_values(by=['Channel Type','Channel Name'],
+        inplace=True)
+    channels_out_df.reset_index(drop=True, inplace=True)
+
+    if channel_numbers_dict is not None:
+        # use the persistent channel numbers and order rows by them
+        for i in range(len(channels_out_df.index)):
+            channels_out_df.at[i, 'No.'] = channel_numbers_dict[
+                channels_out_df.at[i, 'Channel Name']]
+        channels_out_df.sort_values(by=['No.'], inplace=True)
+        channels_out_df.reset_index(drop=True, inplace=True)
+    else:
+        # renumber the "No." column to match new order
+        for i in range(len(channels_out_df.index)):
+            channels_out_df.at[i, 'No.'] = i+1
+
+    # trim to new/changed channels for a delta build
+    if delta_dict is not None:
+        channels_out_df = select_delta_rows(channels_out_df, 'Channel Name',
+            delta_dict)
+
+    if debug:
+        print("Writing output to: ", channels_export_file)
+    channels_out_df.to_csv(channels_export_file, index=False,
+        header=True, quoting=csv.QUOTE_ALL, line_terminator='\r\n')
+
+    return
+
+
+
+def write_import_files(target, build_dict, file_name_dict, open_output,
+        debug=False):
+    """This function writes the zones, talk groups and channels files.
+
+    build_dict holds the resolved model and build options, file_name_dict
+    the file names from the target registry, and open_output(file name)
+    opens each file for the writers.  Returns the "No." given to every
+    channel, zone and talk group, for the next --delta build.
+    """
+
+    delta_dicts = new_delta_dicts(target, build_dict['changed'],
+        build_dict['prev snapshot'])
+
+    # Split zones the radio can't hold into numbered sub-zones; a changed
+    # zone changes all of its sub-zones
+    zones_dict, zones_order_list, part_names_dict = split_zones(
+        build_dict['zones'], build_dict['zones order'],
+        anytone_zone_max_members[target])
+    for zone_name, part_name_list in part_names_dict.items():
+        print("   Zone '{}' has {} channels, split into {} zones.".format(
+            zone_name, len(build_dict['zones'][zone_name]),
+            len(part_name_list)))
+        changed_set = delta_dicts['zones']['changed']
+        if changed_set is not None and zone_name in changed_set:
+            delta_dicts['zones']['changed'] = changed_set | set(part_name_list)
+
+    # Split the scan lists at the radio's limit; each channel points at
+    # the first list it's in
+    scan_list_by_channel_dict = None
+    if build_dict['scan lists'] is not None:
+        scan_list_out_list, scan_list_by_channel_dict = assign_scan_lists(
+            build_dict['scan lists'], anytone_scan_list_max_members)
+        if len(scan_list_out_list) > anytone_scan_list_max_lists:
+            print("   Warning:  {} scan lists, the radio holds {}.".format(
+                len(scan_list_out_list), anytone_scan_list_max_lists))
+    rx_group_by_channel_dict = None
+    if build_dict['rx groups'] is not None:
+        rx_group_by_channel_dict = build_dict['rx groups']['channels']
+        if len(build_dict['rx groups']['groups']) > anytone_rx_group_max_lists:
+            print("   Warning:  {} receive groups, the radio holds {}.".format(
+                len(build_dict['rx groups']['groups']),
+                anytone_rx_group_max_lists))
+
+    # Write out an Anytone zones import file
+    print("   Zones import file: {}".format(file_name_dict['zones']))
+    with open_output(file_name_dict['zones']) as output_file:
+        anytone_write_zones_export(zones_dict, zones_order_list,
+            output_file, build_dict['channels'],
+            model=target, delta_dict=delta_dicts['zones'], debug=debug)
+
+    # Write out an Anytone talk groups import file
+    print("   Talk group import file: {}".format(
+        file_name_dict['talk groups']))
+    with open_output(file_name_dict['talk groups']) as output_file:
+        anytone_write_talk_groups_export(build_dict['talk groups'],
+            output_file, delta_dict=delta_dicts['talk groups'],
+            target_names=build_dict['target names'], debug=debug)
+
+    # Write out an Anytone channel import file
+    print("   Channels import file: {}".format(file_name_dict['channels']))
+    with open_output(file_name_dict['channels']) as output_file:
+        anytone_write_channels_export(build_dict['channels'], output_file,
+            model=target, channel_numbers_dict=build_dict['channel numbers'],
+            delta_dict=delta_dicts['channels'],
+            scan_list_by_channel_dict=scan_list_by_channel_dict,
+            rx_group_by_channel_dict=rx_group_by_channel_dict,
+            target_names=build_dict['target names'], debug=debug)
+
+    # Write out an Anytone scan lists import file (always in full)
+    if scan_list_by_channel_dict is not None:
+        print("   Scan lists import file: {}".format(
+            file_name_dict['scan lists']))
+        with open_output(file_name_dict['scan lists']) as output_file:
+            anytone_write_scan_lists_export(scan_list_out_list, output_file,
+                build_dict['channels'], model=target, debug=debug)
+
+    # Write out an Anytone receive group lists import file (always in full)
+    if rx_group_by_channel_dict is not None:
+        print("   Receive groups import file: {}".format(
+            file_name_dict['rx groups']))
+        with open_output(file_name_dict['rx groups']) as output_file:
+            anytone_write_rx_groups_export(build_dict['rx groups']['groups'],
+                output_file, build_dict['talk groups'], model=target,
+                target_names=build_dict['target names'], debug=debug)
+
+    # Write out an Anytone digital contact list (578 and 878, in full)
+    if build_dict['user db'] is not None and \
+            'digital contacts' in file_name_dict:
+        print("   Digital contacts import file: {}".format(
+            file_name_dict['digital contacts']))
+        with open_output(file_name_dict['digital contacts']) as output_file:
+            stats_dict = anytone_write_digital_contacts_export(
+                build_dict['user db']['file'], output_file, model=target,
+                contact_filter=build_dict['user db']['filter'], debug=debug)
+        print("   {} digital contacts written ({} filtered out, {} invalid, {} duplicate).".format(
+            stats_dict['written'], stats_dict['filtered'],
+            stats_dict['invalid'], stats_dict['duplicate']))
+
+    if build_dict['delta']:
+        print_delta_summary(delta_dicts)
+
+    return {'channels': delta_dicts['channels']['numbers'],
+            'zones': delta_dicts['zones']['numbers'],
+            'talk groups': delta_dicts['talk groups']['numbers']}
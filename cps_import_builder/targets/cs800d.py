@@ -0,0 +1,338 @@
+# coding: utf-8
+#
+# Connect Systems CS800D import files (XLSX talk groups and channels).
+#
+
+
+import pandas
+import sys
+
+from cps_import_builder.common import (ctcss_list, cdcss_list, hz_to_mhz,
+    target_name)
+
+
+def cs800d_write_channels_export(channels_dict, channels_export_file,
+        target_names=None, debug=False):
+    """This function writes out a CS800D CPS formatted channels file"""
+
+    if target_names is None:
+        target_names = target_name
+
+    analog_header_row = ['No','Channel Alias','Squelch Level',
+                         'Channel Band[KHz]','Personality List','Scan List',
+                         'Auto Scan Start','Rx Only','Talk Around',
+                         'Lone Worker','VOX','Scrambler','Emp De-emp',
+                         'Receive Frequency',
+                         'RX CTCSS/CDCSS Type','CTCSS/CDCSS',
+                         'RX Ref Frequency','Rx Squelch Mode',
+                         'Monitor Squelch Mode',
+                         'Channel Switch Squelch Mode',
+                         'Transmit Frequency',
+                         'TX CTCSS/CDCSS Type','CTCSS/CDCSS',
+                         'TX Ref Frequency','Power Level','Tx Admit',
+                         'Reverse Burst/Turn off code',
+                         'TX Time-out Time[s]','TOT Re-key Time[s]',
+                         'TOT Pre-Alert Time[s]',
+                         'CTCSS Tail Revert Option']
+
+    digital_header_row = ['No','Channel Alias','Digital Id', 'Color Code',
+                         'Time Slot','Scan List','Auto Scan Start','Rx Only',
+                         'Talk Around', 'Lone Worker', 'VOX',
+                         'Receive Frequency',
+                         'RX Ref Frequency', 'RX Group List',
+                         'Emergency Alarm Indication',
+                         'Emergency Alarm Ack','Emergency Call Indication',
+                         'Transmit Frequency',
+                         'TX Ref Frequency','TX Contact',
+                         'Emergency System', 'Power Level','Tx Admit',
+                         'TX Time-out Time[s]','TOT Re-key Time[s]',
+                         'TOT Pre-Alert Time[s]','Private Call Confirmed',
+                         'Data Call Confirmed','Encrypt']
+
+    # setup analog channels dataframe
+    analog_channels_out_list = []
+    cnt = 1
+    total_channel_cnt = 0
+    for ch_name in sorted(channels_dict.keys()):
+        ch_type = channels_dict[ch_name]['Ch Type']
+
+        # skip non-analog channels
+        if ch_type != 'Analog':
+            continue
+
+        # get channel attributes dictionary
+        attr_dict = channels_dict[ch_name]
+
+        # now fill out this row in correct order for cs800d
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(ch_name)                    # Channel Alias
+        row_list.append("Normal")                   # Squelch level
+        row_list.append(attr_dict['Bandwidth'])     # Channel Bandwidth
+        row_list.append("Personality 1")            # Personality
+        row_list.append("None")                     # scan list
+        row_list.append("Off")                      # auto scan start
+        row_list.append(attr_dict['RX Only'])       # Rx Only
+        row_list.append("Off")                      # Talk around
+        row_list.append("Off")                      # Lone Worker
+        row_list.append("Off")                      # VOX
+        row_list.append("Off")                      # Scrambler
+        row_list.append("Off")                      # Emp De-emp
+        row_list.append(hz_to_mhz(attr_dict['RX Freq']))  # Receive Frequency
+
+        # RX CTCSS/CDCSS Type & set rx_squelch_mode
+        ctcss_dcs_decode_val = str(attr_dict['CTCSS Decode'])
+        if ctcss_dcs_decode_val == "Off":
+            row_list.append("NONE")
+            row_list.append("NONE")
+            rx_squelch_mode = "CTCSS/DCS and Audio"
+        elif ctcss_dcs_decode_val in ctcss_list:
+            row_list.append("CTCSS")
+            row_list.append(float(ctcss_dcs_decode_val))
+            rx_squelch_mode = "CTCSS/DCS and Audio"
+        elif ctcss_dcs_decode_val in cdcss_list:
+            row_list.append("CDCSS")
+            row_list.append(ctcss_dcs_decode_val[1:4])
+            rx_squelch_mode = "CTCSS/DCS and Audio"
+        else:
+            # we should never get here!
+            print("ERROR:  Invalid ctcss_dcs_decode_val '{}'".format(
+                ctcss_dcs_decode_val))
+            sys.exit(-1)
+
+        # Compute RX Ref Frequency
+        if attr_dict['RX Freq'] > 180000000:
+            row_list.append("Low")  # RX Ref Frequency (VHF/2 meters)
+        else:
+            row_list.append("Low")  # RX Ref Frequency (UHF/70cm )
+
+        row_list.append(rx_squelch_mode)    # Rx squelch mode
+        row_list.append("Carrier")          # Monitor squelch mode
+        row_list.append("RX Squelch Mode")  # Channel switch squelch mode
+
+        row_list.append(hz_to_mhz(attr_dict['TX Freq']))  # Transmit Frequency
+
+        # TX CTCSS/CDCSS Type
+        ctcss_dcs_encode_val = str(attr_dict['CTCSS Encode'])
+        if ctcss_dcs_encode_val == "Off":
+            row_list.append("NONE")
+            row_list.append("NONE")
+        elif ctcss_dcs_encode_val in ctcss_list:
+            row_list.append("CTCSS")
+            row_list.append(float(ctcss_dcs_encode_val))
+        elif ctcss_dcs_encode_val in cdcss_list:
+            row_list.append("CDCSS")
+            row_list.append(ctcss_dcs_encode_val[1:4])
+        else:
+            # we should never get here!
+            print("ERROR:  Invalid ctcss_dcs_encode_val '{}'".format(
+                ctcss_dcs_encode_val))
+            sys.exit(-1)
+
+        # Compute TX Ref Frequency
+        if attr_dict['TX Freq'] > 180000000:
+            row_list.append("Middle")     # TX Ref Frequency (VHF/2 meters)
+        else:
+            row_list.append("Low")        # TX Ref Frequency (UHF/70cm )
+
+        # Power level
+        power_level = attr_dict['Power']
+        if power_level in ['Turbo','High']:
+            row_list.append("High")
+        else:
+            row_list.append("Low")
+        row_list.append("Always Allow")   # TX Admit
+        row_list.append("Off")            # Reverse Burst/Turn off code
+        row_list.append("180")            # TX Time-out Time[s]
+        row_list.append("0")              # TOT Re-key Time[s]
+        row_list.append("10")             # TOT Pre-Alert Time[s]
+        row_list.append("120")            # CTCSS Tail Revert Option
+
+        # now add the row for this channel to our analog channels list
+        analog_channels_out_list.append(row_list)
+
+        # Need to ensure max channel count isn't reached
+        total_channel_cnt += 1
+        if total_channel_cnt > 2000:
+            print("   ERROR:  Maximum channel count (2000) exceeded.")
+            print("Aborting...")
+            sys.exit(-1)
+
+    # create the analog channels data frame
+    analog_channels_out_df = pandas.DataFrame(analog_channels_out_list,
+                                              columns=analog_header_row)
+
+    # setup digital channels dataframe
+    digital_channels_out_list = []
+    cnt = 1
+    for ch_name in sorted(channels_dict.keys()):
+        ch_type = channels_dict[ch_name]['Ch Type']
+
+        # skip analog channels
+        if ch_type != 'Digital':
+            continue
+
+        # get channel attributes dictionary
+        attr_dict = channels_dict[ch_name]
+
+        # now fill out this row in correct order for cs800d
+        row_list = []
+        row_list.append(str(cnt))
+        cnt = cnt + 1
+        row_list.append(ch_name)            # Channel Alias
+        row_list.append("0")                # Digital ID
+        row_list.append(attr_dict['Color Code'])    # Color Code
+        if str(attr_dict['Time Slot']) == '1':      # Time Slot
+            row_list.append("Slot 1")
+        else:
+            row_list.append("Slot 2")
+        row_list.append("None")             # Scan List
+        row_list.append("Off")              # Auto Scan Start
+        row_list.append(attr_dict['RX Only'])       # Rx Only
+        row_list.append("Off")              # Talk around
+        row_list.append("Off")              # Lone Worker
+        row_list.append("Off")              # VOX
+        row_list.append(hz_to_mhz(attr_dict['RX Freq']))  # Receive Frequency
+
+        # compute RX Ref Frequency
+        if attr_dict['RX Freq'] > 180000000:
+            row_list.append("Middle")   # RX Ref Frequency (VHF/2 meters)
+        else:
+            row_list.append("Middle")   # RX Ref Frequency (UHF/70cm )
+
+        row_list.append("None")             # RX Receive Group
+        row_list.append("Off")              # Emergency Alarm Indication
+        row_list.append("Off")              # Emergency Alarm Ack
+        row_list.append("Off")              # Emergency Call Indication
+        row_list.append(hz_to_mhz(attr_dict['TX Freq']))  # Transmit Frequency
+
+        # compute TX Ref Frequency
+        if attr_dict['TX Freq'] > 180000000:
+            row_list.append("Middle")   # TX Ref Frequency (VHF/2 meters)
+        else:
+            row_list.append("Middle")   # TX Ref Frequency (UHF/70cm )
+
+        # Contact name as written to the cs800d talk groups file
+        talk_group_str = target_names(attr_dict['Talk Group'], 'cs800d')
+        row_list.append(talk_group_str)  # TX Contact
+        row_list.append("None")             # Emergency System
+
+        # Power level
+        power_level = attr_dict['Power']
+        if power_level in ['Turbo','High']:
+            row_list.append("High")
+        else:
+            row_list.append(power_level)
+
+        # TX Admit (admit criteria)
+        dict_admit_criteria = attr_dict['TX Permit']
+        admit_criteria = "ERROR!"  # just in case...
+        if dict_admit_criteria == "Always":
+            admit_criteria = "Always"
+        elif dict_admit_criteria in ['ChannelFree','Different Color Code']:
+            admit_criteria = "Channel Idle"
+        elif dict_admit_criteria == "Same Color Code":
+            admit_criteria = "Color Code Free"
+        row_list.append(admit_criteria)     # TX Admit
+
+        row_list.append("180")              # TX Time-out Time[s]
+        row_list.append("0")                # TOT Re-key Time[s]
+        row_list.append("10")               # TOT Pre-Alert Time[s]
+        row_list.append("Off")              # Private Call Confirmed
+        row_list.append("Off")              # Data Call Confirmed
+        row_list.append("Off")              # Encrypt
+
+        # now add the row for this channel to our digital channels list
+        digital_channels_out_list.append(row_list)
+
+        # Need to ensure max channel count isn't reached
+        total_channel_cnt += 1
+        if total_channel_cnt > 2000:
+            print("   ERROR:  Maximum channel count (2000) exceeded.")
+            print("Aborting...")
+            sys.exit(-1)
+
+    # create the digital channels data frame
+    digital_channels_out_df = pandas.DataFrame(digital_channels_out_list,
+                                               columns=digital_header_row)
+
+    # Create a Pandas Excel writer using XlsxWriter as the engine.
+    if debug:
+        print("Writing output to: ", channels_export_file)
+    writer = pandas.ExcelWriter(channels_export_file, engine='xlsxwriter',
+        engine_kwargs={'options': {'in_memory': True}})
+    analog_channels_out_df.to_excel(writer,
+        sheet_name="Analog Channel", index=False)
+    digital_channels_out_df.to_excel(writer,
+        sheet_name="Digital Channel", index=False)
+
+    writer.close()
+
+    return
+
+
+
+def cs800d_write_talk_groups_export(talk_groups_dict,talk_groups_export_file,
+        target_names=None, debug=False):
+    """This function writes out a Connect Systems CS800D formatted talk groups import file."""
+
+    if target_names is None:
+        target_names = target_name
+
+    # Create a dataframe from the talk groups dict and output it...
+    header_row = ['No','Call Alias','Call Type','Call ID','Receive Tone']
+    talk_groups_out_list = []
+    cnt = 1
+    for tg_id in sorted(talk_groups_dict.keys()):
+        row_list = []
+        #row_list.append(str(cnt))
+        row_list.append(cnt)
+        cnt = cnt + 1
+        tg_name = target_names(talk_groups_dict[tg_id][0], 'cs800d')
+        row_list.append(tg_name)
+        tg_call_type = talk_groups_dict[tg_id][1]
+        row_list.append(tg_call_type)
+        row_list.append(tg_id)
+        tg_call_alert = talk_groups_dict[tg_id][2]
+        if tg_call_alert == "None":
+            tg_call_alert = "No"
+        else:
+            tg_call_alert = "Yes"
+        row_list.append(tg_call_alert)
+        talk_groups_out_list.append(row_list)
+    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list, columns=header_row)
+
+    if debug:
+        print("Writing output to: ", talk_groups_export_file)
+
+    # Create a Pandas Excel writer using XlsxWriter as the engine.
+    writer = pandas.ExcelWriter(talk_groups_export_file,
+        engine='xlsxwriter', engine_kwargs={'options': {'in_memory': True}})
+    talk_groups_out_df.to_excel(writer, sheet_name="DMR_Contacts", index=False)
+    writer.close()
+
+    return
+
+
+
+def write_import_files(target, build_dict, file_name_dict, open_output,
+        debug=False):
+    """This function writes the CS800D talk groups and channels files."""
+
+    # Write out a CS800D talk groups import file
+    print("   Talk group import file: {}".format(
+        file_name_dict['talk groups']))
+    with open_output(file_name_dict['talk groups']) as output_file:
+        cs800d_write_talk_groups_export(build_dict['talk groups'],
+            output_file, target_names=build_dict['target names'],
+            debug=debug)
+
+    # Write out a CS800D channel import file
+    print("   Channels import file: {}".format(file_name_dict['channels']))
+    with open_output(file_name_dict['channels']) as output_file:
+        cs800d_write_channels_export(build_dict['channels'], output_file,
+            target_names=build_dict['target names'],
+            debug=debug)
+
+    return None
@@ -0,0 +1,41 @@
+# coding: utf-8
+#
+# Open GD77 CPS import files.
+#
+
+
+
+def opengd77_write_talk_groups_export(talk_groups_dict,talk_groups_export_file,
+        debug=False):
+    """This function writes out an Open GD77 formatted talk groups import file."""
+
+    return
+
+
+
+def opengd77_write_channels_export(channels_dict, channels_export_file,
+        debug=False):
+    """This function writes out an Open GD77 CPS formatted channels file"""
+
+    return
+
+
+
+def write_import_files(target, build_dict, file_name_dict, open_output,
+        debug=False):
+    """This function writes the Open GD77 talk groups and channels files."""
+
+    # Write out an opengd77 talk groups import file
+    print("   Talk group import file: {}".format(
+        file_name_dict['talk groups']))
+    with open_output(file_name_dict['talk groups']) as output_file:
+        opengd77_write_talk_groups_export(build_dict['talk groups'],
+            output_file, debug=debug)
+
+    # Write out an opengd77 channel import file
+    print("   Channels import file: {}".format(file_name_dict['channels']))
+    with open_output(file_name_dict['channels']) as output_file:
+        opengd77_write_channels_export(build_dict['channels'], output_file,
+            debug=debug)
+
+    return None
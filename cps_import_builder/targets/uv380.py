@@ -0,0 +1,371 @@
+# coding: utf-8
+#
+# Tytera MD-UV380/MD-UV390 import files (talk groups, channels and
+# receive group lists).
+#
+
+
+import pandas
+import csv
+import sys
+
+from cps_import_builder.common import hz_to_mhz, target_name
+
+
+# most contacts a Tytera receive group list holds
+uv380_rx_group_max_members = 32
+
+
+def uv380_write_talk_groups_export(talk_groups_dict,talk_groups_export_file,
+        tytera_tg_index_dict, target_names=None, debug=False):
+    """This function writes out a Tytera uv380 CPS formatted talk groups import file."""
+
+    if target_names is None:
+        target_names = target_name
+
+    # Prepare a dataframe from the talk groups dict
+    header_row = ['Contact Name','Call Type','Call ID','Call Receive Tone']
+    talk_groups_out_list = []
+    cnt = 1
+    for tg_id in sorted(talk_groups_dict.keys()):
+        row_list = []
+
+        # Contact Name
+        tg_name = target_names(talk_groups_dict[tg_id][0], 'uv380')
+        row_list.append(tg_name)
+
+        # Call Type
+        tytera_call_type_dict = {'Group Call':'1','Private Call':'2'}
+        tg_call_type = talk_groups_dict[tg_id][1]
+        if tg_call_type not in tytera_call_type_dict.keys():
+            print("ERROR:  Can't convert '{}' to Tytera call type!".format(
+                tg_call_type))
+            print("        Aborting.")
+            sys.exit(-1)
+        row_list.append(tytera_call_type_dict[tg_call_type])
+
+        # Call ID
+        row_list.append(tg_id)
+
+        # Call Receive Tone
+        tytera_call_alert_dict = {'None':'0','Yes':'1'}
+        tg_call_alert = talk_groups_dict[tg_id][2]
+        if tg_call_alert not in tytera_call_alert_dict.keys():
+            print("ERROR:  Can't convert '{}' to Tytera call alert!".format(
+                tg_call_alert))
+            print("        Aborting.")
+            sys.exit(-1)
+        row_list.append(tytera_call_alert_dict[tg_call_alert])
+
+        # append the row to our list
+        talk_groups_out_list.append(row_list)
+
+        # Update tytera_tg_index_dict so we can translate in channels file
+        tytera_tg_index_dict.update({tg_name:cnt})
+        cnt = cnt + 1
+
+    # Create the data frame
+    talk_groups_out_df = pandas.DataFrame(talk_groups_out_list,
+        columns=header_row)
+
+    # Output the data frame as CSV file
+    if debug:
+        print("Writing output to: ", talk_groups_export_file)
+    talk_groups_out_df.to_csv(talk_groups_export_file, index=False,
+            header=True, quoting=csv.QUOTE_NONE, line_terminator='\r\n')
+
+    # clean up...
+    del talk_groups_out_list
+    del talk_groups_out_df
+
+    return
+
+
+
+def uv380_write_rx_groups_export(rx_groups_dict, rx_groups_export_file,
+        talk_groups_dict, tytera_tg_index_dict, tytera_rx_group_index_dict,
+        target_names=None, debug=False):
+    """This function writes out a Tytera uv380 receive group lists file."""
+
+    if target_names is None:
+        target_names = target_name
+
+    # members are contact indexes, as in the channels file
+    header_row = ['Group List Name','Contact Member']
+    rx_groups_out_list = []
+    cnt = 1
+    for group_name, tg_number_list in rx_groups_dict.items():
+        if len(tg_number_list) > uv380_rx_group_max_members:
+            print("   Warning:  receive group '{}' has {} talk groups, keeping the first {}.".format(
+                group_name, len(tg_number_list), uv380_rx_group_max_members))
+            tg_number_list = tg_number_list[:uv380_rx_group_max_members]
+        member_list = []
+        for tg_number in tg_number_list:
+            tg_name = target_names(talk_groups_dict[tg_number][0], 'uv380')
+            member_list.append(str(tytera_tg_index_dict[tg_name]))
+        rx_groups_out_list.append([group_name, '|'.join(member_list)])
+
+        # Update tytera_rx_group_index_dict so we can translate in channels file
+        tytera_rx_group_index_dict.update({group_name:cnt})
+        cnt = cnt + 1
+
+    rx_groups_out_df = pandas.DataFrame(rx_groups_out_list,
+        columns=header_row)
+
+    # Output the data frame as CSV file
+    if debug:
+        print("Writing output to: ", rx_groups_export_file)
+    rx_groups_out_df.to_csv(rx_groups_export_file, index=False,
+            header=True, quoting=csv.QUOTE_NONE, line_terminator='\r\n')
+
+    # clean up...
+    del rx_groups_out_list
+    del rx_groups_out_df
+
+    return
+
+
+
+def uv380_write_channels_export(channels_dict, channels_export_file,
+        tytera_tg_index_dict, channel_numbers_dict=None,
+        rx_group_by_channel_dict=None, tytera_rx_group_index_dict=None,
+        target_names=None, debug=False):
+    """This function writes out a Tytera uv380 CPS formatted channels file"""
+
+    if target_names is None:
+        target_names = target_name
+
+    header_row = ['Channel Mode','Channel Name','RX Frequency(MHz)',
+                  'TX Frequency(MHz)','Band Width','Scan List','Squelch',
+                  'RX Ref Frequency','TX Ref Frequency','TOT[s]',
+                  'TOT Rekey Delay[s]','Power','Admit Criteria',
+                  'Auto Scan','Rx Only','Lone Worker','VOX',
+                  'Allow Talkaround','Send GPS Info','Receive GPS Info',
+                  'Private Call Confirmed','Emergency Alarm Ack',
+                  'Data Call Confirmed','Allow Interrupt','DCDM Switch',
+                  'Leader/MS','Emergency System','Contact Name',
+                  'Group List','Color Code','Repeater Slot',
+                  'In Call Criteria','Privacy','Privacy No.',
+                  'GPS System','CTCSS/DCS Dec','CTCSS/DCS Enc',
+                  'Rx Signaling System','Tx Signaling System',
+                  'QT Reverse','Non-QT/DQT Turn-off Freq',
+                  'Display PTT ID','Reverse Burst/Turn-off Code',
+                  'Decode 1','Decode 2','Decode 3','Decode 4',
+                  'Decode 5','Decode 6','Decode 7','Decode 8'
+                 ]
+
+    # Create a dataframe from the channels dict and output it...
+    channels_out_list = []
+    cnt = 1
+    for ch_name in channels_dict.keys():
+
+        # get channel attributes dictionary
+        attr_dict = channels_dict[ch_name]
+
+        # now fill out this row in correct order for Tytera uv380
+        row_list = []
+        ch_type = attr_dict['Ch Type']
+        if ch_type == "Analog":
+            row_list.append('1')                # Channel Mode
+        else:
+            row_list.append('2')                # Channel Mode
+        row_list.append(ch_name)                # Channel Name
+        row_list.append(hz_to_mhz(attr_dict['RX Freq']))  # RX Frequency(MHz)
+        row_list.append(hz_to_mhz(attr_dict['TX Freq']))  # TX Frequency(MHz)
+
+        # translate bandwidth to Tytera 0 (12.5K), 1 (20), or 2 (25K)
+        if ch_type == "Analog":
+            tytera_bandwidth_dict = {'12.5K':'0', '20K':'1', '25K':'2'}
+            bandwidth = attr_dict['Bandwidth']
+            if bandwidth not in tytera_bandwidth_dict.keys():
+                print("ERROR:  Can't convert '{}' to Tytera bandwidth!".format(
+                    bandwidth))
+                print("        Aborting.")
+                sys.exit(-1)
+            row_list.append(tytera_bandwidth_dict[bandwidth])
+        else:
+            row_list.append('0')
+
+
+        row_list.append('0')                # Scan List
+        row_list.append('1')                # Squelch
+        row_list.append('0')                # RX Ref Frequency
+        row_list.append('0')                # TX Ref Frequency
+        row_list.append('8')                # TOT[s] (index 8 = 120s)
+        row_list.append('0')                # TOT Rekey Delay[s]
+
+        # translate power to Tytera 0 (Low), 1 (Middle), or 2 (High)
+        tytera_power_dict = {'Low':'0', 'Medium':'1',
+                             'High':'2', 'Turbo':'2' }
+        power = attr_dict['Power']
+        if power not in tytera_power_dict.keys():
+            print("ERROR:  Can't convert '{}' to Tytera power!".format(
+                power))
+            print("        Aborting.")
+            sys.exit(-1)
+        row_list.append(tytera_power_dict[power]) # Power
+
+        # Admit Criteria
+        if ch_type == 'Analog':
+            row_list.append('0')
+        else:
+            # translate Admit Criteria to Tytera 0 (Always), 3 (Color Code)
+            tytera_admit_criteria_dict = {'Always':'0', 'Same Color Code':'3'}
+            admit_criteria = attr_dict['TX Permit']
+            if admit_criteria not in tytera_admit_criteria_dict.keys():
+                print("ERROR:  Can't convert '{}' to Tytera admit criteria!".format(
+                    admit_criteria))
+                print("        Aborting.")
+                sys.exit(-1)
+            row_list.append(tytera_admit_criteria_dict[admit_criteria])
+
+        row_list.append('0')                # Auto Scan
+        if attr_dict['RX Only'] == "On":
+            row_list.append('1')            # Rx Only
+        else:
+            row_list.append('0')            # Rx Only
+        row_list.append('0')                # Lone Worker
+        row_list.append('0')                # VOX
+        row_list.append('0')                # Allow Talkaround
+        row_list.append('0')                # Send GPS
+        row_list.append('0')                # Receive GPS Info
+        row_list.append('0')                # Private Call Confirmed
+        row_list.append('0')                # Emergency Alarm Ack
+        row_list.append('0')                # Data Call Confirmed
+        row_list.append('0')                # Allow Interrupt
+        row_list.append('0')                # DCDM Switch
+        row_list.append('1')                # Leader/MS
+        row_list.append('0')                # Emergency System
+
+        # Contact Name
+        if ch_type == 'Analog':
+            row_list.append('0')
+        else:
+            talk_group_str = target_names(attr_dict['Talk Group'], 'uv380')
+            if talk_group_str not in tytera_tg_index_dict.keys():
+                print("ERROR:  Can't convert '{}' to Tytera TG Index!".format(
+                    talk_group_str))
+                print("        Aborting.")
+                sys.exit(-1)
+            row_list.append(tytera_tg_index_dict[talk_group_str])
+
+        if (rx_group_by_channel_dict is not None and
+                ch_name in rx_group_by_channel_dict):
+            row_list.append(str(tytera_rx_group_index_dict[
+                rx_group_by_channel_dict[ch_name]]))    # Group List
+        else:
+            row_list.append('0')                # Group List
+
+        # Color Code
+        if ch_type == 'Analog':
+            row_list.append('1')
+        else:
+            row_list.append(attr_dict['Color Code'])
+
+        # Repeater Slot
+        if ch_type == 'Analog':
+            row_list.append('0')
+        else:
+            # translate Repeater Slot to Tytera 0 (Slot 1), 1 (Slot 2)
+            tytera_time_slot_dict = {'1':'0', '2':'1'}
+            time_slot = str(attr_dict['Time Slot'])
+            if time_slot not in tytera_time_slot_dict.keys():
+                print("ERROR:  Can't convert '{}' to Tytera time slot!".format(
+                    time_slot))
+                print("        Channel name = {}".format(ch_name))
+                print("        Aborting.")
+                sys.exit(-1)
+            row_list.append(tytera_time_slot_dict[time_slot])
+
+        # In Call Criteria
+        if ch_type == 'Analog':
+            row_list.append('0')
+        else:
+            row_list.append('1')    # force "Follow Admit Criteria"
+
+        row_list.append('0')        # Privacy
+        row_list.append('0')        # Privacy No.
+        row_list.append('0')        # GPS System
+        row_list.append(attr_dict['CTCSS Decode'])  # CTCSS/DCS Dec
+        row_list.append(attr_dict['CTCSS Encode'])  # CTCSS/DCS Enc
+        row_list.append('0')        # Rx Signaling System
+        row_list.append('0')        # Tx Signaling System
+        row_list.append('0')        # QT Reverse
+        row_list.append('2')        # Non-QT/DQT Turn-off Freq
+        row_list.append('1')        # Display PTT ID
+        row_list.append('1')        # Reverse Burst/Turn-off Code
+        row_list.append('0')        # Decode 1
+        row_list.append('0')        # Decode 2
+        row_list.append('0')        # Decode 3
+        row_list.append('0')        # Decode 4
+        row_list.append('0')        # Decode 5
+        row_list.append('0')        # Decode 6
+        row_list.append('0')        # Decode 7
+        row_list.append('0')        # Decode 8
+
+        # now add this row to the channels list
+        channels_out_list.append(row_list)
+
+    # Create data frame
+    channels_out_df = pandas.DataFrame(channels_out_list, columns=header_row)
+
+    if channel_numbers_dict is not None:
+        # no "No." column here, so order rows by the persistent numbers
+        channels_out_df['No.'] = [channel_numbers_dict[ch_name] for ch_name
+            in channels_out_df['Channel Name']]
+        channels_out_df.sort_values(by=['No.'], inplace=True)
+        channels_out_df.drop(columns=['No.'], inplace=True)
+    else:
+        # Group channels by Channel Type (analog then digital)
+        channels_out_df.sort_values(by=['Channel Mode','Channel Name'],
+            inplace=True)
+    channels_out_df.reset_index(drop=True, inplace=True)
+
+    # Write CSV file
+    if debug:
+        print("Writing output to: {}".format(channels_export_file))
+    channels_out_df.to_csv(channels_export_file, index=False,
+        header=True, quoting=csv.QUOTE_NONE, line_terminator='\r\n')
+
+    return
+
+
+
+def write_import_files(target, build_dict, file_name_dict, open_output,
+        debug=False):
+    """This function writes the MD-UV380 talk groups and channels files."""
+
+    # Write out an MD-UV380 talk groups import file
+    tytera_tg_index_dict = {}
+    print("   Talk group import file: {}".format(
+        file_name_dict['talk groups']))
+    with open_output(file_name_dict['talk groups']) as output_file:
+        uv380_write_talk_groups_export(build_dict['talk groups'],
+            output_file, tytera_tg_index_dict,
+            target_names=build_dict['target names'], debug=debug)
+
+    # Write out an MD-UV380 receive group lists import file
+    rx_group_by_channel_dict = None
+    tytera_rx_group_index_dict = {}
+    if build_dict['rx groups'] is not None:
+        rx_group_by_channel_dict = build_dict['rx groups']['channels']
+        print("   Receive groups import file: {}".format(
+            file_name_dict['rx groups']))
+        with open_output(file_name_dict['rx groups']) as output_file:
+            uv380_write_rx_groups_export(build_dict['rx groups']['groups'],
+                output_file, build_dict['talk groups'], tytera_tg_index_dict,
+                tytera_rx_group_index_dict,
+                target_names=build_dict['target names'], debug=debug)
+
+    # Write out an MD-UV380 channel import file
+    print("   Channels import file: {}".format(file_name_dict['channels']))
+    with open_output(file_name_dict['channels']) as output_file:
+        uv380_write_channels_export(build_dict['channels'], output_file,
+            tytera_tg_index_dict,
+            channel_numbers_dict=build_dict['channel numbers'],
+            rx_group_by_channel_dict=rx_group_by_channel_dict,
+            tytera_rx_group_index_dict=tytera_rx_group_index_dict,
+            target_names=build_dict['target names'],
+            debug=debug)
+
+    return None
@@ -0,0 +1,151 @@
+# coding: utf-8
+#
+# Bulk validation of a loaded codeplug.  Every channel is checked for what
+# any radio needs in one vectorized pass, then against the values each
+# selected CPS target's writer can convert, so a library with many mistakes
+# is reported in a single run instead of failing on the first bad record
+# inside a target writer.
+#
+
+
+import os
+import pandas
+
+from cps_import_builder.targets import cps_target_registry
+
+
+# values every DMR radio needs, whatever the target
+valid_time_slot_list = ['1', '2']
+valid_color_code_range = (0, 15)
+
+# an accepted value list longer than this isn't spelled out in a problem
+max_listed_values = 8
+
+# frequencies outside this range (integer Hz) can't be a radio channel
+valid_freq_range_hz = (26000000, 1300000000)
+
+
+
+def validate_channels(channels_dict, sources_dict=None):
+    """This function checks every channel's attributes in bulk.
+
+    Only what holds for any radio is checked here: the channel type,
+    frequencies, and a digital channel's color code and time slot.  The
+    tones, power, bandwidth, call type and TX permit a CPS accepts differ,
+    so those are left to validate_targets().  Returns a list of
+    (source, message) problems, where source is the (file name, line) that
+    defined the channel or None if unknown.
+    """
+
+    if len(channels_dict) == 0:
+        return []
+
+    # object columns keep integer slots from turning into floats ('2.0')
+    # when no channel has a string slot
+    column_list = ['Ch Type', 'RX Freq', 'TX Freq', 'Color Code',
+        'Time Slot']
+    channels_df = pandas.DataFrame(dict((column, [attr_dict.get(column)
+        for attr_dict in channels_dict.values()]) for column in column_list),
+        index=list(channels_dict.keys()), dtype=object)
+    analog_mask = channels_df['Ch Type'] == 'Analog'
+    digital_mask = channels_df['Ch Type'] == 'Digital'
+    all_mask = pandas.Series(True, index=channels_df.index)
+
+    # each check is (column, mask of rows it applies to, mask of bad rows)
+    check_list = []
+    check_list.append(('Ch Type', all_mask,
+        ~(analog_mask | digital_mask)))
+    for column in ['RX Freq', 'TX Freq']:
+        freq_series = pandas.to_numeric(channels_df[column], errors='coerce')
+        check_list.append((column, all_mask,
+            ~freq_series.between(*valid_freq_range_hz)))
+    color_code_series = pandas.to_numeric(channels_df['Color Code'],
+        errors='coerce')
+    check_list.append(('Color Code', digital_mask,
+        ~(color_code_series.between(*valid_color_code_range) &
+          (color_code_series % 1 == 0))))
+    check_list.append(('Time Slot', digital_mask,
+        ~channels_df['Time Slot'].astype(str).isin(valid_time_slot_list)))
+
+    problems_list = []
+    for column, applies_mask, bad_mask in check_list:
+        for ch_name in channels_df.index[applies_mask & bad_mask]:
+            source = None
+            if sources_dict is not None:
+                source = sources_dict.get(('Channel', ch_name))
+            problems_list.append((source,
+                "Invalid {} '{}' for channel '{}'".format(column,
+                channels_dict[ch_name].get(column), ch_name)))
+
+    return problems_list
+
+
+
+def validate_targets(channels_dict, target_list, sources_dict=None):
+    """This function checks the channels against each target's own limits.
+
+    Each target's registry entry lists the analog and digital channel
+    values its writer can convert (e.g. the uv380 has no ChannelFree TX
+    Permit, the cs800d no inverted DCS codes) and its channel limit.
+    Returns a list of (source, message) problems, like validate_channels().
+    """
+
+    problems_list = []
+    for target in target_list:
+        target_dict = cps_target_registry[target]
+        for ch_type, values_dict in [('Analog', target_dict['analog values']),
+                ('Digital', target_dict['digital values'])]:
+            for column, value_list in values_dict.items():
+                value_set = set(value_list)
+                if len(value_list) > max_listed_values:
+                    accepts = "{} doesn't accept it".format(target)
+                else:
+                    accepts = "{} accepts {}".format(target, ', '.join(
+                        ["'{}'".format(value) for value in value_list]))
+                for ch_name, attr_dict in channels_dict.items():
+                    if attr_dict.get('Ch Type') != ch_type or \
+                            str(attr_dict.get(column)) in value_set:
+                        continue
+                    source = None
+                    if sources_dict is not None:
+                        source = sources_dict.get(('Channel', ch_name))
+                    problems_list.append((source,
+                        "Invalid {} '{}' for channel '{}' ({})".format(
+                        column, attr_dict.get(column), ch_name, accepts)))
+        max_channels = target_dict['max channels']
+        if max_channels is not None and len(channels_dict) > max_channels:
+            problems_list.append((None,
+                "{} channels exceed the {} maximum of {}".format(
+                len(channels_dict), target, max_channels)))
+
+    return problems_list
+
+
+
+def format_problem_source(source):
+    """This function formats a problem's (file name, line) as 'file:line'."""
+
+    if source is None:
+        return "(unknown)"
+
+    return "{}:{}".format(os.path.basename(source[0]), source[1])
+
+
+
+def sort_problems(problems_list):
+    """This function orders problems by file and line, unknown ones last."""
+
+    return sorted(problems_list, key=lambda problem: (problem[0] is None,
+        problem[0] or ('', 0)))
+
+
+
+def print_problems(problems_list):
+    """This function prints every problem with its file and line."""
+
+    print("ERROR:  {} problem(s) found in the input files:".format(
+        len(problems_list)))
+    for source, message in sort_problems(problems_list):
+        print("   {}: {}".format(format_problem_source(source), message))
+
+    return
@@ -0,0 +1,11 @@
+# coding: utf-8
+#
+# Lets the tests import cps_import_builder from the repository root.
+#
+
+
+import os
+import sys
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,178 @@
+# coding: utf-8
+#
+# A DMR user database is streamed through the filters and cleaned up
+# for the radio, one contact per radio ID, up to the radio's limit.
+#
+
+
+import csv
+import os
+
+import pytest
+
+from cps_import_builder.contacts import (ContactFilter,
+    iter_user_db_contacts, sanitize_contact_text)
+from cps_import_builder.targets import anytone
+
+
+def write_user_db(user_db_dir, text):
+    """Writes a user database and returns its file name."""
+
+    user_db_file = os.path.join(user_db_dir, 'user.csv')
+    with open(user_db_file, 'w', encoding='utf-8', newline='') as fd:
+        fd.write(text)
+
+    return user_db_file
+
+
+
+def test_header_aliases(tmp_path):
+    """Columns are found by alias in any order, first and last names are
+    joined and missing optional columns read as blank."""
+
+    user_db_file = write_user_db(str(tmp_path),
+        "Country,First_Name,DMR-ID,Surname,CALL,Province\n"
+        "Canada,Jean,3021001,Tremblay,ve2abc,Quebec\n"
+        "Canada,Ann,3021002,,VE3XYZ\n")
+    stats_dict = {}
+    contact_list = list(iter_user_db_contacts(user_db_file,
+        stats_dict=stats_dict))
+
+    assert contact_list == [
+        (3021001, 'VE2ABC', 'Jean Tremblay', '', 'Quebec', 'Canada', ''),
+        (3021002, 'VE3XYZ', 'Ann', '', '', 'Canada', '')]
+    assert stats_dict == {'read': 2, 'filtered': 0, 'invalid': 0,
+                          'duplicate': 0}
+
+
+
+def test_headerless_and_bad_header(tmp_path):
+    """A file starting with a radio ID uses the RadioID.net column order;
+    a header without a radio ID column is refused."""
+
+    user_db_file = write_user_db(str(tmp_path),
+        "3106001,K7ABC,Bob,Seattle,Washington,United States,x\n")
+    assert list(iter_user_db_contacts(user_db_file)) == [
+        (3106001, 'K7ABC', 'Bob', 'Seattle', 'Washington', 'United States',
+         'x')]
+
+    user_db_file = write_user_db(str(tmp_path), "Callsign,Name\nK7ABC,Bob\n")
+    with pytest.raises(ValueError, match="no 'Radio ID' column"):
+        list(iter_user_db_contacts(user_db_file))
+
+
+
+def test_invalid_and_duplicate_ids(tmp_path):
+    """Bad IDs, IDs past 24 bits, blank callsigns and repeats of an ID
+    (including the IDs at either end of the bitmap) are skipped."""
+
+    user_db_file = write_user_db(str(tmp_path),
+        "Radio ID,Callsign\n"
+        "1,AA1A\n"
+        "16777215,AA1B\n"
+        "16777216,AA1C\n"
+        "0,AA1D\n"
+        "abc,AA1E\n"
+        "3106001,\n"
+        "3106001,K7ABC\n"
+        "3106002,K7ABD\n"
+        "3106001,K7XYZ\n"
+        "1,AA1F\n"
+        "16777215,AA1G\n")
+    stats_dict = {}
+    id_list = [contact[0] for contact in iter_user_db_contacts(user_db_file,
+        stats_dict=stats_dict)]
+
+    assert id_list == [1, 16777215, 3106001, 3106002]
+    assert stats_dict == {'read': 11, 'filtered': 0, 'invalid': 4,
+                          'duplicate': 3}
+
+
+
+def test_filters(tmp_path):
+    """Each filter given must match; countries and regions ignore case
+    and prefixes match the start of the callsign."""
+
+    user_db_file = write_user_db(str(tmp_path),
+        "Radio ID,Callsign,State,Country\n"
+        "3106001,K7ABC,Washington,United States\n"
+        "3106002,W7ABC,Oregon,United States\n"
+        "3106003,n7abc,washington,united states\n"
+        "3021001,VE7ABC,British Columbia,Canada\n"
+        "2341001,G4ABC,England,United Kingdom\n")
+
+    def kept_ids(contact_filter):
+        return [contact[0] for contact in iter_user_db_contacts(user_db_file,
+            contact_filter=contact_filter)]
+
+    assert kept_ids(ContactFilter(country_list=['UNITED STATES',
+        ' canada'])) == [3106001, 3106002, 3106003, 3021001]
+    assert kept_ids(ContactFilter(region_list=['Washington'])) == \
+        [3106001, 3106003]
+    assert kept_ids(ContactFilter(prefix_list=['k', 'VE'])) == \
+        [3106001, 3021001]
+    assert kept_ids(ContactFilter(country_list=['United States'],
+        region_list=['Washington'], prefix_list=['N'])) == [3106003]
+
+    # filtered rows don't claim their radio ID
+    stats_dict = {}
+    list(iter_user_db_contacts(user_db_file,
+        contact_filter=ContactFilter(prefix_list=['G']),
+        stats_dict=stats_dict))
+    assert stats_dict['filtered'] == 4
+
+
+
+def test_sanitize_contact_text():
+    assert sanitize_contact_text('  José  Müller ') == 'Jose Muller'
+    assert sanitize_contact_text('Bo "Bob"\tSmith') == "Bo 'Bob' Smith"
+    assert sanitize_contact_text('Tab\x00\x7f\x9bName') == 'TabName'
+    assert sanitize_contact_text('北京 Beijing') == 'Beijing'
+    assert sanitize_contact_text('A very long name indeed') == \
+        'A very long name'
+    assert sanitize_contact_text('Fifteen chars  x') == 'Fifteen chars x'
+    assert sanitize_contact_text('Sixteen chars xx') == 'Sixteen chars xx'
+
+
+
+def test_sanitized_contact_fields(tmp_path):
+    user_db_file = write_user_db(str(tmp_path),
+        "Radio ID,Callsign,Name,City\n"
+        '3106001,"k7 abc","Zoë ""Z""","São  Paulo\tCentro District"\n')
+    assert list(iter_user_db_contacts(user_db_file)) == [
+        (3106001, 'K7ABC', "Zoe 'Z'", 'Sao Paulo Centro', '', '', '')]
+
+
+
+def test_contacts_export_stops_at_model_limit(tmp_path, monkeypatch):
+    """The export holds at most the model's contact limit, numbered from
+    1, and reports how many rows it read and wrote."""
+
+    monkeypatch.setitem(anytone.anytone_digital_contact_max, '878', 2)
+    user_db_file = write_user_db(str(tmp_path),
+        "Radio ID,Callsign,Name\n"
+        "3106001,K7ABC,Bob\n"
+        "3106001,K7ABC,Bob\n"
+        "3106002,K7ABD,Ann\n"
+        "3106003,K7ABE,Sue\n"
+        "3106004,K7ABF,Tom\n")
+    export_file = os.path.join(str(tmp_path), 'contacts.csv')
+    stats_dict = anytone.anytone_write_digital_contacts_export(user_db_file,
+        export_file, '878')
+
+    with open(export_file, 'r', newline='') as fd:
+        row_list = list(csv.reader(fd))
+    assert row_list[0][:3] == ['No.', 'Radio ID', 'Callsign']
+    assert [row[:4] for row in row_list[1:]] == [
+        ['1', '3106001', 'K7ABC', 'Bob'], ['2', '3106002', 'K7ABD', 'Ann']]
+    assert row_list[1][8:] == ['Private Call', 'None']
+    assert stats_dict['written'] == 2
+    assert stats_dict['duplicate'] == 1
+    # reading stops at the first contact past the limit
+    assert stats_dict['read'] == 4
+
+    # the 578 holds more
+    stats_dict = anytone.anytone_write_digital_contacts_export(user_db_file,
+        export_file, '578')
+    assert stats_dict['written'] == 4
+    assert stats_dict['read'] == 5
@@ -0,0 +1,136 @@
+# coding: utf-8
+#
+# Bulk repeater dumps are parsed a chunk at a time, so values that
+# straddle a chunk boundary must still parse, and every dump format must
+# make exactly the channels the equivalent Digital-Repeaters__ row does.
+#
+
+
+import io
+import json
+import os
+
+import pytest
+
+from cps_import_builder import dumps
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.dumps import (JsonStreamReader,
+    iter_json_dump_records, iter_repeater_dump_rows)
+
+
+record_list = [
+    {'Zone Name': 'Ariel VHF;ARA', 'Power': 'High', 'RX Freq': '147.4125',
+     'TX Freq': '146.4125', 'Color Code': 1,
+     'Talk Groups': {'Local 2': 2, 'Parrot 1': 1}},
+    {'zone': 'Baw Faw', 'prefix': 'BAW', 'power': 'Low',
+     'output': 440.55, 'input': 445.55, 'cc': 12,
+     'tgs': [{'name': 'Local 2', 'slot': 2},
+             {'TalkGroup': 'PNW Rgnl 2', 'TS': '2'}]},
+    ]
+
+talkgroups_text = "Local 2,2\nParrot 1,9998\nPNW Rgnl 2,31771\n"
+repeaters_text = (
+    "Zone Name,Comment,Power,RX Freq,TX Freq,Color Code,Local 2,"
+    "Parrot 1,PNW Rgnl 2\n"
+    "Ariel VHF;ARA,,High,147.4125,146.4125,1,2,1,-\n")
+
+
+
+def test_values_straddle_chunks():
+    """With a few characters per chunk every record, string and number
+    is split across reads and still parses to the same values."""
+
+    text = json.dumps(record_list + [12345.678, "a long string value"])
+    for chunk_chars in [1, 2, 3, 7]:
+        reader = JsonStreamReader(io.StringIO(text), chunk_chars)
+        assert list(reader.iter_array()) == record_list + [12345.678,
+            "a long string value"]
+        # the buffer never holds much more than the value being parsed
+        assert len(reader.buf) < len(text)
+
+
+
+def test_results_envelope():
+    """Records are found under a 'results' key after other keys."""
+
+    text = json.dumps({'count': 2, 'meta': {'page': [1, 2]},
+                       'results': record_list})
+    assert list(iter_json_dump_records(io.StringIO(text), 5)) == record_list
+    assert list(iter_json_dump_records(io.StringIO('{}'))) == []
+    assert list(iter_json_dump_records(io.StringIO(' [ ] '))) == []
+
+
+
+def test_value_length_cap(monkeypatch):
+    """A value longer than the cap is refused instead of buffered."""
+
+    monkeypatch.setattr(dumps, 'repeater_dump_max_value_chars', 64)
+    text = '[{"Zone Name": "' + 'x' * 200 + '"}]'
+    reader = JsonStreamReader(io.StringIO(text), 16)
+    with pytest.raises(ValueError, match='too long or malformed'):
+        list(reader.iter_array())
+
+
+
+def test_truncated_dump_keeps_earlier_records(tmp_path):
+    """A dump cut off part way reports a problem and keeps the records
+    read before the break."""
+
+    dump_file = os.path.join(str(tmp_path), 'cut.json')
+    text = json.dumps(record_list)
+    with open(dump_file, 'w') as fd:
+        fd.write(text[:text.index('"zone"') + 10])
+
+    problems_list = []
+    row_list = list(iter_repeater_dump_rows(dump_file, [],
+        problems_list=problems_list))
+    assert [row['Zone Name'] for line, row, tg_list in row_list] == \
+        ['Ariel VHF;ARA']
+    assert len(problems_list) == 1
+    (source, message), = problems_list
+    assert source == ('cut.json', 2)
+    assert message.startswith("Unreadable repeater dump 'cut.json'")
+
+
+
+def load_library(library_dir, file_name, text):
+    """Returns a Codeplug of the test talk groups and one repeater file or
+    dump."""
+
+    talkgroups_file = os.path.join(library_dir, 'Talkgroups__Test.csv')
+    with open(talkgroups_file, 'w') as fd:
+        fd.write(talkgroups_text)
+    data_file = os.path.join(library_dir, file_name)
+    with open(data_file, 'w') as fd:
+        fd.write(text)
+
+    codeplug = Codeplug(rx_groups=True)
+    codeplug.add_talkgroups_file(talkgroups_file)
+    if file_name.startswith('Digital-Repeaters__'):
+        codeplug.add_digital_repeaters_file(data_file)
+    else:
+        codeplug.add_repeater_dump(data_file)
+    assert codeplug.problems_list == []
+
+    return codeplug
+
+
+
+@pytest.mark.parametrize('file_name,text', [
+    ('dump.jsonl', json.dumps(record_list[0]) + '\n'),
+    ('dump.json', json.dumps({'results': record_list[:1]})),
+    ('dump.csv', repeaters_text),
+    ])
+def test_dump_matches_repeaters_sheet(tmp_path, file_name, text):
+    sheet_dir = tmp_path / 'sheet'
+    dump_dir = tmp_path / 'dump'
+    sheet_dir.mkdir()
+    dump_dir.mkdir()
+    sheet = load_library(str(sheet_dir), 'Digital-Repeaters__Test.csv',
+        repeaters_text)
+    dump = load_library(str(dump_dir), file_name, text)
+
+    assert sorted(dump.channels_dict) == ['ara Local 2', 'ara Parrot 1']
+    assert dump.channels_dict == sheet.channels_dict
+    assert dump.zones_dict == sheet.zones_dict
+    assert dump.repeater_talk_groups_dict == sheet.repeater_talk_groups_dict
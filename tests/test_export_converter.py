@@ -0,0 +1,120 @@
+# coding: utf-8
+#
+# An 878 export built from a Digital-Repeaters__ file folds back into the
+# same repeater rows, and channels the builder wouldn't have made from a
+# repeater row are left flat with the reason why.
+#
+
+
+import functools
+import importlib.util
+import os
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.output import open_output_file
+
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+talkgroups_text = "Local 2,2\nParrot 1,9998\nPNW Rgnl 2,31771\n"
+repeaters_text = (
+    "Zone Name,Comment,Power,RX Freq,TX Freq,Color Code,Local 2,"
+    "Parrot 1,PNW Rgnl 2\n"
+    "Ariel VHF;ara,,High,147.4125,146.4125,1,2,1,-\n"
+    "Baw Faw;baw,,Low,440.55,445.55,12,1,-,2\n")
+# channels that can't come from a repeater row: an uppercase prefix, a
+# channel in two zones, and a repeater channel at a different power
+others_text = (
+    "Zone,Channel Name,Power,RX Freq,TX Freq,Color Code,Talk Group,"
+    "TimeSlot,Call Type,TX Permit\n"
+    "Hotspot,HS Local 2,Low,433.45,433.45,1,Local 2,2,Group Call,"
+    "Same Color Code\n"
+    "Simplex A,smp Local 2,Low,441.0,441.0,1,Local 2,1,Group Call,"
+    "Same Color Code\n"
+    "Simplex B,smp Local 2,Low,441.0,441.0,1,Local 2,1,Group Call,"
+    "Same Color Code\n"
+    "Ariel VHF,ara PNW Rgnl 2,Low,147.4125,146.4125,1,PNW Rgnl 2,2,"
+    "Group Call,Same Color Code\n")
+
+
+
+def load_converter():
+    """Returns cps-export-converter.py as a module."""
+
+    spec = importlib.util.spec_from_file_location('cps_export_converter',
+        os.path.join(repo_dir, 'cps-export-converter.py'))
+    converter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(converter)
+
+    return converter
+
+
+
+def build_878_export(library_dir):
+    """Builds the 878 channels and zones files of the test library and
+    returns their paths."""
+
+    file_list = [('Talkgroups__', 'Talkgroups__Test.csv', talkgroups_text),
+        ('Digital-Repeaters__', 'Digital-Repeaters__Test.csv',
+         repeaters_text),
+        ('Digital-Others__', 'Digital-Others__Test.csv', others_text)]
+    codeplug = Codeplug()
+    for file_type, file_name, text in file_list:
+        with open(os.path.join(library_dir, file_name), 'w') as fd:
+            fd.write(text)
+        codeplug.add_file(file_type, os.path.join(library_dir, file_name))
+    assert codeplug.problems_list == []
+
+    file_name_dict = codeplug.write_files('878', functools.partial(
+        open_output_file, None, library_dir, target='878'))
+
+    return (os.path.join(library_dir, file_name_dict['channels']),
+            os.path.join(library_dir, file_name_dict['zones']))
+
+
+
+def test_878_export_folds_back_to_repeaters(tmp_path):
+    converter = load_converter()
+    channels_export_file, zones_export_file = build_878_export(str(tmp_path))
+    assert converter.anytone_export_model(channels_export_file) == '878'
+
+    channels_dict = {}
+    zones_dict = {}
+    converter.anytone_read_channels_export(channels_dict,
+        channels_export_file, '878')
+    converter.anytone_read_zones_export(zones_dict, zones_export_file)
+    repeater_list, tg_column_list, unfolded_dict = \
+        converter.fold_digital_channels_to_repeaters(channels_dict,
+        zones_dict)
+
+    # the 878 writes High power as Turbo
+    assert repeater_list == [
+        {'Zone Name': 'Ariel VHF;ara', 'Comment': '', 'Power': 'Turbo',
+         'RX Freq': '147.4125', 'TX Freq': '146.4125', 'Color Code': '1',
+         'Slots': {'Local 2': '2', 'Parrot 1': '1'}},
+        {'Zone Name': 'Baw Faw;baw', 'Comment': '', 'Power': 'Low',
+         'RX Freq': '440.55', 'TX Freq': '445.55', 'Color Code': '12',
+         'Slots': {'Local 2': '1', 'PNW Rgnl 2': '2'}}]
+    assert sorted(tg_column_list) == ['Local 2', 'PNW Rgnl 2', 'Parrot 1']
+    assert unfolded_dict == {
+        'HS Local 2': "prefix 'HS' isn't lowercase",
+        'smp Local 2': "member of more than one zone",
+        'ara PNW Rgnl 2': "power differs from repeater"}
+
+    # the folded file builds the same repeater channels and zones again
+    repeaters_file = os.path.join(str(tmp_path),
+        'Digital-Repeaters__Folded.csv')
+    converter.write_k7abd_digital_repeaters_file(repeater_list,
+        tg_column_list, repeaters_file)
+    codeplug = Codeplug()
+    codeplug.add_file('Talkgroups__',
+        os.path.join(str(tmp_path), 'Talkgroups__Test.csv'))
+    codeplug.add_file('Digital-Repeaters__', repeaters_file)
+    assert codeplug.problems_list == []
+    assert codeplug.zones_dict == {
+        'Ariel VHF': ['ara Local 2', 'ara Parrot 1'],
+        'Baw Faw': ['baw Local 2', 'baw PNW Rgnl 2']}
+    for ch_name, attr_dict in codeplug.channels_dict.items():
+        assert attr_dict['Talk Group'] == channels_dict[ch_name]['Talk Group']
+        assert str(attr_dict['Time Slot']) == \
+            channels_dict[ch_name]['Time Slot']
@@ -0,0 +1,47 @@
+# coding: utf-8
+#
+# Splitting zones and scan lists at a radio's limits must never replace
+# or duplicate another list's name.
+#
+
+
+from cps_import_builder.lists import assign_scan_lists, split_zones
+
+
+def test_split_zones_keeps_existing_part_names():
+    """A zone named like one of the generated parts ("Foo 2") is kept and
+    the clashing part is numbered on instead."""
+
+    zones_dict = {'Foo': ['a', 'b', 'c', 'd', 'e'],
+                  'Foo 2': ['x']}
+    split_zones_dict, split_zones_order_list, part_names_dict = split_zones(
+        zones_dict, ['Foo', 'Foo 2'], 2)
+
+    assert split_zones_dict['Foo 2'] == ['x']
+    assert part_names_dict['Foo'] == ['Foo 1', 'Foo 2 2', 'Foo 3']
+    assert split_zones_dict['Foo 1'] == ['a', 'b']
+    assert split_zones_dict['Foo 2 2'] == ['c', 'd']
+    assert split_zones_dict['Foo 3'] == ['e']
+    assert split_zones_order_list == ['Foo 1', 'Foo 2 2', 'Foo 3', 'Foo 2']
+    assert sum(len(member_list) for member_list in
+               split_zones_dict.values()) == 6
+
+
+
+def test_assign_scan_lists_names_are_unique():
+    """Scan list names that are the same once cut to 16 characters are
+    numbered apart, and every channel points at a list that exists."""
+
+    scan_lists_dict = {'Seattle Repeaters North': ['a', 'b'],
+                       'Seattle Repeaters South': ['c'],
+                       'Seattle Repeaters': ['d']}
+    scan_list_out_list, scan_list_by_channel_dict = assign_scan_lists(
+        scan_lists_dict, 2)
+
+    name_list = [list_name for list_name, member_list in scan_list_out_list]
+    assert name_list == ['Seattle Repeater', 'Seattle Repeat 2',
+                         'Seattle Repeat 3']
+    assert max(len(list_name) for list_name in name_list) <= 16
+    assert scan_list_by_channel_dict == {'a': 'Seattle Repeater',
+        'b': 'Seattle Repeater', 'c': 'Seattle Repeat 2',
+        'd': 'Seattle Repeat 3'}
@@ -0,0 +1,65 @@
+# coding: utf-8
+#
+# A parallel load (--jobs) must make exactly the decisions a serial run
+# makes: same channels, zones and talk groups.
+#
+
+
+import os
+
+from cps_import_builder.codeplug import Codeplug
+
+
+def write_library(inputs_dir):
+    """Writes a small K7ABD library, with a numeric-only talk group column
+    that has blank cells (read as floats unless parsed as strings)."""
+
+    with open(os.path.join(inputs_dir, 'Talkgroups__Test.csv'), 'w') as fd:
+        fd.write("PNW Rgnl 2,8951\nTAC 1,8801\nLocal 2,2\n"
+                 "Parrot 1,9998\n")
+    with open(os.path.join(inputs_dir, 'Analog__Test.csv'), 'w') as fd:
+        fd.write("Zone,Channel Name,Bandwidth,Power,RX Freq,TX Freq,"
+                 "CTCSS Decode,CTCSS Encode,TX Prohibit\n"
+                 "Simplex,2m Call,25K,High,146.52,146.52,Off,Off,Off\n"
+                 "Simplex,70cm Call,25K,High,446.0,446.0,Off,Off,Off\n")
+    with open(os.path.join(inputs_dir, 'Digital-Others__Test.csv'),
+            'w') as fd:
+        fd.write("Zone,Channel Name,Power,RX Freq,TX Freq,Color Code,"
+                 "Talk Group,TimeSlot,Call Type,TX Permit\n"
+                 "Hotspot,HS Parrot,Low,433.45,433.45,1,Parrot 1,2,"
+                 "Group Call,Always\n")
+    with open(os.path.join(inputs_dir, 'Digital-Repeaters__Test.csv'),
+            'w') as fd:
+        fd.write("Zone Name,Comment,Power,RX Freq,TX Freq,Color Code,"
+                 "PNW Rgnl 2,TAC 1,Local 2\n"
+                 "Ariel;ra,,High,440.275,445.275,1,2,1,-\n"
+                 "Baldi;bal,Baldi Mtn,High,440.55,445.55,2,2,,2\n"
+                 "Capitol;cap,,Low,441.0,446.0,3,-,1,1\n")
+
+    return
+
+
+
+def load_codeplug(inputs_dir, jobs):
+    codeplug = Codeplug()
+    codeplug.load_dir(inputs_dir, jobs=jobs)
+
+    return codeplug
+
+
+
+def test_parallel_load_matches_serial(tmp_path):
+    write_library(str(tmp_path))
+
+    serial = load_codeplug(str(tmp_path), jobs=1)
+    parallel = load_codeplug(str(tmp_path), jobs=2)
+
+    assert 'ra TAC 1' in serial.channels_dict
+    assert 'cap TAC 1' in serial.channels_dict
+    assert 'bal TAC 1' not in serial.channels_dict
+    assert parallel.channels_dict == serial.channels_dict
+    assert parallel.zones_dict == serial.zones_dict
+    assert list(parallel.zones_dict) == list(serial.zones_dict)
+    assert parallel.tg_by_num_dict == serial.tg_by_num_dict
+    assert parallel.tg_by_name_dict == serial.tg_by_name_dict
+    assert parallel.problems_list == serial.problems_list == []
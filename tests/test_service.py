@@ -0,0 +1,113 @@
+# coding: utf-8
+#
+# The build service caches parsed files and built models, overlays a
+# request's files on the reference library and answers bad requests with
+# a 400 and a JSON error.
+#
+
+
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+
+from cps_import_builder.service import (BuildService, BuildRequestHandler,
+    PooledHTTPServer)
+
+
+analog_header = ("Zone,Channel Name,Bandwidth,Power,RX Freq,TX Freq,"
+                 "CTCSS Decode,CTCSS Encode,TX Prohibit\n")
+
+
+def write_reference(reference_dir):
+    """Writes a small reference library."""
+
+    with open(os.path.join(reference_dir, 'Talkgroups__Test.csv'), 'w') as fd:
+        fd.write("Parrot 1,9998\n")
+    with open(os.path.join(reference_dir, 'Analog__Test.csv'), 'w') as fd:
+        fd.write(analog_header +
+                 "Simplex,2m Call,25K,High,146.52,146.52,Off,Off,Off\n")
+    with open(os.path.join(reference_dir, 'Digital-Others__Test.csv'),
+            'w') as fd:
+        fd.write("Zone,Channel Name,Power,RX Freq,TX Freq,Color Code,"
+                 "Talk Group,TimeSlot,Call Type,TX Permit\n"
+                 "Hotspot,HS Parrot,Low,433.45,433.45,1,Parrot 1,2,"
+                 "Group Call,Always\n")
+
+
+
+def test_model_cache_hit_and_miss(tmp_path):
+    write_reference(str(tmp_path))
+    service = BuildService(str(tmp_path))
+
+    codeplug, target_list = service.build({'targets': ['878']})
+    assert target_list == ['878']
+    assert service.stats()['models']['misses'] == 1
+    assert service.stats()['models']['hits'] == 0
+
+    # the same request is served from the model cache
+    cached_codeplug, target_list = service.build({'targets': ['uv380']})
+    assert cached_codeplug is codeplug
+    assert service.stats()['models']['hits'] == 1
+
+    # different options make a new model, reusing the parsed files
+    other_codeplug, target_list = service.build({'targets': ['878'],
+        'zone_order': ['Simplex']})
+    assert other_codeplug is not codeplug
+    assert service.stats()['models']['misses'] == 2
+    assert service.stats()['files']['hits'] == 3
+
+
+
+def test_overlay_replaces_reference_file(tmp_path):
+    write_reference(str(tmp_path))
+    service = BuildService(str(tmp_path))
+
+    codeplug, target_list = service.build({'targets': ['878'],
+        'files': {'Analog__Test.csv': analog_header +
+            "Simplex,70cm Call,25K,High,446.0,446.0,Off,Off,Off\n"}})
+    assert '70cm Call' in codeplug.channels_dict
+    assert '2m Call' not in codeplug.channels_dict
+    assert 'HS Parrot' in codeplug.channels_dict
+
+    # the reference library itself is unchanged
+    codeplug, target_list = service.build({'targets': ['878']})
+    assert '2m Call' in codeplug.channels_dict
+    assert '70cm Call' not in codeplug.channels_dict
+
+
+
+def test_http_answers(tmp_path):
+    write_reference(str(tmp_path))
+    server = PooledHTTPServer(('127.0.0.1', 0), BuildRequestHandler,
+        BuildService(str(tmp_path)), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/build'.format(server.server_address[1])
+
+    def post(request_dict):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url,
+                    json.dumps(request_dict).encode('utf-8'))) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as err:
+            return err.code, json.loads(err.read())
+
+    try:
+        for request_dict in [{'targets': []}, {'targets': ['nope']},
+                {'targets': ['878'], 'files': {'Notes.txt': 'x'}},
+                {'targets': ['878'], 'route': [[47.0, -122.0]],
+                 'route_radius': 0}]:
+            status, body = post(request_dict)
+            assert status == 400
+            assert 'error' in body
+
+        status, body = post({'targets': ['878']})
+        assert status == 200
+        name_list = zipfile.ZipFile(io.BytesIO(body)).namelist()
+        assert 'manifest.json' in name_list
+    finally:
+        server.shutdown()
+        server.server_close()
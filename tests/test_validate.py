@@ -0,0 +1,106 @@
+# coding: utf-8
+#
+# Validation reports every problem at once, sorted by file and line: the
+# checks any radio needs always, and each CPS target's own limits only
+# for the targets being built.
+#
+
+
+import os
+
+from cps_import_builder.codeplug import Codeplug
+from cps_import_builder.validate import format_problem_source, validate_targets
+
+
+def write_library(inputs_dir):
+    """Writes a K7ABD library with mistakes in its Analog__ and
+    Digital-Others__ files."""
+
+    with open(os.path.join(inputs_dir, 'Talkgroups__Test.csv'), 'w') as fd:
+        fd.write("Parrot 1,9998\nLocal 2,2\n")
+    with open(os.path.join(inputs_dir, 'Analog__Test.csv'), 'w') as fd:
+        fd.write("Zone,Channel Name,Bandwidth,Power,RX Freq,TX Freq,"
+                 "CTCSS Decode,CTCSS Encode,TX Prohibit\n"
+                 "Simplex,2m Call,25K,High,146.52,146.52,Off,Off,Off\n"
+                 "Simplex,Bad Freq,25K,High,1460.52,146.52,Off,Off,Off\n"
+                 "Simplex,Inverted DCS,25K,High,446.1,446.1,D023I,D023I,"
+                 "Off\n"
+                 "Simplex,Wide,30K,Hi,446.2,446.2,Off,Off,Off\n")
+    with open(os.path.join(inputs_dir, 'Digital-Others__Test.csv'),
+            'w') as fd:
+        fd.write("Zone,Channel Name,Power,RX Freq,TX Freq,Color Code,"
+                 "Talk Group,TimeSlot,Call Type,TX Permit\n"
+                 "Hotspot,HS Parrot,Low,433.45,433.45,1,Parrot 1,2,"
+                 "Group Call,Always\n"
+                 "Hotspot,HS Free,Low,433.45,433.45,1,Local 2,2,"
+                 "Group Call,ChannelFree\n"
+                 "Hotspot,HS Slot 3,Low,433.45,433.45,1,Local 2,3,"
+                 "Group Call,Always\n"
+                 "Hotspot,HS CC 16,Max,433.45,433.45,16,Local 2,1,"
+                 "All Call,Always\n")
+
+
+
+def problem_lines(problems_list):
+    return ["{}: {}".format(format_problem_source(source), message)
+            for source, message in problems_list]
+
+
+# problems whatever the targets
+common_problem_list = [
+    "Analog__Test.csv:3: Invalid RX Freq '1460520000' for channel "
+    "'Bad Freq'",
+    "Digital-Others__Test.csv:4: Invalid Time Slot '3' for channel "
+    "'HS Slot 3'",
+    "Digital-Others__Test.csv:5: Invalid Color Code '16' for channel "
+    "'HS CC 16'"]
+
+
+
+def test_common_problems(tmp_path):
+    write_library(str(tmp_path))
+    codeplug = Codeplug()
+    codeplug.load_dir(str(tmp_path))
+
+    assert problem_lines(codeplug.validate()) == common_problem_list
+
+    # the Anytone writer passes tones and power through as they are
+    assert problem_lines(codeplug.validate(['868', '878'])) == \
+        common_problem_list
+
+
+
+def test_target_problems(tmp_path):
+    write_library(str(tmp_path))
+    codeplug = Codeplug()
+    codeplug.load_dir(str(tmp_path))
+
+    assert problem_lines(codeplug.validate(['uv380', 'cs800d'])) == [
+        "Analog__Test.csv:3: Invalid RX Freq '1460520000' for channel "
+        "'Bad Freq'",
+        "Analog__Test.csv:4: Invalid CTCSS Decode 'D023I' for channel "
+        "'Inverted DCS' (cs800d doesn't accept it)",
+        "Analog__Test.csv:4: Invalid CTCSS Encode 'D023I' for channel "
+        "'Inverted DCS' (cs800d doesn't accept it)",
+        "Analog__Test.csv:5: Invalid Bandwidth '30K' for channel 'Wide' "
+        "(uv380 accepts '12.5K', '20K', '25K')",
+        "Analog__Test.csv:5: Invalid Power 'Hi' for channel 'Wide' "
+        "(uv380 accepts 'Low', 'Medium', 'High', 'Turbo')",
+        "Digital-Others__Test.csv:3: Invalid TX Permit 'ChannelFree' for "
+        "channel 'HS Free' (uv380 accepts 'Always', 'Same Color Code')",
+        "Digital-Others__Test.csv:4: Invalid Time Slot '3' for channel "
+        "'HS Slot 3'",
+        "Digital-Others__Test.csv:5: Invalid Color Code '16' for channel "
+        "'HS CC 16'",
+        "Digital-Others__Test.csv:5: Invalid Power 'Max' for channel "
+        "'HS CC 16' (uv380 accepts 'Low', 'Medium', 'High', 'Turbo')"]
+
+
+
+def test_channel_limit():
+    channels_dict = dict(('Ch {}'.format(i), {'Ch Type': 'Digital',
+        'Power': 'Low', 'TX Permit': 'Always'}) for i in range(2001))
+
+    assert validate_targets(channels_dict, ['878', 'uv380']) == []
+    assert validate_targets(channels_dict, ['cs800d']) == [
+        (None, "2001 channels exceed the cs800d maximum of 2000")]